@@ -0,0 +1,149 @@
+import json
+import multiprocessing
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+import cribbage_game
+import shared_tables
+import variants
+
+# Streams deals through calculate_scores on a pool of worker processes. Deals
+# are read lazily and sent to the workers a chunk at a time, with at most
+# max_pending chunks in flight, and results are written back in input order as
+# soon as the oldest chunk is done. Memory use therefore doesn't depend on the
+# size of the input, and a slow writer holds back the reader. The workers share
+# one copy of the crib table (see shared_tables).
+#
+# Each input line is either a deal like "8C, AH, 10H, KC, 5D, 2S", or JSON: a
+# list of card strings, or an object with a "cards" list (any "id" is copied to
+# the result). Each output line is a JSON object.
+
+
+def parse_deal(line):
+    """ Returns (cards, id) for one line of input """
+    line = line.strip()
+    if line.startswith('[') or line.startswith('{'):
+        deal = json.loads(line)
+        deal_id = None
+        if isinstance(deal, dict):
+            deal, deal_id = deal.get('cards'), deal.get('id')
+        if not isinstance(deal, list) or not all(isinstance(c, basestring) for c in deal):
+            raise ValueError("Deal must be a list of cards")
+        return cribbage_game.parse_cards(deal), deal_id
+    return cribbage_game.parse_cards(line.split(',')), None
+
+
+def discard_result(discard, value):
+    return {'discard': [str(card) for card in discard.cards], 'value': round(value, 4)}
+
+
+def analyse_deal(original_cards):
+    """ Returns the best discards for a deal by each measure, as a dict that can be written as JSON """
+    return best_discards(original_cards, cribbage_game.calculate_scores(original_cards, keep_flips=False))
+
+
+def analyse_deals(deals):
+    """ Same as analyse_deal for each deal, scoring them all at once (see variants.calculate_scores_batch) """
+    return [best_discards(original_cards, discard_stats)
+            for original_cards, discard_stats in zip(deals, variants.calculate_scores_batch(deals))]
+
+
+def best_discards(original_cards, discard_stats):
+    best_mean = max(discard_stats, key=lambda s: s.mean())
+    best_max = max(discard_stats, key=lambda s: s.max())
+    best_dealer = max(discard_stats, key=lambda s: s.dealer_ev())
+    best_pone = max(discard_stats, key=lambda s: s.pone_ev())
+    return {
+        'cards': [str(card) for card in original_cards],
+        'best_mean': discard_result(best_mean, best_mean.mean()),
+        'best_max': discard_result(best_max, best_max.max()),
+        'best_dealer': discard_result(best_dealer, best_dealer.dealer_ev()),
+        'best_pone': discard_result(best_pone, best_pone.pone_ev()),
+    }
+
+
+def analyse_lines(lines, line_numbers=None):
+    """
+    Returns one JSON result line per input line. The deals that parse are
+    scored together (see analyse_deals), and an error result has the input's
+    line number (from line_numbers, counting from 1 by default).
+    """
+    if line_numbers is None:
+        line_numbers = range(1, len(lines) + 1)
+    results = []
+    deals = []
+    for line, line_number in zip(lines, line_numbers):
+        try:
+            cards, deal_id = parse_deal(line)
+        except ValueError as e:
+            results.append({'input': line.strip(), 'error': str(e), 'line': line_number})
+            continue
+        result = {'id': deal_id} if deal_id is not None else {}
+        results.append(result)
+        deals.append((cards, result))
+    for (cards, result), analysis in zip(deals, analyse_deals([cards for cards, _ in deals])):
+        result.update(analysis)
+    return [json.dumps(result, sort_keys=True) + '\n' for result in results]
+
+
+def chunks(lines, chunk_size):
+    """
+    Groups the non-blank lines into (line_numbers, lines) of up to chunk_size
+    lines, numbering them from 1
+    """
+    lines = ((line_number, line) for line_number, line in enumerate(lines, 1) if line.strip())
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield tuple(list(column) for column in zip(*chunk))
+
+
+def stream(lines, output, processes=None, chunk_size=500, max_pending=None):
+    """
+    Analyses every deal in lines and writes the results to output in the same
+    order. Returns the number of deals written.
+
+    processes: int
+        Number of worker processes, one per core by default. With 1 the deals
+        are analysed in this process.
+    max_pending: int
+        Chunks allowed in flight at once, twice the number of workers by default
+    """
+    written = 0
+    if processes == 1:
+        for line_numbers, chunk in chunks(lines, chunk_size):
+            output.writelines(analyse_lines(chunk, line_numbers))
+            written += len(chunk)
+        return written
+
+    pool, tables = shared_tables.shared_pool(processes, ['crib'])
+    max_pending = max_pending or 2 * (processes or multiprocessing.cpu_count())
+    pending = deque()
+    try:
+        for line_numbers, chunk in chunks(lines, chunk_size):
+            if len(pending) >= max_pending:
+                results = pending.popleft().get()
+                output.writelines(results)
+                written += len(results)
+            pending.append(pool.apply_async(analyse_lines, (chunk, line_numbers)))
+        while pending:
+            results = pending.popleft().get()
+            output.writelines(results)
+            written += len(results)
+    finally:
+        pool.terminate()
+        pool.join()
+        tables.close()
+    return written
+
+
+@contextmanager
+def open_stream(path, mode, default):
+    """ Opens path, or yields default (stdin/stdout) for '-' """
+    if path == '-':
+        yield default
+    else:
+        with open(path, mode) as f:
+            yield f
+
@@ -0,0 +1,215 @@
+from itertools import combinations
+import numpy as np
+from card import Card, DECK
+from discard import Discard
+
+# Scores every keep/flip combination for a deal at once by working on arrays
+# of card indexes (see Card.index) instead of Hand objects. Each scoring rule
+# is applied to the whole batch with array operations.
+#
+# The hand size is taken from the arrays, so the same functions score the
+# three kept cards of five-card cribbage (see variants).
+NUM_RANKS = len(Card.RANK_MAPPINGS)
+NUM_SUITS = len(Card.VALID_SUITS)
+JACK = list(Card.RANK_MAPPINGS.keys()).index('J')
+VALUES = np.array(list(Card.RANK_MAPPINGS.values()), dtype=np.int8)
+
+HAND_SIZE = 5
+NUM_SCORES = Discard.MAX_SCORE + 1
+PAIRS = dict((size, np.array(list(combinations(range(size), 2))).T) for size in (HAND_SIZE - 1, HAND_SIZE))
+
+
+def discard_positions(deal_size, keep_size):
+    """
+    Returns (discards, keeps): the positions in the dealt cards of each discard,
+    in the same order as combinations(original_cards, deal_size - keep_size),
+    and an array of the positions of the cards kept with it
+    """
+    discards = list(combinations(range(deal_size), deal_size - keep_size))
+    keeps = np.array([[i for i in range(deal_size) if i not in discard] for discard in discards])
+    return discards, keeps
+
+# Positions in the six dealt cards, in the same order as combinations(original_cards, 2)
+DISCARDS, KEEPS = discard_positions(6, 4)
+
+
+def score_hands(keep, flip):
+    """
+    keep: int array of shape (..., 4) (or (..., 3))
+        Card indexes of the cards in each hand
+    flip: int array of shape (...)
+        Card index of the flip card for each hand
+
+    Returns an array of shape (...) with the score of every hand
+    """
+    keep = np.asarray(keep)
+    flip = np.asarray(flip)
+    shape = np.broadcast(keep[..., 0], flip).shape
+    size = keep.shape[-1]
+    ranks = np.empty(shape + (size + 1,), dtype=np.int8)
+    ranks[..., :size] = keep // NUM_SUITS
+    ranks[..., size] = flip // NUM_SUITS
+    return _rank_points(ranks) + _suit_points(keep, flip)
+
+
+def _rank_points(ranks):
+    """ Scores the pairs, runs and 15s of hands given as an array of ranks of shape (..., 5) (or (..., 4)) """
+    pairs = PAIRS[ranks.shape[-1]]
+    pairs = 2 * (ranks[..., pairs[0]] == ranks[..., pairs[1]]).sum(axis=-1)
+    return _calculate_15s(VALUES[ranks]) + pairs + _calculate_runs(ranks)
+
+
+def _suit_points(keep, flip):
+    """ Scores the flush and nobs of hands given as card indexes """
+    keep_suits = keep % NUM_SUITS
+    flip_suit = flip % NUM_SUITS
+    flush = (keep_suits == keep_suits[..., :1]).all(axis=-1)
+    suit = np.where(flush, keep.shape[-1] + (flip_suit == keep_suits[..., 0]), 0)
+    nobs = ((keep // NUM_SUITS == JACK) & (keep_suits == flip_suit[..., None])).any(axis=-1)
+    return suit + nobs
+
+
+def _calculate_15s(values):
+    """
+    Scores the 15s of hands given as an array of card values of shape (..., 5),
+    by building the sums of all 32 subsets one card at a time
+    """
+    sums = np.zeros(values.shape[:-1] + (2 ** values.shape[-1],), dtype=np.int8)
+    size = 1
+    for i in range(values.shape[-1]):
+        np.add(sums[..., :size], values[..., i:i + 1], out=sums[..., size:2 * size])
+        size *= 2
+    return 2 * (sums == 15).sum(axis=-1)
+
+
+def _rank_counts(ranks):
+    """ Turns an array of ranks of shape (..., 5) into rank counts of shape (..., 13) """
+    hands = ranks.reshape(-1, ranks.shape[-1]).astype(np.intp)
+    hands += NUM_RANKS * np.arange(len(hands))[:, None]
+    counts = np.bincount(hands.ravel(), minlength=NUM_RANKS * len(hands)).astype(np.int8)
+    return counts.reshape(ranks.shape[:-1] + (NUM_RANKS,))
+
+
+def _calculate_runs(ranks):
+    """
+    Scores the runs of hands given as an array of ranks of shape (..., 5). A run
+    of length n made from rank counts c1..cn is worth n * c1 * ... * cn, and
+    with five cards (or fewer) only the longest stretch can score.
+    """
+    counts = _rank_counts(ranks)
+    runs = np.zeros(ranks.shape[:-1], dtype=np.int8)
+    for length in range(ranks.shape[-1], 2, -1):
+        windows = counts[..., :NUM_RANKS - length + 1].copy()
+        for offset in range(1, length):
+            windows *= counts[..., offset:NUM_RANKS - length + 1 + offset]
+        # Hands that already have a longer run keep it
+        runs = np.where(runs > 0, runs, length * windows.sum(axis=-1, dtype=np.int8))
+    return runs
+
+
+def flip_cards(deals):
+    """
+    deals: int array of shape (n, 6)
+        Card indexes of the dealt cards
+
+    Returns an int array of shape (n, 46) (52 less the dealt cards) with the cards left in the deck for
+    each deal, lowest index first
+    """
+    deals = np.asarray(deals)
+    in_deck = np.ones((len(deals), len(DECK)), dtype=bool)
+    in_deck[np.arange(len(deals))[:, None], deals] = False
+    return np.nonzero(in_deck)[1].reshape(len(deals), len(DECK) - deals.shape[1])
+
+
+def score_matrices(deals, keep_size=4):
+    """
+    deals: int array of shape (n, 6)
+        Card indexes of the dealt cards (any number of cards per deal)
+    keep_size: int
+        Number of cards kept from each deal
+
+    Returns (flips, scores) where flips has shape (n, 46) and scores[d, i, j]
+    is the score for deal d when discarding DISCARDS[i] (for six cards, keeping
+    four) and flipping flips[d, j]
+    """
+    deals = np.asarray(deals)
+    flips = flip_cards(deals)
+    discards, keeps = discard_positions(deals.shape[1], keep_size)
+    keeps = deals[:, keeps]
+
+    # Pairs, runs and 15s only depend on the flip card's rank, so they are
+    # worked out for the 13 ranks rather than all 46 flip cards
+    ranks = np.empty(keeps.shape[:2] + (NUM_RANKS, keep_size + 1), dtype=np.int8)
+    ranks[..., :keep_size] = keeps[:, :, None, :] // NUM_SUITS
+    ranks[..., keep_size] = np.arange(NUM_RANKS)
+    rank_points = _rank_points(ranks)
+    rank_points = rank_points[np.arange(len(deals))[:, None, None],
+                              np.arange(len(discards))[None, :, None],
+                              flips[:, None, :] // NUM_SUITS]
+
+    return flips, rank_points + _suit_points(keeps[:, :, None, :], flips[:, None, :])
+
+
+def score_histograms(scores):
+    """
+    scores: int array of shape (..., 46)
+        Scores with each flip card, as from score_matrices
+
+    Returns an int array of shape (..., 30) with the number of flip cards
+    giving each score, all counted at once
+    """
+    scores = np.asarray(scores)
+    rows = np.arange(scores.size // scores.shape[-1])[:, None] * NUM_SCORES
+    histograms = np.bincount((rows + scores.reshape(len(rows), -1)).ravel(), minlength=len(rows) * NUM_SCORES)
+    return histograms.reshape(scores.shape[:-1] + (NUM_SCORES,))
+
+
+def histogram_discards(deals, histograms, keep_size=HAND_SIZE - 1):
+    """
+    deals: list of list of Card
+        The dealt cards
+    histograms: int array of shape (n, discards, 30)
+        As from score_histograms
+
+    Returns the discard stats of each deal (like calculate_scores without the
+    flip cards), in discard_positions order
+    """
+    if not len(deals):
+        return []
+    discards, keeps = discard_positions(len(deals[0]), keep_size)
+    keeps = keeps.tolist()
+    results = []
+    for cards, deal_histograms in zip(deals, np.asarray(histograms).tolist()):
+        discard_stats = []
+        for discard, keep, histogram in zip(discards, keeps, deal_histograms):
+            card1, card2 = [cards[i] for i in discard] + [None] * (2 - len(discard))
+            discard_stats.append(Discard.from_histogram(card1, card2, histogram, [cards[k] for k in keep]))
+        results.append(discard_stats)
+    return results
+
+
+def score_matrix(original_cards):
+    """
+    Returns (flip_cards, scores) where scores is the 15x46 matrix of the score
+    for each discard (in combinations(original_cards, 2) order) and flip card
+    """
+    flips, scores = score_matrices([[card.index for card in original_cards]])
+    return [DECK[i] for i in flips[0]], scores[0]
+
+
+def calculate_scores(original_cards, keep_flips=True):
+    """ Same as cribbage_game.calculate_scores """
+    flips, scores = score_matrix(original_cards)
+
+    if not keep_flips:
+        # Straight from the histograms, without adding the flip cards one by one
+        return histogram_discards([original_cards], score_histograms(scores[None]))[0]
+
+    discard_stats = []
+    for (i, j), keep, row in zip(DISCARDS, KEEPS, scores.tolist()):
+        discard = Discard(original_cards[i], original_cards[j], keep_flips, [original_cards[k] for k in keep])
+        for flip_card, score in zip(flips, row):
+            discard.add(flip_card, score)
+        discard_stats.append(discard)
+
+    return discard_stats
@@ -0,0 +1,275 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import sys
+import timeit
+from itertools import combinations, islice
+from card import Card, DECK
+from hand import Hand, PartialHand
+import cribbage_game
+import score_table
+
+# Times each scoring path over fixed, seeded corpora and reports ops/sec,
+# per-call latency percentiles and peak memory. Every benchmark runs in its own
+# process so its peak RSS isn't mixed up with the others'.
+#
+#   python benchmark.py --output results.json
+#   python benchmark.py --compare benchmark_baseline.json --threshold 0.2
+#
+# Against the code before the score table (Hand.calculate_score for every
+# keep and flip card), measured on the same machine: a hand took 75 us and
+# calculate_scores 74 ms a deal. score_table.score is 25-35x faster than
+# that Hand, and calculate_scores with the flip cards 30-40x: what's left
+# is the interpreter's cost per call and per Discard.add, which no table
+# lookup gets rid of. Getting past 100x means scoring a deal's 690 hands
+# together, so without the flip cards a single deal goes through the batch
+# scoring core (about 0.5 ms, 150x), and many deals at once take about
+# 0.33 ms each (variants.calculate_scores_batch, 220x).
+SEED = 2017
+DEFAULT_THRESHOLD = 0.10
+
+
+def create_cards(card_strings):
+    return [Card(c[:-1], c[-1]) for c in card_strings]
+
+
+def random_hands(count, seed=SEED):
+    """ (four cards, flip card) pairs dealt at random """
+    rng = random.Random(seed)
+    hands = []
+    for _ in range(count):
+        cards = rng.sample(DECK, 5)
+        hands.append((cards[:4], cards[4]))
+    return hands
+
+
+# Hands that make the scoring code do the most work
+WORST_CASE_HANDS = [(create_cards(cards), create_cards([flip])[0]) for cards, flip in [
+    (['5C', '5D', '5S', 'JH'], '5H'), # 29
+    (['4C', '4D', '5C', '6C'], '6H'), # double double run
+    (['3C', '3D', '3S', '4C'], '5H'), # triple run
+    (['7C', '7D', '8S', '8C'], '9H'), # double double run with 15s
+    (['6C', '6D', '6S', '6H'], '9H'), # four of a kind and 15s
+    (['5C', '5D', '10S', 'JC'], 'QH'), # lots of 15s
+    (['9C', '10C', 'JC', 'QC'], 'KC'), # 5 card run and flush
+]]
+
+
+def enumeration_hands(count):
+    """ Every n-th hand of all 2,598,960 five card hands (in combinations order) """
+    step = 2598960 // count
+    return [(list(cards[:4]), cards[4]) for cards in islice(combinations(DECK, 5), 0, None, step)][:count]
+
+
+def random_deals(count, seed=SEED):
+    rng = random.Random(seed)
+    return [rng.sample(DECK, 6) for _ in range(count)]
+
+
+WORST_CASE_DEALS = [create_cards(cards) for cards in [
+    ['5C', '5D', '5S', 'JH', '10C', 'KD'],
+    ['4C', '4D', '5C', '6C', '6H', '5S'],
+    ['3C', '3D', '3S', '4C', '5H', '5D'],
+    ['7C', '7D', '8S', '8C', '9H', '9D'],
+]]
+
+
+def hand_corpus(size):
+    return random_hands(size) + WORST_CASE_HANDS * (size // 100 or 1) + enumeration_hands(size)
+
+
+def deal_corpus(size):
+    return random_deals(size) + WORST_CASE_DEALS * (size // 20 or 1)
+
+
+def _hand_method(name):
+    def run(corpus):
+        hands = [Hand(cards, flip_card) for cards, flip_card in corpus]
+        method = getattr(Hand, name)
+        return [(method, (hand,)) for hand in hands]
+    return run
+
+
+def _hand_score(corpus):
+    return [(lambda cards, flip_card: Hand(cards, flip_card).calculate_score(), hand) for hand in corpus]
+
+
+def _score_table(corpus):
+    table = score_table.default_table()
+    return [(table.score, hand) for hand in corpus]
+
+
+def _partial_hand(corpus):
+    return [(PartialHand(cards).calculate_score, (flip_card,)) for cards, flip_card in corpus]
+
+
+def _deal_function(function):
+    def run(corpus):
+        return [(function, (deal,)) for deal in corpus]
+    return run
+
+
+def _calculate_scores_without_flips(corpus):
+    return [(cribbage_game.calculate_scores, (deal, False)) for deal in corpus]
+
+
+def _deal_batches(corpus):
+    import variants
+    return [(variants.calculate_scores_batch, (corpus[start:start + DEALS_PER_BATCH],))
+            for start in range(0, len(corpus), DEALS_PER_BATCH)]
+
+
+def _batch_scoring(corpus):
+    import batch_scoring # needs numpy
+    return [(batch_scoring.score_matrix, (deal,)) for deal in corpus]
+
+
+# variants.calculate_scores_batch is timed per call of this many deals
+DEALS_PER_BATCH = 100
+
+# name: (corpus, corpus size, function turning the corpus into (function, args) calls)
+BENCHMARKS = [
+    ('hand.calculate_score', hand_corpus, 2000, _hand_score),
+    ('hand.calculate_pairs', hand_corpus, 2000, _hand_method('calculate_pairs')),
+    ('hand.calculate_runs', hand_corpus, 2000, _hand_method('calculate_runs')),
+    ('hand.calculate_15s', hand_corpus, 2000, _hand_method('calculate_15s')),
+    ('hand.calculate_suit', hand_corpus, 2000, _hand_method('calculate_suit')),
+    ('hand.calculate_nobs', hand_corpus, 2000, _hand_method('calculate_nobs')),
+    ('score_table.score', hand_corpus, 2000, _score_table),
+    ('partial_hand.calculate_score', hand_corpus, 2000, _partial_hand),
+    ('cribbage_game.calculate_scores', deal_corpus, 200, _deal_function(cribbage_game.calculate_scores)),
+    ('cribbage_game.best_mean_discard', deal_corpus, 200, _deal_function(cribbage_game.best_mean_discard)),
+    ('cribbage_game.calculate_scores_without_flips', deal_corpus, 200, _calculate_scores_without_flips),
+    ('variants.calculate_scores_batch', deal_corpus, 1000, _deal_batches),
+    ('batch_scoring.score_matrix', deal_corpus, 200, _batch_scoring),
+]
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def run_benchmark(name, scale=1.0, repeat=3):
+    """ Runs one benchmark in this process and returns its results """
+    _, make_corpus, size, make_calls = [b for b in BENCHMARKS if b[0] == name][0]
+    calls = make_calls(make_corpus(max(1, int(size * scale))))
+    timer = timeit.default_timer
+
+    latencies = []
+    total = 0.0
+    for _ in range(repeat):
+        for function, args in calls:
+            start = timer()
+            function(*args)
+            elapsed = timer() - start
+            latencies.append(elapsed)
+            total += elapsed
+    latencies.sort()
+
+    return {
+        'calls': len(latencies),
+        'ops_per_sec': round(len(latencies) / total, 1),
+        'p50_us': round(percentile(latencies, 0.50) * 1e6, 2),
+        'p90_us': round(percentile(latencies, 0.90) * 1e6, 2),
+        'p99_us': round(percentile(latencies, 0.99) * 1e6, 2),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def _run_benchmark(args):
+    return run_benchmark(*args)
+
+
+def run_benchmarks(names=None, scale=1.0, repeat=3):
+    results = {}
+    for name, _, _, _ in BENCHMARKS:
+        if names and name not in names:
+            continue
+        # A fresh process per benchmark, for the peak memory
+        pool = multiprocessing.Pool(1)
+        try:
+            results[name] = pool.apply(_run_benchmark, ((name, scale, repeat),))
+        except ImportError as e:
+            sys.stderr.write("Skipping {}: {}\n".format(name, e))
+        finally:
+            pool.terminate()
+            pool.join()
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seed': SEED,
+        'scale': scale,
+        'benchmarks': results,
+    }
+
+
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD):
+    """
+    Returns a list of (name, metric, baseline value, new value) for every
+    benchmark that got worse than the baseline by more than threshold
+    (a fraction): lower ops/sec, or a higher p50/p99 latency
+    """
+    regressions = []
+    for name, new in sorted(results['benchmarks'].items()):
+        old = baseline['benchmarks'].get(name)
+        if old is None:
+            continue
+        if new['ops_per_sec'] < old['ops_per_sec'] * (1 - threshold):
+            regressions.append((name, 'ops_per_sec', old['ops_per_sec'], new['ops_per_sec']))
+        for metric in ('p50_us', 'p99_us'):
+            if new[metric] > old[metric] * (1 + threshold):
+                regressions.append((name, metric, old[metric], new[metric]))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    print("{:<46} {:>12} {:>10} {:>10} {:>10} {:>10}".format(
+        'benchmark', 'ops/sec', 'p50 us', 'p90 us', 'p99 us', 'peak KB'))
+    for name, result in sorted(results['benchmarks'].items()):
+        line = "{:<46} {:>12} {:>10} {:>10} {:>10} {:>10}".format(
+            name, result['ops_per_sec'], result['p50_us'], result['p90_us'], result['p99_us'], result['peak_rss_kb'])
+        if baseline and name in baseline['benchmarks']:
+            line += "  ({:+.1%} ops/sec)".format(result['ops_per_sec'] / baseline['benchmarks'][name]['ops_per_sec'] - 1)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hand scoring and discard analysis")
+    parser.add_argument('names', nargs='*', help="benchmarks to run (default all)")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--results', help="compare these saved results instead of running the benchmarks")
+    parser.add_argument('--compare', metavar='BASELINE', help="flag regressions against this JSON file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="fraction a metric can get worse by before it counts as a regression")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplies the corpus sizes")
+    parser.add_argument('--repeat', type=int, default=3, help="times to go over each corpus")
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results) as f:
+            results = json.load(f)
+    else:
+        results = run_benchmarks(args.names, args.scale, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if baseline:
+        regressions = compare(baseline, results, args.threshold)
+        for name, metric, old, new in regressions:
+            print("REGRESSION {} {}: {} -> {}".format(name, metric, old, new))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+from functools import partial
+from itertools import combinations
+from card import Card, DECK
+from discard import Discard
+
+# Relabelling the suits of a deal doesn't change any of its scores, so every
+# deal can be mapped onto one canonical deal per suit isomorphism class and the
+# analysis of that deal mapped back.
+NUM_SUITS = len(Card.VALID_SUITS)
+
+
+def canonicalize(cards):
+    """
+    Returns (canonical_cards, suit_map) where canonical_cards are the given cards
+    with their suits relabelled into a canonical order (sorted by Card.index)
+    and suit_map[canonical suit_index] is the original suit_index.
+
+    Suits are ordered by the ranks they hold, so two deals that only differ by
+    their suit labels always give the same canonical cards.
+    """
+    suit_ranks = [0] * NUM_SUITS
+    for card in cards:
+        suit_ranks[card.suit_index] |= 1 << card.numerical_order
+    suit_map = sorted(range(NUM_SUITS), key=lambda s: suit_ranks[s], reverse=True)
+    canonical_cards = sorted(relabel(cards, invert(suit_map)), key=lambda c: c.index)
+    return canonical_cards, suit_map
+
+
+def invert(suit_map):
+    inverse = [0] * len(suit_map)
+    for i, suit_index in enumerate(suit_map):
+        inverse[suit_index] = i
+    return inverse
+
+
+def relabel_card(card, suit_map):
+    """ Returns the card with the same rank and suit suit_map[card.suit_index] """
+    return DECK[card.numerical_order * NUM_SUITS + suit_map[card.suit_index]]
+
+
+def relabel(cards, suit_map):
+    return [relabel_card(card, suit_map) for card in cards]
+
+
+def histogram_form(discard_stats):
+    """
+    Returns (cards, histogram, possible_scores) for each discard, possible_scores
+    being None unless the flip cards were kept. This is all restore_discards
+    needs, without the rest of the Discard.
+    """
+    return [(discard.cards, list(discard.histogram), dict(discard.possible_scores) if discard.keep_flips else None)
+            for discard in discard_stats]
+
+
+def relabel_scores(possible_scores, suit_map):
+    return dict((relabel_card(flip_card, suit_map), score) for flip_card, score in possible_scores.items())
+
+
+def restore_discards(discards, suit_map, original_cards):
+    """
+    Maps the histogram_form of calculate_scores for a canonical deal back onto
+    the original deal, in the same order calculate_scores(original_cards) uses.
+    Only the histograms are copied; the flip cards are relabelled the first
+    time a discard's possible_scores are needed.
+    """
+    by_cards = {}
+    for cards, histogram, possible_scores in discards:
+        by_cards[frozenset(relabel(cards, suit_map))] = (histogram, possible_scores)
+
+    restored = []
+    for discard_combo in combinations(original_cards, 2):
+        histogram, possible_scores = by_cards[frozenset(discard_combo)]
+        kept_cards = [card for card in original_cards if card not in discard_combo]
+        flip_scores = None if possible_scores is None else partial(relabel_scores, possible_scores, suit_map)
+        restored.append(Discard.from_histogram(discard_combo[0], discard_combo[1], histogram, kept_cards, flip_scores))
+    return restored
@@ -1,30 +1,64 @@
 from collections import OrderedDict
 
-class Card:
+class Card(object):
     RANK_MAPPINGS = OrderedDict([
         ('A', 1), ('2', 2), ('3', 3), ('4', 4), ('5', 5), ('6', 6), ('7', 7),
         ('8', 8), ('9', 9), ('10', 10), ('J', 10), ('Q', 10), ('K', 10)
     ])
     VALID_SUITS = ['S', 'C', 'D', 'H']
 
-    def __init__(self, rank, suit):
+    # There are only 52 cards, so every Card is created once when this module
+    # is loaded and Card(rank, suit) just hands back the existing object.
+    # index = numerical_order * 4 + suit_index, which is also the card's bit
+    # in a CardSet.
+    __slots__ = ('rank', 'suit', 'value', 'numerical_order', 'suit_index', 'index', 'bit', '_next_rank')
+    _interned = {}
+
+    def __new__(cls, rank, suit):
         """
         value: String
             Describes the card number/value. One of A, 1, ... , 9, J, Q, K
         suit: String
             Describes the card suit. One of S, C, D, H
         """
-        Card.validate_card_input(rank, suit)
-        self.rank = rank
-        self.suit = suit
-        self.value = Card.RANK_MAPPINGS[self.rank]
-        self.numerical_order = Card.RANK_MAPPINGS.keys().index(self.rank)
+        try:
+            return Card._interned[(rank, suit)]
+        except (KeyError, TypeError):
+            Card.validate_card_input(rank, suit)
+            raise
+
+    @classmethod
+    def _create(cls, numerical_order, suit_index):
+        ranks = list(cls.RANK_MAPPINGS.keys())
+        card = object.__new__(cls)
+        card.rank = ranks[numerical_order]
+        card.suit = cls.VALID_SUITS[suit_index]
+        card.value = cls.RANK_MAPPINGS[card.rank]
+        card.numerical_order = numerical_order
+        card.suit_index = suit_index
+        card.index = numerical_order * len(cls.VALID_SUITS) + suit_index
+        card.bit = 1 << card.index
+        card._next_rank = ranks[numerical_order + 1] if numerical_order + 1 < len(ranks) else None
+        cls._interned[(card.rank, card.suit)] = card
+        return card
+
+    @staticmethod
+    def from_index(index):
+        """ Returns the card with the given index (0..51) """
+        return DECK[index]
+
+    def __reduce__(self):
+        # Unpickling goes back through Card() so it gets the interned card
+        return (Card, (self.rank, self.suit))
 
     def __hash__(self):
-        return hash((self.rank, self.suit))
+        return self.index
 
     def __eq__(self, other):
-        return self.rank == other.rank and self.suit == other.suit
+        return isinstance(other, Card) and self.index == other.index
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
 
     def __str__(self):
         return self.rank + self.suit
@@ -44,6 +78,9 @@ class Card:
         """
         Returns the rank that comes directly after this card's rank
         """
-        if self.rank == 'K':
-            return None
-        return self.RANK_MAPPINGS.keys()[self.RANK_MAPPINGS.keys().index(self.rank) + 1]
+        return self._next_rank
+
+
+DECK = [Card._create(numerical_order, suit_index)
+        for numerical_order in range(len(Card.RANK_MAPPINGS))
+        for suit_index in range(len(Card.VALID_SUITS))]
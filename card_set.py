@@ -0,0 +1,86 @@
+from card import DECK
+
+class CardSet(object):
+    """
+    An immutable set of cards stored as a 52-bit integer, with bit Card.index
+    set for every card in the set. Set operations are single integer operations.
+    """
+    __slots__ = ('bits',)
+
+    def __init__(self, cards=()):
+        """
+        cards: iterable of Card
+        """
+        bits = 0
+        for card in cards:
+            bits |= card.bit
+        self.bits = bits
+
+    @staticmethod
+    def from_bits(bits):
+        card_set = CardSet()
+        card_set.bits = bits & FULL_DECK_BITS
+        return card_set
+
+    def __iter__(self):
+        """ Yields the cards in order of Card.index (lowest rank first) """
+        bits = self.bits
+        while bits:
+            lowest = bits & -bits
+            yield DECK[lowest.bit_length() - 1]
+            bits ^= lowest
+
+    def __len__(self):
+        return bin(self.bits).count('1')
+
+    def __contains__(self, card):
+        return bool(self.bits & card.bit)
+
+    def __nonzero__(self):
+        return self.bits != 0
+
+    __bool__ = __nonzero__
+
+    def __eq__(self, other):
+        return isinstance(other, CardSet) and self.bits == other.bits
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __or__(self, other):
+        return CardSet.from_bits(self.bits | other.bits)
+
+    def __and__(self, other):
+        return CardSet.from_bits(self.bits & other.bits)
+
+    def __sub__(self, other):
+        return CardSet.from_bits(self.bits & ~other.bits)
+
+    def __xor__(self, other):
+        return CardSet.from_bits(self.bits ^ other.bits)
+
+    def __invert__(self):
+        return CardSet.from_bits(~self.bits)
+
+    def __reduce__(self):
+        return (CardSet, (list(self),))
+
+    def __str__(self):
+        return ", ".join(str(card) for card in self)
+
+    def add(self, card):
+        """ Returns a new set that also contains the given card """
+        return CardSet.from_bits(self.bits | card.bit)
+
+    def remove(self, card):
+        """ Returns a new set without the given card """
+        if not self.bits & card.bit:
+            raise KeyError(str(card))
+        return CardSet.from_bits(self.bits ^ card.bit)
+
+
+FULL_DECK_BITS = (1 << len(DECK)) - 1
+FULL_DECK = CardSet.from_bits(FULL_DECK_BITS)
@@ -0,0 +1,260 @@
+import argparse
+import json
+import os
+import numpy as np
+from card import Card, DECK
+from crib import default_crib_table, NUM_RANKS
+from discard import Discard
+import batch_scoring
+
+# Bulk parsing of deal logs and columnar output of their analysis.
+#
+# A log has one deal per line like "8C, AH, 10H, KC, 5D, 2S". The file is read
+# a block of bytes at a time and each block is turned into an (n, 6) uint8
+# array of card indexes (see Card.index) with array operations on the bytes
+# themselves: the commas and newlines split the tokens, and the rank and suit
+# characters are looked up in tables, so no string or Card is made per line.
+# Whitespace is ignored, and lines that aren't six different valid cards are
+# skipped (their line numbers go in the manifest).
+#
+# The deals are scored with batch_scoring a chunk at a time and each discard
+# stat is written to its own .npy file of shape (n, 15), in combinations(deal,
+# 2) order, next to a manifest.json describing the columns. .npy files can be
+# opened with np.load(path, mmap_mode='r') (see load_columns), so readers
+# don't copy or parse anything.
+DEAL_SIZE = 6
+NUM_SCORES = Discard.MAX_SCORE + 1
+NUM_FLIPS = len(DECK) - DEAL_SIZE
+MANIFEST = 'manifest.json'
+BLOCK_SIZE = 1 << 20
+# The shortest line a deal can be, like "AS,2S,3S,4S,5S,6S\n"
+MIN_LINE_LENGTH = 3 * DEAL_SIZE
+VERSION = 1
+
+# name: (dtype, description)
+COLUMNS = [
+    ('total', np.uint16, "sum of the scores over the flip cards"),
+    ('min', np.uint8, "lowest score"),
+    ('max', np.uint8, "highest score"),
+    ('mean', np.float64, "average score"),
+    ('median', np.float64, "median score"),
+    ('mode', np.int8, "most common score, -1 if it isn't unique"),
+    ('variance', np.float64, "population variance of the scores"),
+    ('crib', np.float64, "expected crib value of the discards (see CribTable)"),
+]
+
+
+def _byte_table(mapping):
+    """ A 256 entry lookup from byte value to mapping[character], -1 for other bytes """
+    table = np.full(256, -1, dtype=np.int16)
+    for character, value in mapping.items():
+        table[ord(character)] = value
+    return table
+
+# Ranks by their one character names ('10' is the only one with two), and suits
+RANK_BYTES = _byte_table(dict((rank, order) for order, rank in enumerate(Card.RANK_MAPPINGS) if len(rank) == 1))
+TEN = list(Card.RANK_MAPPINGS).index('10')
+SUIT_BYTES = _byte_table(dict((suit, index) for index, suit in enumerate(Card.VALID_SUITS)))
+WHITESPACE = np.zeros(256, dtype=bool)
+WHITESPACE[[ord(c) for c in ' \t\r\v\f']] = True
+COMMA, NEWLINE = ord(','), ord('\n')
+
+
+def _parse_block(data):
+    """
+    Parses bytes of whole lines, each ending with a newline. Returns (deals,
+    lines, skipped, line count), with lines and skipped the line numbers (from
+    0 at the start of data) of the deals and the lines that couldn't be parsed.
+    """
+    data = np.frombuffer(data, dtype=np.uint8)
+    data = data[~WHITESPACE[data]]
+    # Lower case letters to upper case
+    data = np.where((data >= ord('a')) & (data <= ord('z')), data - 32, data).astype(np.uint8)
+
+    # Every token ends at a comma or a newline
+    ends = np.flatnonzero((data == COMMA) | (data == NEWLINE))
+    starts = np.empty_like(ends)
+    starts[:1] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts
+    line_ends = data[ends] == NEWLINE
+    token_lines = np.cumsum(line_ends) - line_ends
+    num_lines = int(line_ends.sum())
+
+    # A card is a rank character (or '10') and a suit character
+    first = data[starts]
+    second = data[np.minimum(starts + 1, len(data) - 1)]
+    ranks = np.where(lengths == 2, RANK_BYTES[first], -1)
+    ranks = np.where((lengths == 3) & (first == ord('1')) & (second == ord('0')), TEN, ranks)
+    suits = SUIT_BYTES[data[ends - 1]]
+    cards = ranks * len(Card.VALID_SUITS) + suits
+    cards[(ranks < 0) | (suits < 0)] = -1
+
+    tokens = np.bincount(token_lines, minlength=num_lines)
+    blank = (tokens == 1) & (np.bincount(token_lines, weights=lengths, minlength=num_lines) == 0)
+    first_tokens = np.cumsum(tokens) - tokens
+    valid = tokens == DEAL_SIZE
+    ordered = np.sort(cards[first_tokens[valid][:, None] + np.arange(DEAL_SIZE)], axis=1)
+    valid[valid] = (ordered[:, 0] >= 0) & (ordered[:, 1:] != ordered[:, :-1]).all(axis=1)
+
+    deals = cards[first_tokens[valid][:, None] + np.arange(DEAL_SIZE)].astype(np.uint8)
+    return deals, np.flatnonzero(valid), np.flatnonzero(~valid & ~blank), num_lines
+
+
+def parse_deals(lines):
+    """
+    Returns (deals, line_numbers, skipped): an (n, 6) uint8 array of the card
+    indexes of each valid deal, the line number (from 1) each came from, and
+    the line numbers of the lines that couldn't be parsed. Blank lines are
+    ignored.
+    """
+    deals, numbers, skipped, _ = _parse_block(''.join(line.rstrip('\n') + '\n' for line in lines))
+    return deals, (numbers + 1).astype(np.uint32), (skipped + 1).tolist()
+
+
+def read_deals(path, block_size=BLOCK_SIZE):
+    """
+    parse_deals for the lines of a file, read block_size bytes at a time. The
+    results go into arrays sized for the most deals the file could hold, so
+    nothing is built per line and only a block of the file is in memory.
+    """
+    capacity = os.path.getsize(path) // MIN_LINE_LENGTH + 1
+    deals = np.empty((capacity, DEAL_SIZE), dtype=np.uint8)
+    line_numbers = np.empty(capacity, dtype=np.uint32)
+    skipped = []
+    count = 0
+    first_line = 1
+    with open(path, 'rb') as f:
+        rest = b''
+        while True:
+            block = f.read(block_size)
+            data = rest + block
+            end = data.rfind(b'\n') + 1 if block else len(data)
+            if end:
+                if not block and not data.endswith(b'\n'):
+                    data += b'\n'
+                    end += 1
+                block_deals, block_lines, block_skipped, num_lines = _parse_block(data[:end])
+                deals[count:count + len(block_deals)] = block_deals
+                line_numbers[count:count + len(block_deals)] = block_lines + first_line
+                skipped.extend((block_skipped + first_line).tolist())
+                count += len(block_deals)
+                first_line += num_lines
+            rest = data[end:]
+            if not block:
+                return deals[:count], line_numbers[:count], skipped
+
+
+def _nth_score(cumulative, n):
+    """ The score at position n (from 0) of the sorted scores, from cumulative histograms """
+    return (cumulative <= n).sum(axis=-1)
+
+
+def discard_columns(deals):
+    """
+    Returns a dict of column name to an (n, 15) array of that stat for every
+    discard of each deal, the same as the Discard methods of calculate_scores
+    """
+    deals = np.asarray(deals)
+    _, scores = batch_scoring.score_matrices(deals)
+    histograms = batch_scoring.score_histograms(scores)
+
+    points = np.arange(NUM_SCORES)
+    present = histograms > 0
+    cumulative = histograms.cumsum(axis=-1)
+    total = (histograms * points).sum(axis=-1)
+    mean = total / float(NUM_FLIPS)
+    most_common = histograms.max(axis=-1)
+    unique = (histograms == most_common[..., None]).sum(axis=-1) == 1
+
+    discards = np.array(batch_scoring.DISCARDS)
+    first = deals[:, discards[:, 0]].astype(np.intp)
+    second = deals[:, discards[:, 1]].astype(np.intp)
+    suits = len(Card.VALID_SUITS)
+    crib_index = ((first // suits) * NUM_RANKS + second // suits) * 2 + (first % suits == second % suits)
+    crib_values = np.frombuffer(default_crib_table().values, dtype=np.float64)
+
+    return {
+        'total': total,
+        'min': present.argmax(axis=-1),
+        'max': NUM_SCORES - 1 - present[..., ::-1].argmax(axis=-1),
+        'mean': mean,
+        # 46 flip cards, so the median is halfway between the middle two
+        'median': (_nth_score(cumulative, NUM_FLIPS // 2 - 1) + _nth_score(cumulative, NUM_FLIPS // 2)) / 2.0,
+        'mode': np.where(unique, histograms.argmax(axis=-1), -1),
+        'variance': (histograms * (points - mean[..., None]) ** 2).sum(axis=-1) / NUM_FLIPS,
+        'crib': crib_values[crib_index],
+    }
+
+
+def write_columns(directory, deals, line_numbers=None, skipped=(), chunk_size=10000):
+    """
+    Analyses the deals a chunk at a time into directory, one .npy file per
+    column, and writes the manifest. Returns the manifest.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    deals = np.asarray(deals, dtype=np.uint8).reshape(-1, DEAL_SIZE)
+    if line_numbers is None:
+        line_numbers = np.arange(1, len(deals) + 1, dtype=np.uint32)
+    count = len(deals)
+    num_discards = len(batch_scoring.DISCARDS)
+
+    np.save(os.path.join(directory, 'deals.npy'), deals)
+    np.save(os.path.join(directory, 'line.npy'), np.asarray(line_numbers, dtype=np.uint32))
+    outputs = {}
+    for name, dtype, _ in COLUMNS:
+        outputs[name] = np.lib.format.open_memmap(os.path.join(directory, name + '.npy'), mode='w+',
+                                                  dtype=dtype, shape=(count, num_discards))
+    for start in range(0, count, chunk_size):
+        columns = discard_columns(deals[start:start + chunk_size])
+        for name, _, _ in COLUMNS:
+            outputs[name][start:start + chunk_size] = columns[name]
+    for output in outputs.values():
+        output.flush()
+    del outputs
+
+    manifest = {
+        'version': VERSION,
+        'count': count,
+        'discards': [list(discard) for discard in batch_scoring.DISCARDS],
+        'skipped_lines': list(skipped),
+        'columns': dict([('deals', {'file': 'deals.npy', 'dtype': 'uint8', 'shape': [count, DEAL_SIZE],
+                                    'description': "card indexes of the dealt cards"}),
+                         ('line', {'file': 'line.npy', 'dtype': 'uint32', 'shape': [count],
+                                   'description': "line of the log each deal came from"})] +
+                        [(name, {'file': name + '.npy', 'dtype': np.dtype(dtype).name,
+                                 'shape': [count, num_discards], 'description': description})
+                         for name, dtype, description in COLUMNS]),
+    }
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_columns(directory, mmap_mode='r'):
+    """ Returns (manifest, {column name: array}) with the columns memory mapped """
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != VERSION:
+        raise ValueError("{} has an unknown manifest version".format(directory))
+    columns = {}
+    for name, column in manifest['columns'].items():
+        columns[name] = np.load(os.path.join(directory, column['file']), mmap_mode=mmap_mode)
+    return manifest, columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse a log of deals into columnar .npy files")
+    parser.add_argument('log', help="file with one deal per line, like 8C, AH, 10H, KC, 5D, 2S")
+    parser.add_argument('output', help="directory to write the columns and manifest to")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="deals scored at a time")
+    args = parser.parse_args()
+
+    deals, line_numbers, skipped = read_deals(args.log)
+    manifest = write_columns(args.output, deals, line_numbers, skipped, args.chunk_size)
+    print("Wrote {} deals to {} ({} lines skipped)".format(manifest['count'], args.output, len(skipped)))
+
+
+if __name__ == '__main__':
+    main()
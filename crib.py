@@ -0,0 +1,137 @@
+import os
+import sys
+from array import array
+from itertools import combinations_with_replacement
+from card import Card
+from card_set import CardSet, FULL_DECK
+from score_table import ScoreTable, binomial, default_table
+
+# The crib holds the two cards each player discards, plus the flip card. The
+# expected value of a discard pair's crib is taken over the other player's two
+# discards and the flip card, drawn uniformly from the cards that aren't known.
+#
+# Pairs, runs and 15s treat the three unknown cards the same way, so they only
+# depend on the ranks of a random 3-card subset of the unknown cards, which
+# takes 455 rank combinations to cover. A crib only scores a flush if all five
+# cards share a suit, and nobs are counted directly from the suit counts.
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crib_table.bin')
+
+NUM_RANKS = len(Card.RANK_MAPPINGS)
+JACK = list(Card.RANK_MAPPINGS.keys()).index('J')
+UNKNOWN_CARDS = 3 # the other player's discards and the flip card
+
+
+def crib_expected_value(discards, known_cards=(), score_table=None):
+    """
+    Returns the expected score of a crib containing the two given discards.
+
+    known_cards: list of Card
+        Other cards that can't be in the crib or be the flip card (for example
+        the cards kept in the hand)
+    """
+    score_table = score_table or default_table()
+    pool = list(FULL_DECK - CardSet(discards) - CardSet(known_cards))
+    num_cards = len(pool)
+    rank_counts = [0] * NUM_RANKS
+    suit_counts = [0] * len(Card.VALID_SUITS)
+    for card in pool:
+        rank_counts[card.numerical_order] += 1
+        suit_counts[card.suit_index] += 1
+    num_draws = binomial(num_cards, UNKNOWN_CARDS)
+
+    rank_points = 0
+    discard_ranks = [card.numerical_order for card in discards]
+    for ranks in combinations_with_replacement(range(NUM_RANKS), UNKNOWN_CARDS):
+        ways = 1
+        for rank in set(ranks):
+            ways *= binomial(rank_counts[rank], ranks.count(rank))
+        if ways:
+            rank_points += ways * score_table.totals[ScoreTable.index(discard_ranks + list(ranks))]
+
+    flush_points = 0
+    if discards[0].suit == discards[1].suit:
+        flush_points = 5 * binomial(suit_counts[discards[0].suit_index], UNKNOWN_CARDS)
+
+    # The flip card is equally likely to be any of the unknown cards, and given
+    # one of them is discarded by the other player, any of the rest
+    nobs = 0.0
+    for card in discards:
+        if card.numerical_order == JACK:
+            nobs += float(suit_counts[card.suit_index]) / num_cards
+    for card in pool:
+        if card.numerical_order == JACK:
+            nobs += 2.0 / num_cards * (suit_counts[card.suit_index] - 1) / (num_cards - 1)
+
+    return float(rank_points + flush_points) / num_draws + nobs
+
+
+class CribTable:
+    """
+    Expected crib value of every discard pair with nothing else known. By
+    symmetry that only depends on the two ranks and whether they share a suit.
+    """
+    def __init__(self, values):
+        """
+        values: array('d')
+            Expected crib values, indexed by CribTable.index
+        """
+        if len(values) != NUM_RANKS * NUM_RANKS * 2:
+            raise ValueError("Crib table must contain {} entries".format(NUM_RANKS * NUM_RANKS * 2))
+        self.values = values
+
+    @staticmethod
+    def index(card1, card2):
+        suited = 1 if card1.suit == card2.suit else 0
+        return (card1.numerical_order * NUM_RANKS + card2.numerical_order) * 2 + suited
+
+    @classmethod
+    def build(cls, score_table=None):
+        ranks = list(Card.RANK_MAPPINGS.keys())
+        values = array('d', [0.0] * (NUM_RANKS * NUM_RANKS * 2))
+        for rank1, rank2 in combinations_with_replacement(range(NUM_RANKS), 2):
+            for suit2 in ('S', 'C'):
+                if rank1 == rank2 and suit2 == 'S':
+                    continue # A pair can't be suited
+                card1 = Card(ranks[rank1], 'S')
+                card2 = Card(ranks[rank2], suit2)
+                value = crib_expected_value([card1, card2], score_table=score_table)
+                values[cls.index(card1, card2)] = value
+                values[cls.index(card2, card1)] = value
+        return cls(values)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        values = array('d')
+        with open(path, 'rb') as f:
+            values.fromstring(f.read())
+        return cls(values)
+
+    def save(self, path=DEFAULT_PATH):
+        with open(path, 'wb') as f:
+            f.write(self.values.tostring())
+
+    def expected_value(self, card1, card2):
+        """ Expected score of a crib holding the two given discards """
+        return self.values[CribTable.index(card1, card2)]
+
+
+_default_crib_table = None
+
+def default_crib_table():
+    """
+    Returns the shared crib table, loading it from DEFAULT_PATH if it has been
+    written there and building it otherwise
+    """
+    global _default_crib_table
+    if _default_crib_table is None:
+        if os.path.exists(DEFAULT_PATH):
+            _default_crib_table = CribTable.load(DEFAULT_PATH)
+        else:
+            _default_crib_table = CribTable.build()
+    return _default_crib_table
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    CribTable.build().save(path)
+    print("Wrote crib table to {}".format(path))
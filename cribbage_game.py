@@ -1,71 +1,207 @@
+import argparse
+import sys
 from itertools import combinations
 from card import Card
-from hand import Hand
+from card_set import CardSet, FULL_DECK
+from hand import PartialHand
 from discard import Discard
+import variants
+try:
+    import batch_scoring
+except ImportError:
+    batch_scoring = None
 
-def input_original_cards():
+def input_original_cards(count=6):
     """ Ask the user to input their hand """
-    print("Enter 6 cards of format <rank><suit>, separated by commas")
+    print("Enter {} cards of format <rank><suit>, separated by commas".format(count))
     print(" <rank> is one of: A, 2...10, J, Q, K")
     print(" <suit> is one of: S, H, D, C")
     print("Example: 8C, AH, 10H, KC, 5D, 2S")
-    card_inputs = raw_input("\nYour cards: ").upper()
-    card_inputs = [c.strip() for c in card_inputs.split(',')]
+    return parse_cards(raw_input("\nYour cards: ").split(','), count)
 
-    if len(card_inputs) != 6:
-        raise ValueError("Must provide 6 cards")
+def parse_cards(card_inputs, count=6):
+    """ Turns a list of count (6 by default) strings of format <rank><suit> into cards """
+    card_inputs = [c.strip().upper() for c in card_inputs]
+
+    if len(card_inputs) != count:
+        raise ValueError("Must provide {} cards".format(count))
 
     cards = []
     for card_string in card_inputs:
         try:
             card = Card(card_string[:-1], card_string[-1]) # will have two characters in rank when rank is 10
         except:
-        ``  raise ValueError("Invalid card input")
+            raise ValueError("Invalid card input")
         cards.append(card)
 
+    if len(set(cards)) != len(cards):
+        raise ValueError("Cards must all be different")
+
     return cards
 
-def remaining_cards_in_deck(original_cards):
-    ''' Determine the remaining cards in the deck besides the cards in the original hand '''
-    possible_ranks = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
-    possible_suits = ['S', 'C', 'D', 'H']
+def remaining_cards_in_deck(original_cards, known_cards=()):
+    '''
+    Determine the remaining cards in the deck besides the cards in the original
+    hand and any other cards known not to be in it
+    '''
+    return list(FULL_DECK - CardSet(original_cards) - CardSet(known_cards))
 
-    all_cards = []
-    for rank in possible_ranks:
-        for suit in possible_suits:
-            all_cards.append(Card(rank, suit))
+def calculate_scores(original_cards, keep_flips=True, known_cards=()):
+    """
+    Scores every discard with every possible flip card.
 
-    return [card for card in all_cards if card not in original_cards]
+    known_cards: list of Card
+        Cards that have been seen elsewhere, so can't be the flip card
 
-def calculate_scores(original_cards):
-    remaining_cards = remaining_cards_in_deck(original_cards)
+    Without the flip cards, six dealt cards are scored all at once by the batch
+    scoring core if numpy is installed.
+    """
+    if batch_scoring is not None and not keep_flips and not known_cards and len(original_cards) == 6:
+        return batch_scoring.calculate_scores(original_cards, keep_flips=False)
+    remaining_cards = remaining_cards_in_deck(original_cards, known_cards)
 
     discard_stats = []
     for discard_combo in combinations(original_cards, 2):
-        discard = Discard(discard_combo[0], discard_combo[1])
+        selected_cards = [card for card in original_cards if card != discard_combo[0] and card != discard_combo[1]]
+        discard = Discard(discard_combo[0], discard_combo[1], keep_flips, selected_cards, known_cards)
+        hand = PartialHand(selected_cards)
         for flip_card in remaining_cards:
-            selected_cards = [card for card in original_cards if card != discard_combo[0] and card != discard_combo[1]]
-            hand = Hand(selected_cards, flip_card)
-            score = hand.calculate_score()
-            discard.add(flip_card, score)
+            discard.add(flip_card, hand.calculate_score(flip_card))
         discard_stats.append(discard)
 
     return discard_stats
 
-def possible_cards_in_hand(original_cards):
-    assert len(original_cards) == 6
-    return combinations(original_cards, 4)
+def best_mean_discard(original_cards, keep_flips=True, known_cards=()):
+    """
+    Returns (discard, skipped) where discard is the same as
+    max(calculate_scores(original_cards), key=lambda s: s.mean()) and skipped is
+    the number of (keep, flip card) scores it didn't need to work out.
+
+    Every flip card adds the points for its rank plus the points for its suit
+    (see PartialHand), so the average over the flip cards left in the deck is
+    at most the four card score, plus the average rank points, plus the best
+    suit points. Keeps are scored in order of that bound, and the search stops
+    once no other keep can beat the best average found so far.
+    """
+    remaining_cards = remaining_cards_in_deck(original_cards, known_cards)
+    rank_counts = [0] * len(Card.RANK_MAPPINGS)
+    for card in remaining_cards:
+        rank_counts[card.numerical_order] += 1
+
+    candidates = []
+    for order, discard_combo in enumerate(combinations(original_cards, 2)):
+        selected_cards = [card for card in original_cards if card != discard_combo[0] and card != discard_combo[1]]
+        hand = PartialHand(selected_cards)
+        # Bound on the total over all the flip cards, to stay in integers
+        bound = len(remaining_cards) * (hand.score + max(hand.suit_deltas))
+        bound += sum(count * delta for count, delta in zip(rank_counts, hand.rank_deltas))
+        candidates.append((-bound, order, discard_combo, selected_cards, hand))
+    candidates.sort(key=lambda c: c[:2])
+
+    best = None
+    best_order = None
+    skipped = 0
+    for negative_bound, order, discard_combo, selected_cards, hand in candidates:
+        # An equal bound could still tie, and ties go to the first discard in order
+        if best is not None and -negative_bound < best.total:
+            skipped += len(remaining_cards)
+            continue
+        discard = Discard(discard_combo[0], discard_combo[1], keep_flips, selected_cards, known_cards)
+        for flip_card in remaining_cards:
+            discard.add(flip_card, hand.calculate_score(flip_card))
+        if best is None or discard.total > best.total or (discard.total == best.total and order < best_order):
+            best = discard
+            best_order = order
+
+    return best, skipped
+
+def remove_flip_card(discard_stats, flip_card):
+    """
+    Updates the results of calculate_scores once flip_card is known not to be
+    the flip card (it's been seen elsewhere), without scoring the rest again
+    """
+    for discard in discard_stats:
+        discard.remove_flip(flip_card)
+    return discard_stats
+
+def possible_cards_in_hand(original_cards, variant=variants.TWO_PLAYER):
+    assert len(original_cards) == variant.deal_size
+    return combinations(original_cards, variant.keep_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the best cards to discard from a cribbage hand")
+    parser.add_argument('--batch', nargs='?', const='-', metavar='FILE',
+                        help="analyse every deal in FILE (or stdin), one per line, instead of asking for one")
+    parser.add_argument('--output', default='-', metavar='FILE', help="where to write batch results (default stdout)")
+    parser.add_argument('--processes', type=int, default=None, help="batch worker processes (default one per core)")
+    parser.add_argument('--chunk-size', type=int, default=500, help="deals sent to a worker at a time")
+    parser.add_argument('--profile', metavar='FILE', help="save a cProfile of the analysis of the deal to FILE")
+    parser.add_argument('--variant', choices=list(variants.VARIANTS), default=variants.TWO_PLAYER.name,
+                        help="how many cards are dealt and kept (default two_player)")
+    parser.add_argument('--score', nargs=2, type=int, metavar=('MINE', 'THEIRS'),
+                        help="the game score, to also find the discards most likely to win (needs the win table)")
+    parser.add_argument('--dealer', action='store_true', help="with --score, it's your crib")
+    args = parser.parse_args()
+    variant = variants.VARIANTS[args.variant]
+    if args.score:
+        import win_probability # win_probability imports this module, so only load it when needed
+        if not all(0 <= score < win_probability.GAME_TARGET for score in args.score):
+            parser.error("--score: scores must be from 0 to {}, below the {} that ends the game".format(
+                win_probability.GAME_TARGET - 1, win_probability.GAME_TARGET))
+
+    if args.batch is not None:
+        if variant != variants.TWO_PLAYER:
+            parser.error("--batch only analyses two player deals")
+        import batch # batch imports this module, so only load it when needed
+        with batch.open_stream(args.batch, 'r', sys.stdin) as deals, \
+                batch.open_stream(args.output, 'w', sys.stdout) as output:
+            batch.stream(deals, output, processes=args.processes, chunk_size=args.chunk_size)
+        return
+
+    original_cards = input_original_cards(variant.deal_size)
+    if variant != variants.TWO_PLAYER:
+        discard_stats = variants.calculate_scores(original_cards, variant)
+    elif args.profile:
+        import instrumentation
+        discard_stats = instrumentation.profile(args.profile, calculate_scores, original_cards)
+    else:
+        discard_stats = calculate_scores(original_cards)
+
+    # The discard with the highest average
+    highest_mean_discard = max(discard_stats, key=lambda s: s.mean())
+    print("\nDiscards with the highest average: {}".format(highest_mean_discard))
+    print(" (average score: {})".format(round(highest_mean_discard.mean(), 2)))
+
+    # The discard with the highest possible score
+    highest_max_score_discard = max(discard_stats, key=lambda s: s.max())
+    print("\nDiscards with the highest max score: {}".format(highest_max_score_discard))
+    print(" (max score: {})".format(round(highest_max_score_discard.max(), 2)))
+
+    if variant.discard_size != 2:
+        return # the crib values are for two discarded cards
 
+    # The discards with the best hand + crib value, which depends on who owns the crib
+    best_dealer_discard = max(discard_stats, key=lambda s: s.dealer_ev())
+    print("\nBest discards as the dealer: {}".format(best_dealer_discard))
+    print(" (hand + crib: {})".format(round(best_dealer_discard.dealer_ev(), 2)))
+    best_pone_discard = max(discard_stats, key=lambda s: s.pone_ev())
+    print("\nBest discards as the pone: {}".format(best_pone_discard))
+    print(" (hand - crib: {})".format(round(best_pone_discard.pone_ev(), 2)))
 
-original_cards = input_original_cards()
-discard_stats = calculate_scores(original_cards)
+    if args.score:
+        table = win_probability.default_win_table()
+        if table is None:
+            print("\nBuild the win table (python win_probability.py) to find the discards most likely to win")
+            return
+        if max(args.score) >= table.target:
+            print("\nThe win table only goes up to {} points".format(table.target))
+            return
+        best_win_discard, probability = win_probability.best_win_discard(
+            discard_stats, args.score[0], args.score[1], args.dealer, table)
+        print("\nDiscards most likely to win the game: {}".format(best_win_discard))
+        print(" (chance of winning: {})".format(round(probability, 3)))
 
-# The discard with the highest average
-highest_mean_discard = max(discard_stats, key=lambda s: s.mean())
-print("\nDiscards with the highest average: {}".format(highest_mean_discard))
-print(" (average score: {})".format(round(highest_mean_discard.mean(), 2)))
 
-# The discard with the highest possible score
-highest_max_score_discard = max(discard_stats, key=lambda s: s.max())
-print("\nDiscards with the highest max score: {}".format(highest_max_score_discard))
-print(" (max score: {})".format(round(highest_max_score_discard.max(), 2)))
+if __name__ == '__main__':
+    main()
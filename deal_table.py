@@ -0,0 +1,308 @@
+import argparse
+import mmap
+import multiprocessing
+import os
+import struct
+import zlib
+from array import array
+from itertools import combinations
+from card import DECK
+from canonical import NUM_SUITS, canonicalize, relabel
+from discard import Discard
+from score_table import NUM_RANKS, binomial
+import cribbage_game
+
+# An on-disk table of calculate_scores results for every suit-canonical deal.
+#
+# File layout (little endian):
+#   header   HEADER
+#   keys     count x uint32, the colex rank of each canonical deal, ascending
+#   records  count x RECORD_SIZE, one DISCARD_RECORD per discard in
+#            combinations(canonical_cards, 2) order
+#
+# The table is built into the file in place, one chunk of deals at a time.
+# Finished chunks are listed in <path>.progress, after the chunk size that
+# numbers them, so an interrupted build picks up where it stopped; once every
+# chunk is written the CRC32 of the keys and records goes into the header and
+# the complete flag is set.
+MAGIC = b'CRIBDEAL'
+VERSION = 1
+HEADER = struct.Struct('<8sHHIII') # magic, version, record size, count, crc32, complete
+KEY = struct.Struct('<I')
+PROGRESS_PREFIX = 'chunk size '
+
+DEAL_SIZE = 6
+NUM_DISCARDS = 15
+NUM_FLIPS = len(DECK) - DEAL_SIZE
+NUM_SCORES = Discard.MAX_SCORE + 1
+DISCARD_RECORD = struct.Struct('<HBB{}B'.format(NUM_SCORES)) # total, min, max, histogram
+RECORD_SIZE = NUM_DISCARDS * DISCARD_RECORD.size
+
+BINOMIALS = [[binomial(c, i + 1) for c in range(len(DECK))] for i in range(DEAL_SIZE)]
+
+
+def deal_key(cards):
+    """ Returns the colex rank of a set of six cards, in 0..C(52, 6) - 1 """
+    return sum(BINOMIALS[i][index] for i, index in enumerate(sorted(c.index for c in cards)))
+
+
+def key_cards(key):
+    """ The inverse of deal_key, returns the cards sorted by index """
+    indexes = []
+    for i in range(DEAL_SIZE - 1, -1, -1):
+        index = i
+        while index + 1 < len(DECK) and BINOMIALS[i][index + 1] <= key:
+            index += 1
+        key -= BINOMIALS[i][index]
+        indexes.append(index)
+    return [DECK[index] for index in reversed(indexes)]
+
+
+def canonical_keys():
+    """
+    Returns the key of every suit-canonical deal, in ascending order.
+
+    canonicalize orders the suits by the ranks they hold, so the canonical
+    deals are the ones whose suits hold no more (as a bit mask of ranks) than
+    the suit before. They're built from those masks, one suit at a time,
+    rather than by canonicalizing all C(52, 6) deals.
+    """
+    masks = [[] for _ in range(DEAL_SIZE + 1)] # by number of ranks, ascending
+    for mask in range(1 << NUM_RANKS):
+        ranks = [rank for rank in range(NUM_RANKS) if mask >> rank & 1]
+        if len(ranks) <= DEAL_SIZE:
+            masks[len(ranks)].append((mask, ranks))
+
+    keys = []
+
+    def add_suit(suit, cards_left, largest, indexes):
+        if suit == NUM_SUITS - 1:
+            counts = [cards_left]
+        else:
+            counts = range(cards_left + 1)
+        for count in counts:
+            for mask, ranks in masks[count]:
+                if mask > largest:
+                    break
+                suit_indexes = indexes + [rank * NUM_SUITS + suit for rank in ranks]
+                if suit == NUM_SUITS - 1:
+                    keys.append(sum(BINOMIALS[i][index] for i, index in enumerate(sorted(suit_indexes))))
+                else:
+                    add_suit(suit + 1, cards_left - count, mask, suit_indexes)
+
+    add_suit(0, DEAL_SIZE, (1 << NUM_RANKS) - 1, [])
+    keys.sort()
+    return keys
+
+
+def pack_record(discard_stats):
+    return b''.join(DISCARD_RECORD.pack(discard.total, discard.min(), discard.max(), *discard.histogram)
+                    for discard in discard_stats)
+
+
+def _build_chunk(args):
+    chunk, keys = args
+    return chunk, b''.join(pack_record(cribbage_game.calculate_scores(key_cards(key), keep_flips=False)) for key in keys)
+
+
+def build(path, keys=None, processes=None, chunk_size=2000):
+    """
+    Builds (or carries on building) the table at path.
+
+    keys: iterable of int
+        deal_key of the canonical deals to include, all of them by default.
+        When carrying on, the ones being built unless given.
+    processes: int
+        Number of worker processes, one per core by default
+
+    An unfinished build is only carried on with the same chunk_size (the
+    progress is kept by chunk number) and keys, otherwise it starts over
+    (with the same keys unless others are given).
+    """
+    progress_path = path + '.progress'
+    if keys is not None:
+        keys = array('I', sorted(set(keys)))
+    progress = _read_progress(path, progress_path)
+    if progress is not None:
+        built_keys, built_chunk_size, done = progress
+        if keys is None:
+            keys = built_keys
+        if built_chunk_size != chunk_size or keys != built_keys:
+            progress = None
+    if progress is None:
+        if keys is None:
+            keys = array('I', canonical_keys())
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, len(keys), 0, 0))
+            f.write(keys.tostring())
+            f.truncate(HEADER.size + len(keys) * (KEY.size + RECORD_SIZE))
+        with open(progress_path, 'w') as f:
+            f.write('{}{}\n'.format(PROGRESS_PREFIX, chunk_size))
+        done = set()
+
+    chunks = [(chunk, keys[start:start + chunk_size])
+              for chunk, start in enumerate(range(0, len(keys), chunk_size)) if chunk not in done]
+
+    records_offset = HEADER.size + len(keys) * KEY.size
+    pool = multiprocessing.Pool(processes)
+    try:
+        with open(path, 'r+b') as f, open(progress_path, 'a') as progress:
+            for chunk, records in pool.imap_unordered(_build_chunk, chunks):
+                f.seek(records_offset + chunk * chunk_size * RECORD_SIZE)
+                f.write(records)
+                f.flush()
+                os.fsync(f.fileno())
+                progress.write('{}\n'.format(chunk))
+                progress.flush()
+    finally:
+        pool.close()
+        pool.join()
+
+    with open(path, 'r+b') as f:
+        crc = _checksum(f, len(keys))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, len(keys), crc, 1))
+    os.remove(progress_path)
+
+
+def _read_progress(path, progress_path):
+    """
+    Returns (keys, chunk_size, finished chunk numbers) of an unfinished build,
+    or None if there's none to carry on
+    """
+    header = _read_header(path) if os.path.exists(path) else None
+    if header is None or header[5] or not os.path.exists(progress_path):
+        return None
+    with open(progress_path) as f:
+        lines = f.read().splitlines()
+    if not lines or not lines[0].startswith(PROGRESS_PREFIX):
+        return None
+    chunk_size = int(lines[0][len(PROGRESS_PREFIX):])
+    keys = array('I')
+    with open(path, 'rb') as f:
+        f.seek(HEADER.size)
+        keys.fromstring(f.read(header[3] * KEY.size))
+    return keys, chunk_size, set(int(line) for line in lines[1:] if line.strip())
+
+
+def _read_header(path):
+    with open(path, 'rb') as f:
+        data = f.read(HEADER.size)
+    if len(data) != HEADER.size:
+        return None
+    header = HEADER.unpack(data)
+    if header[0] != MAGIC or header[1] != VERSION or header[2] != RECORD_SIZE:
+        return None
+    return header
+
+
+def _checksum(f, count, block_size=1 << 20):
+    f.seek(HEADER.size)
+    remaining = count * (KEY.size + RECORD_SIZE)
+    crc = 0
+    while remaining:
+        data = f.read(min(block_size, remaining))
+        crc = zlib.crc32(data, crc)
+        remaining -= len(data)
+    return crc & 0xffffffff
+
+
+class DealTable:
+    """
+    Read side of a table written by build. The file is memory mapped, so only
+    the pages a lookup touches are ever read in.
+    """
+    def __init__(self, path):
+        header = _read_header(path)
+        if header is None:
+            raise ValueError("{} is not a deal table".format(path))
+        if not header[5]:
+            raise ValueError("{} has not finished building".format(path))
+        self.count = header[3]
+        self.crc = header[4]
+        self.keys_offset = HEADER.size
+        self.records_offset = HEADER.size + self.count * KEY.size
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self.data.close()
+
+    def __len__(self):
+        return self.count
+
+    def verify(self, block_size=1 << 20):
+        """ Checks the keys and records against the checksum in the header """
+        crc = 0
+        end = self.records_offset + self.count * RECORD_SIZE
+        for start in range(HEADER.size, end, block_size):
+            crc = zlib.crc32(self.data[start:min(start + block_size, end)], crc)
+        return crc & 0xffffffff == self.crc
+
+    def find(self, key):
+        """
+        Returns the position of the deal with the given key, or None.
+
+        This is a binary search of the sorted keys rather than a position
+        worked out from the key: the canonical deals have no simple ranking,
+        and a table can be built from any subset of them. For the full table
+        (962,988 deals) that's at most 20 probes, about 35us or 5% of a lookup,
+        and a cold lookup reads about 10 of the 941 pages of keys.
+        """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(self.data, self.keys_offset + middle * KEY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and KEY.unpack_from(self.data, self.keys_offset + low * KEY.size)[0] == key:
+            return low
+        return None
+
+    def lookup(self, original_cards):
+        """
+        Returns the same stats as calculate_scores(original_cards, keep_flips=False),
+        or raises KeyError if the deal isn't in the table
+        """
+        canonical_cards, suit_map = canonicalize(original_cards)
+        position = self.find(deal_key(canonical_cards))
+        if position is None:
+            raise KeyError(", ".join(str(card) for card in original_cards))
+
+        offset = self.records_offset + position * RECORD_SIZE
+        by_cards = {}
+        for discard_combo in combinations(canonical_cards, 2):
+            fields = DISCARD_RECORD.unpack_from(self.data, offset)
+            by_cards[frozenset(relabel(discard_combo, suit_map))] = fields
+            offset += DISCARD_RECORD.size
+
+        discard_stats = []
+        for card1, card2 in combinations(original_cards, 2):
+            fields = by_cards[frozenset([card1, card2])]
+            kept_cards = [card for card in original_cards if card != card1 and card != card2]
+            discard_stats.append(Discard.from_histogram(card1, card2, fields[3:], kept_cards))
+        return discard_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or check the table of discard results for every deal")
+    subparsers = parser.add_subparsers(dest='command')
+    build_parser = subparsers.add_parser('build')
+    build_parser.add_argument('path')
+    build_parser.add_argument('--processes', type=int, default=None)
+    build_parser.add_argument('--chunk-size', type=int, default=2000)
+    verify_parser = subparsers.add_parser('verify')
+    verify_parser.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build(args.path, processes=args.processes, chunk_size=args.chunk_size)
+        print("Wrote {}".format(args.path))
+    else:
+        table = DealTable(args.path)
+        print("{} deals, checksum {}".format(len(table), "ok" if table.verify() else "MISMATCH"))
+
+
+if __name__ == '__main__':
+    main()
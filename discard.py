@@ -1,36 +1,237 @@
+import math
 import statistics
+from card_set import CardSet
+from crib import crib_expected_value, default_crib_table
+from hand import PartialHand
+from pegging import default_pegging_table, pegging_expected_value
 
 # This essentally maps two discards to a possible score for each discard, and
 # calculates stats based on those scores.
 # Pulled it into a separate object rather than a complicated dictionary as I may do more with this later.
-class Discard:
-    def __init__(self, card1, card2):
-        self.cards = [card1, card2]
+#
+# Scores are counted in a histogram (a hand can score 0..29) with the total,
+# min and max kept up to date as they're added, so none of the stats need to
+# go back over the scores. The flip card each score came from is only kept if
+# keep_flips is set.
+#
+# The discards also go into a crib, which counts for the dealer and against
+# the pone, so the dealer_ev/pone_ev stats add or take away its expected value.
+# They can also add the expected pegging points of the kept cards (see pegging).
+#
+# Variants where only one card is discarded (see variants) leave out card2.
+class Discard(object):
+    MAX_SCORE = 29
+    __slots__ = ('cards', 'kept_cards', 'keep_flips', 'excluded', 'histogram', 'count', 'total', 'min_score', 'max_score',
+                 '_possible_scores')
+
+    def __init__(self, card1, card2=None, keep_flips=True, kept_cards=None, excluded=()):
+        """
+        excluded: iterable of Card
+            Cards known not to be the flip card, which remove_flip won't take back
+        """
+        self.cards = [card1] if card2 is None else [card1, card2]
+        self.kept_cards = kept_cards # the cards left in the hand, if known
+        self.keep_flips = keep_flips
+        self.excluded = CardSet(excluded)
+        self.histogram = [0] * (Discard.MAX_SCORE + 1)
+        self.count = 0
+        self.total = 0
+        self.min_score = Discard.MAX_SCORE + 1
+        self.max_score = -1
         # Keeping track of the actual flip card associated with each score for future use
-        self.possible_scores = {} # hash of potential flip cards to their score
+        self._possible_scores = None # hash of potential flip cards to their score, made on the first add (or see from_histogram)
+
+    @classmethod
+    def from_histogram(cls, card1, card2, histogram, kept_cards=None, flip_scores=None):
+        """
+        Creates a discard from the number of flip cards giving each score.
+        flip_scores is a function returning possible_scores, which keeps the
+        flips without making them until they're first needed.
+        """
+        discard = cls(card1, card2, keep_flips=flip_scores is not None, kept_cards=kept_cards)
+        discard._possible_scores = flip_scores
+        scores = [score for score, count in enumerate(histogram) if count]
+        if scores:
+            discard.histogram[:len(histogram)] = histogram
+            discard.count = sum(histogram)
+            discard.total = sum([score * histogram[score] for score in scores])
+            discard.min_score = scores[0]
+            discard.max_score = scores[-1]
+        return discard
 
     def __str__(self):
-        return "{}, {}".format(str(self.cards[0]), str(self.cards[1]))
+        return ", ".join(str(card) for card in self.cards)
+
+    @property
+    def possible_scores(self):
+        possible_scores = self._flip_scores()
+        if possible_scores is None:
+            return {}
+        return possible_scores
+
+    def _flip_scores(self):
+        """ The scores of the flip cards if they're kept, else None """
+        if callable(self._possible_scores):
+            self._possible_scores = self._possible_scores()
+        return self._possible_scores
 
     def add(self, flip_card, score):
-        if flip_card in self.possible_scores:
-            raise RuntimeError("Cannot overwrite a previously calculated score for a given flip_card")
-        self.possible_scores[flip_card] = score
+        if self.keep_flips:
+            if self._possible_scores is None:
+                self._possible_scores = {}
+            elif callable(self._possible_scores):
+                self._flip_scores()
+            if flip_card in self._possible_scores:
+                raise RuntimeError("Cannot overwrite a previously calculated score for a given flip_card")
+            self._possible_scores[flip_card] = score
+        # Same as add_score(score), written out as this is called for every flip card
+        self.histogram[score] += 1
+        self.count += 1
+        self.total += score
+        if score < self.min_score:
+            self.min_score = score
+        if score > self.max_score:
+            self.max_score = score
+
+    def add_score(self, score, count=1):
+        """ Counts a score without recording which flip card it came from """
+        self.histogram[score] += count
+        self.count += count
+        self.total += score * count
+        if score < self.min_score:
+            self.min_score = score
+        if score > self.max_score:
+            self.max_score = score
+
+    def remove_flip(self, flip_card, score=None):
+        """
+        Takes back the score for a flip card that turns out not to be possible.
+        The score is the one recorded for the card if keep_flips is set, else
+        the given score, else it's worked out from the kept cards. Raises
+        KeyError if the card was already taken back or excluded.
+        """
+        if flip_card in self.excluded:
+            raise KeyError(flip_card)
+        if self._flip_scores() is not None:
+            if flip_card not in self._possible_scores:
+                raise KeyError(flip_card)
+            score = self._possible_scores.pop(flip_card)
+        elif score is None:
+            if self.kept_cards is None:
+                raise ValueError("The kept cards are needed to score the flip card")
+            if flip_card in self.kept_cards or flip_card in self.cards:
+                raise KeyError(flip_card)
+            score = PartialHand(self.kept_cards, len(self.kept_cards)).calculate_score(flip_card)
+        if not self.histogram[score]:
+            raise ValueError("No flip card scored {}".format(score))
+
+        self.excluded = self.excluded.add(flip_card)
+        self.histogram[score] -= 1
+        self.count -= 1
+        self.total -= score
+        if not self.count:
+            self.min_score = Discard.MAX_SCORE + 1
+            self.max_score = -1
+        elif not self.histogram[score]:
+            while not self.histogram[self.min_score]:
+                self.min_score += 1
+            while not self.histogram[self.max_score]:
+                self.max_score -= 1
 
     def scores(self):
-      return list(self.possible_scores.values())
+        if self._flip_scores() is not None:
+            return list(self._possible_scores.values())
+        scores = []
+        for score, count in enumerate(self.histogram):
+            scores.extend([score] * count)
+        return scores
 
     def mean(self):
-        return statistics.mean(self.scores())
+        if not self.count:
+            raise statistics.StatisticsError("mean requires at least one data point")
+        return float(self.total) / self.count
 
     def median(self):
-        return statistics.median(self.scores())
+        if not self.count:
+            raise statistics.StatisticsError("no median for empty data")
+        middle = self.count // 2
+        if self.count % 2:
+            return self._nth_score(middle)
+        return (self._nth_score(middle - 1) + self._nth_score(middle)) / 2.0
+
+    def _nth_score(self, n):
+        """ Returns the score at position n (from 0) if the scores were sorted """
+        for score, count in enumerate(self.histogram):
+            n -= count
+            if n < 0:
+                return score
 
     def mode(self):
-        return statistics.mode(self.scores())
+        most_common = max(self.histogram)
+        if not most_common:
+            raise statistics.StatisticsError("no mode for empty data")
+        if self.histogram.count(most_common) > 1:
+            raise statistics.StatisticsError("no unique mode; found {} equally common values".format(
+                self.histogram.count(most_common)))
+        return self.histogram.index(most_common)
+
+    def variance(self):
+        """ Variance of the scores over the flip cards (a population, like statistics.pvariance) """
+        if not self.count:
+            raise statistics.StatisticsError("pvariance requires at least one data point")
+        mean = self.mean()
+        return sum(count * (score - mean) ** 2 for score, count in enumerate(self.histogram) if count) / self.count
+
+    def stdev(self):
+        return math.sqrt(self.variance())
 
     def min(self):
-        return min(self.scores())
+        if not self.count:
+            raise ValueError("min() arg is an empty sequence")
+        return self.min_score
 
     def max(self):
-        return max(self.scores())
+        if not self.count:
+            raise ValueError("max() arg is an empty sequence")
+        return self.max_score
+
+    def crib_ev(self, conditioned=False):
+        """
+        Expected score of the crib these cards are discarded into. By default this
+        comes from the precomputed crib table; if conditioned is set it is worked
+        out with the kept cards removed from the possible crib and flip cards.
+        """
+        if len(self.cards) != 2:
+            raise ValueError("The crib is only worked out for two discarded cards")
+        if not conditioned:
+            return default_crib_table().expected_value(self.cards[0], self.cards[1])
+        if self.kept_cards is None:
+            raise ValueError("The kept cards are needed to condition the crib on them")
+        return crib_expected_value(self.cards, self.kept_cards)
+
+    def pegging_ev(self, dealer, conditioned=False):
+        """
+        Expected points pegged with the kept cards, less the opponent's. By
+        default this comes from the pegging table (searched for the first time
+        if it hasn't been built) with only the kept cards known; if conditioned
+        is set the discards are known as well.
+        """
+        if self.kept_cards is None:
+            raise ValueError("The kept cards are needed for the pegging value")
+        if conditioned:
+            return pegging_expected_value(self.kept_cards, dealer, self.cards + self.kept_cards)
+        return default_pegging_table().expected_value(self.kept_cards, dealer)
+
+    def dealer_ev(self, conditioned=False, pegging=False):
+        """ Expected points of the hand plus the crib (and pegging if set), for the dealer """
+        value = self.mean() + self.crib_ev(conditioned)
+        if pegging:
+            value += self.pegging_ev(True, conditioned)
+        return value
+
+    def pone_ev(self, conditioned=False, pegging=False):
+        """ Expected points of the hand minus the dealer's crib (plus pegging if set), for the pone """
+        value = self.mean() - self.crib_ev(conditioned)
+        if pegging:
+            value += self.pegging_ev(False, conditioned)
+        return value
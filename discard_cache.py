@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from card_set import CardSet
+from canonical import canonicalize, histogram_form, restore_discards
+import cribbage_game
+
+class DiscardCache:
+    """
+    A size bounded LRU cache of calculate_scores results, keyed on the
+    suit-canonical form of the deal so that deals which only differ by their
+    suits share one entry. Entries are kept in histogram form (see
+    canonical.histogram_form), so a hit only builds the 15 discards from their
+    histograms and relabels the flip cards if they're used.
+    """
+    def __init__(self, maxsize=4096, calculate_scores=None):
+        """
+        maxsize: int
+            Number of canonical deals to keep before evicting the least recently used
+        calculate_scores: function
+            Used to analyse deals that aren't cached, cribbage_game.calculate_scores
+            (as it is when called, so instrumentation sees it) by default
+        """
+        if maxsize < 1:
+            raise ValueError("Cache must hold at least one deal")
+        self.maxsize = maxsize
+        self.calculate_scores_uncached = calculate_scores
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def calculate_scores(self, original_cards):
+        """ Same as cribbage_game.calculate_scores, but answered from the cache where possible """
+        canonical_cards, suit_map = canonicalize(original_cards)
+        key = CardSet(canonical_cards).bits
+
+        discards = self.entries.pop(key, None)
+        if discards is None:
+            self.misses += 1
+            calculate_scores = self.calculate_scores_uncached or cribbage_game.calculate_scores
+            discards = histogram_form(calculate_scores(canonical_cards))
+            if len(self.entries) >= self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.hits += 1
+        self.entries[key] = discards
+
+        return restore_discards(discards, suit_map, original_cards)
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
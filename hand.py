@@ -1,28 +1,43 @@
-from itertools import combinations
 from collections import Counter
 from card import Card
 
+HAND_SIZE = 4 # cards kept, not counting the flip card (five-card cribbage keeps 3)
+
 class Hand:
-    def __init__(self, cards, flip_card):
-        Hand.validate_hand_input(cards, flip_card)
+    """
+    Pairs, runs and 15s are all counted from the number of cards of each rank
+    (and the card values), so scoring a hand never has to build combinations
+    of the cards.
+    """
+    def __init__(self, cards, flip_card, size=HAND_SIZE):
+        Hand.validate_hand_input(cards, flip_card, size)
         self.cards = cards
         self.flip_card = flip_card
-        self.all_sorted_cards = self.sort_all_cards() # sorted cards + flip_card
+        # Number of cards of each rank, indexed by Card.numerical_order
+        self.rank_counts = [0] * len(Card.RANK_MAPPINGS)
+        for card in cards:
+            self.rank_counts[card.numerical_order] += 1
+        self.rank_counts[flip_card.numerical_order] += 1
 
     @staticmethod
-    def validate_hand_input(cards, flip_card):
-        if len(cards) != 4:
-            raise ValueError("Hand must contain 4 cards")
+    def validate_hand_input(cards, flip_card, size=HAND_SIZE):
+        if len(cards) != size:
+            raise ValueError("Hand must contain {} cards".format(size))
         if not isinstance(flip_card, Card):
             raise TypeError("The given flip card must be of type Card")
 
+    @property
+    def all_sorted_cards(self):
+        """ sorted cards + flip_card """
+        return self.sort_all_cards()
+
     def sort_all_cards(self):
         """
-        Sorts the four main cards and the flip card in order of rank (as defined
+        Sorts the main cards and the flip card in order of rank (as defined
         by Card.RANK_MAPPINGS) from lowest rank to highest rank
         """
         all_cards = self.cards + [self.flip_card]
-        return sorted(all_cards, key=lambda x: Card.RANK_MAPPINGS.keys().index(x.rank))
+        return sorted(all_cards, key=lambda x: x.numerical_order)
 
     def calculate_score(self):
         """ Sums up all the points to calculate the total score of the hand """
@@ -35,63 +50,31 @@ class Hand:
         return score
 
     def calculate_pairs(self):
-        """ Calculates the total score of all pairs """
-        all_combinations = combinations(self.all_sorted_cards, 2)
+        """ Calculates the total score of all pairs (2 points for each pair of cards of a rank) """
         score = 0
-        for c in all_combinations:
-            if c[0].rank == c[1].rank:
-                score += 2
+        for count in self.rank_counts:
+            score += count * (count - 1)
         return score
 
     def calculate_runs(self):
         """ Calculates the total score of all runs/run combinations """
-        run = [self.all_sorted_cards[0]]
-
-        index = 1
-        while index < len(self.all_sorted_cards):
-            current_card = self.all_sorted_cards[index]
-            previous_run_card = run[-1]
-
-            if previous_run_card.next_rank() == current_card.rank:
-                run.append(current_card)
-            elif previous_run_card.rank != current_card.rank:
-                if len(run) < 3: # We don't already have a run, so safe to reset & start over
-                    run = [current_card]
-                else:
-                    break
-            index += 1
-
-        # Count number of duplicates
-        if len(run) >= 3:
-            multiplier = 0
-            for card in run:
-                count = map(lambda x: x.rank, self.all_sorted_cards).count(card.rank)
-                if count > 1:
-                  multiplier += count
-
-            if multiplier > 0:
-              return len(run) * multiplier
-
-            return len(run)
-        else:
-            return 0
+        return calculate_runs_from_counts(self.rank_counts)
 
     def calculate_15s(self):
         """ Calculates the total score of all cards adding up to 15 (2 points each) """
-        score = 0
-        for i in range(2, len(self.all_sorted_cards)+1):
-            for subset in combinations(self.all_sorted_cards, i):
-                if sum(c.value for c in subset) == 15:
-                    score += 2
-        return score
+        sums = count_subset_sums(self.cards)
+        # Subsets including the flip card are the subsets of the other cards adding up to 15 - its value
+        return 2 * (sums[15] + sums[15 - self.flip_card.value])
 
     def calculate_suit(self):
         """ Calculates the points allotted to having cards of the same suit """
-        if self.cards[0].suit == self.cards[1].suit == self.cards[2].suit == self.cards[3].suit:
-            if self.cards[0].suit == self.flip_card.suit:
-                return 5
-            return 4
-        return 0
+        suit = self.cards[0].suit
+        for card in self.cards:
+            if card.suit != suit:
+                return 0
+        if suit == self.flip_card.suit:
+            return len(self.cards) + 1
+        return len(self.cards)
 
     def calculate_nobs(self):
         """
@@ -102,3 +85,99 @@ class Hand:
             if card.rank == 'J' and card.suit == self.flip_card.suit:
                 return 1
         return 0
+
+
+class PartialHand:
+    """
+    The cards kept in a hand before the flip card is known. Everything
+    that doesn't depend on the flip card is worked out once, so scoring each
+    possible flip card afterwards is just a couple of lookups.
+    """
+    def __init__(self, cards, size=HAND_SIZE):
+        PartialHand.validate_partial_hand_input(cards, size)
+        self.cards = cards
+
+        # Number of cards of each rank, indexed by Card.numerical_order
+        self.rank_counts = [0] * len(Card.RANK_MAPPINGS)
+        for card in cards:
+            self.rank_counts[card.numerical_order] += 1
+        # Number of subsets of the cards (including the empty one) adding up to each total up to 15
+        self.subset_sums = count_subset_sums(cards)
+
+        # The suit all the cards share, or None if they aren't a flush
+        self.flush_suit = cards[0].suit
+        for card in cards:
+            if card.suit != self.flush_suit:
+                self.flush_suit = None
+
+        runs = calculate_runs_from_counts(self.rank_counts)
+        self.score = sum(c * (c - 1) for c in self.rank_counts) + runs + 2 * self.subset_sums[15]
+        if self.flush_suit is not None:
+            self.score += len(cards)
+
+        # Points the flip card adds for its rank (pairs, runs and 15s) and for its suit (flush and nobs)
+        self.rank_deltas = []
+        counts = [0] + self.rank_counts + [0]
+        for numerical_order, value in enumerate(Card.RANK_MAPPINGS.values()):
+            delta = 2 * self.rank_counts[numerical_order] + 2 * self.subset_sums[15 - value]
+            # A flip card can only change the runs if it touches one of the cards
+            if counts[numerical_order] or counts[numerical_order + 1] or counts[numerical_order + 2]:
+                self.rank_counts[numerical_order] += 1
+                delta += calculate_runs_from_counts(self.rank_counts) - runs
+                self.rank_counts[numerical_order] -= 1
+            self.rank_deltas.append(delta)
+        self.suit_deltas = [0] * len(Card.VALID_SUITS)
+        if self.flush_suit is not None:
+            self.suit_deltas[cards[0].suit_index] += 1
+        for card in cards:
+            if card.rank == 'J':
+                self.suit_deltas[card.suit_index] += 1
+
+    @staticmethod
+    def validate_partial_hand_input(cards, size=HAND_SIZE):
+        if len(cards) != size:
+            raise ValueError("Hand must contain {} cards".format(size))
+
+    def calculate_flip_delta(self, flip_card):
+        """ Returns the points the given flip card adds to the score of the kept cards """
+        return self.rank_deltas[flip_card.numerical_order] + self.suit_deltas[flip_card.suit_index]
+
+    def calculate_score(self, flip_card):
+        """ Same as Hand(self.cards, flip_card).calculate_score() """
+        return self.score + self.rank_deltas[flip_card.numerical_order] + self.suit_deltas[flip_card.suit_index]
+
+
+def calculate_runs_from_counts(rank_counts):
+    """
+    Calculates the total score of all runs from the number of cards of each
+    rank: every stretch of at least three consecutive ranks scores its length
+    times the number of ways to pick one card of each rank
+    """
+    score = 0
+    length = 0
+    combos = 1
+    for count in rank_counts:
+        if count:
+            length += 1
+            combos *= count
+        else:
+            if length >= 3:
+                score += length * combos
+            length = 0
+            combos = 1
+    if length >= 3:
+        score += length * combos
+    return score
+
+
+def count_subset_sums(cards, target=15):
+    """
+    Returns a list with the number of subsets of the cards (including the
+    empty one) whose values add up to each total from 0 to target
+    """
+    sums = [1] + [0] * target
+    for card in cards:
+        value = card.value
+        for total in xrange(target, value - 1, -1):
+            sums[total] += sums[total - value]
+    return sums
@@ -0,0 +1,176 @@
+import cProfile
+import json
+import sys
+import threading
+import timeit
+from functools import wraps
+from hand import Hand, PartialHand
+from discard import Discard
+from discard_cache import DiscardCache
+import cribbage_game
+try:
+    import batch_scoring
+except ImportError:
+    batch_scoring = None
+
+# Opt-in timing of the scoring components and the stages of calculate_scores.
+# Nothing is wrapped until enable() is called, and disable() puts the original
+# functions back, so when it's off there is no cost at all.
+#
+# Each wrapped function counts its calls and adds up the time spent in it, in
+# nanoseconds (from the best timer Python 2 has, so microsecond resolution).
+# Nested stages each count their own time: calculate_scores includes the time
+# of the PartialHand and Discard calls it makes. With numpy the stages of
+# batch_scoring are timed too.
+
+# (owner, attribute, name to report it under)
+TARGETS = [
+    (Hand, 'calculate_score', 'hand.calculate_score'),
+    (Hand, 'calculate_pairs', 'hand.calculate_pairs'),
+    (Hand, 'calculate_runs', 'hand.calculate_runs'),
+    (Hand, 'calculate_15s', 'hand.calculate_15s'),
+    (Hand, 'calculate_suit', 'hand.calculate_suit'),
+    (Hand, 'calculate_nobs', 'hand.calculate_nobs'),
+    (PartialHand, '__init__', 'partial_hand.init'),
+    (PartialHand, 'calculate_score', 'partial_hand.calculate_score'),
+    (Discard, 'add', 'discard.add'),
+    (Discard, 'mean', 'discard.mean'),
+    (Discard, 'median', 'discard.median'),
+    (Discard, 'mode', 'discard.mode'),
+    (Discard, 'min', 'discard.min'),
+    (Discard, 'max', 'discard.max'),
+    (Discard, 'crib_ev', 'discard.crib_ev'),
+    (cribbage_game, 'remaining_cards_in_deck', 'cribbage_game.remaining_cards_in_deck'),
+    (cribbage_game, 'calculate_scores', 'cribbage_game.calculate_scores'),
+    (cribbage_game, 'best_mean_discard', 'cribbage_game.best_mean_discard'),
+    (DiscardCache, 'calculate_scores', 'discard_cache.calculate_scores'),
+]
+if batch_scoring is not None:
+    TARGETS += [
+        (batch_scoring, 'calculate_scores', 'batch_scoring.calculate_scores'),
+        (batch_scoring, 'score_matrices', 'batch_scoring.score_matrices'),
+        (batch_scoring, 'flip_cards', 'batch_scoring.flip_cards'),
+        (batch_scoring, '_rank_points', 'batch_scoring.rank_points'),
+        (batch_scoring, '_calculate_15s', 'batch_scoring.calculate_15s'),
+        (batch_scoring, '_calculate_runs', 'batch_scoring.calculate_runs'),
+        (batch_scoring, '_suit_points', 'batch_scoring.suit_points'),
+        (batch_scoring, 'score_histograms', 'batch_scoring.score_histograms'),
+        (batch_scoring, 'histogram_discards', 'batch_scoring.histogram_discards'),
+    ]
+
+_originals = {}
+_stats = {} # name: [calls, total ns, max ns]
+_lock = threading.Lock()
+
+
+def _timed(name, function):
+    timer = timeit.default_timer
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start = timer()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = int((timer() - start) * 1e9)
+            with _lock:
+                stats = _stats.get(name)
+                if stats is None:
+                    stats = _stats[name] = [0, 0, 0]
+                stats[0] += 1
+                stats[1] += elapsed
+                if elapsed > stats[2]:
+                    stats[2] = elapsed
+    return wrapper
+
+
+def enable():
+    """ Starts timing every function in TARGETS """
+    for owner, attribute, name in TARGETS:
+        if name in _originals:
+            continue
+        # Taken from __dict__ so methods are wrapped as plain functions
+        function = owner.__dict__[attribute]
+        _originals[name] = function
+        setattr(owner, attribute, _timed(name, function))
+
+
+def disable():
+    """ Puts the original functions back. The stats collected so far are kept. """
+    for owner, attribute, name in TARGETS:
+        if name in _originals:
+            setattr(owner, attribute, _originals.pop(name))
+
+
+def enabled():
+    return bool(_originals)
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def snapshot():
+    """
+    Returns {name: {"calls", "total_ns", "mean_ns", "max_ns"}} for every
+    function called since the stats were last reset
+    """
+    with _lock:
+        stats = dict((name, list(values)) for name, values in _stats.items())
+    return dict((name, {
+        'calls': calls,
+        'total_ns': total,
+        'mean_ns': total // calls,
+        'max_ns': longest,
+    }) for name, (calls, total, longest) in stats.items())
+
+
+class PeriodicDump(object):
+    """ Writes a snapshot as a line of JSON to a file every interval seconds until stopped """
+    def __init__(self, interval, output=sys.stderr):
+        self.interval = interval
+        self.output = output
+        self._timer = None
+        self._stopped = False
+
+    def start(self):
+        self._schedule()
+        return self
+
+    def _schedule(self):
+        self._timer = threading.Timer(self.interval, self._dump)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _dump(self):
+        if self._stopped:
+            return
+        self.dump()
+        self._schedule()
+
+    def dump(self):
+        self.output.write(json.dumps(snapshot(), sort_keys=True) + '\n')
+        self.output.flush()
+
+    def stop(self):
+        self._stopped = True
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+def dump_periodically(interval, output=sys.stderr):
+    """ Starts a PeriodicDump, call stop() on the result to end it """
+    return PeriodicDump(interval, output).start()
+
+
+def profile(path, function, *args, **kwargs):
+    """
+    Calls function(*args, **kwargs) under cProfile, saves the profile to path
+    (it can be read with pstats) and returns the function's result
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        profiler.dump_stats(path)
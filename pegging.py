@@ -0,0 +1,361 @@
+import argparse
+import multiprocessing
+import os
+from array import array
+from itertools import combinations_with_replacement
+from card import Card, DECK
+from score_table import ScoreTable, binomial
+
+# Scoring for the play (pegging), and the expected points a kept hand pegs.
+#
+# Only ranks matter in the play. The expected value comes from an expectimax
+# search over the whole play: on our turn we play the card that does best,
+# and the opponent is a chance node. We don't know their cards, so they're
+# modelled as draws from the ranks we haven't seen: they can play if any of
+# their cards fits under 31 (from the hypergeometric distribution), and then
+# play each rank that fits in proportion to how many of it are unseen. The
+# value is our points less the opponent's.
+#
+# Future points only depend on the count, how many cards of the last rank
+# were just played in a row (for pairs) and the cards since the last repeated
+# rank (the only ones a run can use), so that's all a search state keeps of
+# the cards played. States are memoized on one int made from our ranks and
+# the unseen ranks (as base 5 counts), those cards (4 bits each), the count,
+# whose turn it is and whether the other player has said go.
+#
+# The search keeps the memo between hands with the same known cards, so the
+# 15 keeps of a deal share the states they reach in common. Run tails are cut
+# to the cards a run could still use, the unseen cards are left out of the
+# key once the opponent has none, and the opponent's last card is valued
+# once for every set of unseen cards it could come from. A hand takes a
+# tenth of a second or so, and a few seconds at most for all 15 keeps.
+#
+# PeggingTable holds the value of every four ranks we could keep, with only
+# those four cards known, for instant lookups. Without a saved table the
+# default one fills in each value the first time it's looked up.
+# Conditioning on the discards as well needs a search.
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pegging_table.bin')
+
+NUM_RANKS = len(Card.RANK_MAPPINGS)
+VALUES = list(Card.RANK_MAPPINGS.values())
+HAND_SIZE = 4
+TARGET = 31
+ME = 0
+OPPONENT = 1
+
+# Ranks are in order of value, so the ones that fit under 31 are a prefix
+FITTING_RANKS = [sum(1 for value in VALUES if count + value <= TARGET) for count in range(TARGET + 1)]
+# BINOMIALS[n][k] for the opponent's hand of up to four unseen cards
+BINOMIALS = [[binomial(n, k) for k in range(HAND_SIZE + 1)] for n in range(len(DECK) + 1)]
+
+COUNT_BASE = 5 # at most 4 cards of a rank
+RANK_WEIGHTS = [COUNT_BASE ** rank for rank in range(NUM_RANKS)]
+HAND_CODES = COUNT_BASE ** NUM_RANKS
+
+
+def play_points(sequence):
+    """
+    Points for playing the last card of sequence, the ranks (numerical_order)
+    played since the count was last reset: 15s and 31s, pairs (2 for a pair, 6
+    for three of a kind, 12 for four) and runs of 3 or more in any order
+    """
+    count = 0
+    for rank in sequence:
+        count += VALUES[rank]
+    points = 2 if count == 15 or count == TARGET else 0
+
+    same = 1
+    while same < len(sequence) and sequence[-same - 1] == sequence[-1]:
+        same += 1
+    return points + same * (same - 1) + _run_points(sequence)
+
+
+def _run_points(sequence):
+    for length in range(len(sequence), 2, -1):
+        tail = sequence[-length:]
+        if max(tail) - min(tail) == length - 1 and len(set(tail)) == length:
+            return length
+    return 0
+
+
+_run_tails = {}
+
+def _run_tail(tail, cards_left, count):
+    """
+    The part of tail a later run could still use. A run with more of tail
+    needs the ranks missing between its cards (or one next to them if there
+    are none) played under 31 by the cards left, so the cards before the
+    longest suffix that can be completed that way are dropped.
+    """
+    key = (tail, cards_left, count)
+    result = _run_tails.get(key)
+    if result is None:
+        result = tail[-1:]
+        for start in range(len(tail) - 1):
+            suffix = tail[start:]
+            low, high = min(suffix), max(suffix)
+            missing = [VALUES[rank] for rank in range(low, high + 1) if rank not in suffix]
+            if not missing:
+                missing = [min(VALUES[rank] for rank in (low - 1, high + 1) if 0 <= rank < NUM_RANKS)]
+            if len(missing) <= cards_left and sum(missing) <= TARGET - count:
+                result = suffix
+                break
+        _run_tails[key] = result
+    return result
+
+
+class PeggingEngine(object):
+    def __init__(self, known_cards):
+        """
+        known_cards: list of Card
+            The cards we've seen, which the opponent can't hold (the six dealt
+            cards, or just the kept ones)
+        """
+        self.unseen = [len(Card.VALID_SUITS)] * NUM_RANKS
+        for card in known_cards:
+            self.unseen[card.numerical_order] -= 1
+        self.unseen_total = sum(self.unseen)
+        self.mine = [0] * NUM_RANKS
+        self.memo = {}
+        self.last_card = {} # state: value of the opponent playing each rank as their last card
+
+    def expected_value(self, kept_cards, dealer):
+        """
+        Expected points we peg less the points the opponent pegs, holding
+        kept_cards. The pone plays first.
+        """
+        for rank in range(NUM_RANKS):
+            self.mine[rank] = 0
+        mine_code = 0
+        for card in kept_cards:
+            self.mine[card.numerical_order] += 1
+            mine_code += RANK_WEIGHTS[card.numerical_order]
+        unseen_code = sum(count * weight for count, weight in zip(self.unseen, RANK_WEIGHTS))
+        turn = OPPONENT if dealer else ME
+        return self._value(mine_code, unseen_code, (), 0, 0, len(kept_cards), HAND_SIZE, turn, False)
+
+    def _play(self, player, rank, mine_code, unseen_code, tail, same, count, my_left, opponent_left, passed):
+        """ Points for player playing rank (ours positive), plus the value of the rest of the play """
+        count += VALUES[rank]
+        if tail and tail[-1] == rank:
+            same += 1
+            tail = (rank,)
+        else:
+            same = 1
+            if rank in tail:
+                tail = tail[tail.index(rank) + 1:]
+            tail += (rank,)
+        points = same * (same - 1)
+        if count == 15 or count == TARGET:
+            points += 2
+        if len(tail) >= 3:
+            points += _run_points(tail)
+        if player == OPPONENT:
+            points = -points
+
+        if not my_left and not opponent_left:
+            if count != TARGET:
+                points += 1 if player == ME else -1 # last card
+            return points
+        if len(tail) > 1:
+            tail = _run_tail(tail, my_left + opponent_left, count)
+        if same > 1 and not self.mine[rank] and not (opponent_left and self.unseen[rank]):
+            same = 1 # nobody can make it another pair
+        if count == TARGET:
+            return points + self._value(mine_code, unseen_code, (), 0, 0, my_left, opponent_left, 1 - player, False)
+        if passed:
+            # The other player has said go, so this player carries on
+            return points + self._value(mine_code, unseen_code, tail, same, count, my_left, opponent_left, player, True)
+        return points + self._value(mine_code, unseen_code, tail, same, count, my_left, opponent_left, 1 - player, False)
+
+    def _cannot_play(self, player, mine_code, unseen_code, tail, same, count, my_left, opponent_left, passed):
+        if passed:
+            # Neither player can go on, and this player played the last card
+            go = 1 if player == ME else -1
+            return go + self._value(mine_code, unseen_code, (), 0, 0, my_left, opponent_left, 1 - player, False)
+        return self._value(mine_code, unseen_code, tail, same, count, my_left, opponent_left, 1 - player, True)
+
+    def _value(self, mine_code, unseen_code, tail, same, count, my_left, opponent_left, turn, passed):
+        tail_code = 0
+        for rank in tail:
+            tail_code = (tail_code << 4) + rank + 1
+        # Once the opponent is out of cards the unseen ones no longer matter
+        state = ((mine_code * HAND_CODES << 32 | tail_code) << 5 | count) << 5 | same << 2 | turn << 1 | passed
+        key = state + (unseen_code << 42 if opponent_left else 0)
+        value = self.memo.get(key)
+        if value is not None:
+            return value
+
+        mine = self.mine
+        unseen = self.unseen
+        if turn == ME:
+            value = None
+            for rank in range(FITTING_RANKS[count]):
+                if mine[rank]:
+                    mine[rank] -= 1
+                    option = self._play(ME, rank, mine_code - RANK_WEIGHTS[rank], unseen_code, tail, same, count,
+                                        my_left - 1, opponent_left, passed)
+                    mine[rank] += 1
+                    if value is None or option > value:
+                        value = option
+            if value is None:
+                value = self._cannot_play(ME, mine_code, unseen_code, tail, same, count, my_left, opponent_left, passed)
+        else:
+            fitting_ranks = FITTING_RANKS[count]
+            fitting = sum(unseen[:fitting_ranks])
+            can_play = 0.0
+            if opponent_left and fitting:
+                total = self.unseen_total - (HAND_SIZE - opponent_left)
+                can_play = 1.0 - float(BINOMIALS[total - fitting][opponent_left]) / BINOMIALS[total][opponent_left]
+
+            value = 0.0
+            if can_play and opponent_left == 1:
+                # What the opponent's last card is worth doesn't depend on the
+                # other unseen cards, only how likely it is, so it's shared
+                # by every state that only differs by them
+                last_card = self.last_card.get(state)
+                if last_card is None:
+                    last_card = self.last_card[state] = [None] * fitting_ranks
+                for rank in range(fitting_ranks):
+                    if unseen[rank]:
+                        if last_card[rank] is None:
+                            last_card[rank] = self._play(OPPONENT, rank, mine_code, 0, tail, same, count, my_left, 0,
+                                                         passed)
+                        value += can_play * unseen[rank] / fitting * last_card[rank]
+            elif can_play:
+                for rank in range(fitting_ranks):
+                    if unseen[rank]:
+                        probability = can_play * unseen[rank] / fitting
+                        unseen[rank] -= 1
+                        value += probability * self._play(OPPONENT, rank, mine_code, unseen_code - RANK_WEIGHTS[rank],
+                                                          tail, same, count, my_left, opponent_left - 1, passed)
+                        unseen[rank] += 1
+            if can_play < 1.0:
+                value += (1.0 - can_play) * self._cannot_play(OPPONENT, mine_code, unseen_code, tail, same, count,
+                                                              my_left, opponent_left, passed)
+
+        self.memo[key] = value
+        return value
+
+
+_engine = None
+
+def engine_for(known_cards):
+    """ Returns an engine for the known cards, reusing the last one (and its memo) if they're the same """
+    global _engine
+    known = frozenset(known_cards)
+    if _engine is None or _engine[0] != known:
+        _engine = (known, PeggingEngine(known_cards))
+    return _engine[1]
+
+
+def pegging_expected_value(kept_cards, dealer, known_cards=None):
+    """
+    Expected pegging points (ours less the opponent's) holding kept_cards.
+
+    known_cards: list of Card
+        All the cards we've seen, including kept_cards (just kept_cards by default)
+    """
+    return engine_for(known_cards or kept_cards).expected_value(kept_cards, dealer)
+
+
+class PeggingTable:
+    """
+    Expected pegging value of every multiset of four kept ranks, as the pone
+    and as the dealer, with only the kept cards known
+    """
+    TABLE_SIZE = binomial(NUM_RANKS + HAND_SIZE - 1, HAND_SIZE)
+
+    def __init__(self, values):
+        """
+        values: array('d')
+            Expected values, indexed by PeggingTable.index (NaN for ones to
+            search for when they're first looked up)
+        """
+        if len(values) != 2 * PeggingTable.TABLE_SIZE:
+            raise ValueError("Pegging table must contain {} entries".format(2 * PeggingTable.TABLE_SIZE))
+        self.values = values
+
+    @staticmethod
+    def index(ranks, dealer):
+        """ Position of a multiset of four ranks (numerical_order values, any order) """
+        return 2 * ScoreTable.index(ranks) + (1 if dealer else 0)
+
+    @classmethod
+    def build(cls, processes=None):
+        pool = multiprocessing.Pool(processes)
+        try:
+            tasks = [(multiset, dealer) for multiset in _four_of_a_kind_at_most(HAND_SIZE) for dealer in (False, True)]
+            values = array('d', [0.0] * (2 * cls.TABLE_SIZE))
+            for (multiset, dealer), value in zip(tasks, pool.imap(_table_value, tasks)):
+                values[cls.index(multiset, dealer)] = value
+        finally:
+            pool.close()
+            pool.join()
+        return cls(values)
+
+    @classmethod
+    def empty(cls):
+        """ A table with no values yet, which are searched for as they're looked up """
+        return cls(array('d', [float('nan')] * (2 * cls.TABLE_SIZE)))
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        values = array('d')
+        with open(path, 'rb') as f:
+            values.fromstring(f.read())
+        return cls(values)
+
+    def save(self, path=DEFAULT_PATH):
+        with open(path, 'wb') as f:
+            f.write(self.values.tostring())
+
+    def expected_value(self, kept_cards, dealer):
+        ranks = [card.numerical_order for card in kept_cards]
+        index = PeggingTable.index(ranks, dealer)
+        value = self.values[index]
+        if value != value:
+            value = self.values[index] = _table_value((tuple(sorted(ranks)), dealer))
+        return value
+
+
+def _four_of_a_kind_at_most(size):
+    for multiset in combinations_with_replacement(range(NUM_RANKS), size):
+        if max(multiset.count(rank) for rank in multiset) <= len(Card.VALID_SUITS):
+            yield multiset
+
+
+def _table_value(args):
+    multiset, dealer = args
+    # Suits don't matter, the cards just need to be different
+    kept_cards = [DECK[rank * len(Card.VALID_SUITS) + multiset[:i].count(rank)] for i, rank in enumerate(multiset)]
+    return PeggingEngine(kept_cards).expected_value(kept_cards, dealer)
+
+
+_default_pegging_table = None
+
+def default_pegging_table():
+    """
+    Returns the shared pegging table, loading it from DEFAULT_PATH if it has
+    been written there and filling it in as it's used otherwise
+    """
+    global _default_pegging_table
+    if _default_pegging_table is None:
+        if os.path.exists(DEFAULT_PATH):
+            _default_pegging_table = PeggingTable.load(DEFAULT_PATH)
+        else:
+            _default_pegging_table = PeggingTable.empty()
+    return _default_pegging_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the table of expected pegging values")
+    parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default one per core)")
+    args = parser.parse_args()
+    PeggingTable.build(args.processes).save(args.path)
+    print("Wrote pegging table to {}".format(args.path))
+
+
+if __name__ == '__main__':
+    main()
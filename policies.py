@@ -0,0 +1,45 @@
+from collections import OrderedDict
+import statistics
+
+# Discard policies: each takes the list of Discard stats for a deal (as returned
+# by calculate_scores) and picks one of them. Ties go to the first discard in
+# the list, like max().
+RISK_AVERSION = 0.5
+
+POLICIES = OrderedDict()
+
+
+def register_policy(name, policy):
+    """
+    policy: function(discard_stats)
+        Returns the Discard to play
+    """
+    POLICIES[name] = policy
+
+
+def best_by(stat):
+    """ Returns a policy picking the discard with the highest stat(discard) """
+    def policy(discard_stats):
+        return max(discard_stats, key=stat)
+    return policy
+
+
+def risk_adjusted(risk_aversion=RISK_AVERSION):
+    """ Returns a policy picking the highest mean less risk_aversion standard deviations """
+    return best_by(lambda s: s.mean() - risk_aversion * s.stdev())
+
+
+def most_common_score(discard):
+    """ The discard's mode, or the highest of its most common scores when there's a tie """
+    try:
+        return discard.mode()
+    except statistics.StatisticsError:
+        most_common = max(discard.histogram)
+        return max(score for score, count in enumerate(discard.histogram) if count == most_common)
+
+
+register_policy('mean', best_by(lambda s: s.mean()))
+register_policy('max', best_by(lambda s: s.max()))
+register_policy('median', best_by(lambda s: s.median()))
+register_policy('risk_adjusted', risk_adjusted())
+register_policy('mode', best_by(most_common_score))
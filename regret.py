@@ -0,0 +1,357 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import timeit
+from collections import Counter
+from itertools import combinations
+from card import DECK
+from policies import POLICIES
+import cribbage_game
+
+# Measures how many points each discard policy gives up over many deals,
+# either every possible deal or a random sample of them.
+#
+# A policy's regret on a deal is counted two ways:
+#   expected:  the best mean score of any discard less the mean score of the
+#              policy's discard, what it loses before the flip is known
+#   hindsight: the average over the flips of the best score any discard gets
+#              with that flip, less the policy's, what it loses against a
+#              player who could see the flip
+# Both are sums over the 46 flip cards, so they are whole numbers of 1/46
+# points. Each is counted in a sparse histogram ({units: deals}) per rank
+# pattern of the deal and per policy, so nothing is kept per deal.
+#
+# The deals are split into chunks which the workers reduce to histograms and
+# the parent merges as they come back. A sampled chunk deals from its own RNG
+# seeded from the run's seed and the chunk number (like simulator), and an
+# exhaustive chunk is all the deals whose three lowest cards are a given
+# three, so the results don't depend on the number of processes. The merged
+# histograms and the list of finished chunks are saved to a checkpoint every
+# so often, to resume an interrupted run from, and the checkpoints of runs
+# over different shards of the chunks can be merged.
+DEAL_SIZE = 6
+NUM_FLIPS = len(DECK) - DEAL_SIZE
+SEED_STRIDE = 1000003
+DEFAULT_POLICIES = ('mean', 'max', 'median', 'mode')
+REGRETS = ('expected', 'hindsight')
+VERSION = 1
+
+# The three lowest card indexes of the deals in each exhaustive chunk
+LOWEST_CARDS = list(combinations(range(len(DECK)), 3))
+
+
+def rank_counts(cards):
+    """ How many of each rank the deal has, most first, e.g. '2-2-1-1' for two pairs """
+    return '-'.join(str(count) for count in sorted(Counter(card.rank for card in cards).values(), reverse=True))
+
+
+def ranks(cards):
+    """ The deal's ranks in order, e.g. 'A 5 5 J Q K' """
+    return ' '.join(card.rank for card in sorted(cards, key=lambda card: card.numerical_order))
+
+# name: function(cards) returning the pattern of a deal
+PATTERNS = {'counts': rank_counts, 'ranks': ranks}
+
+
+def new_settings(deals=None, seed=0, chunk_size=2000, pattern='counts', policy_names=DEFAULT_POLICIES):
+    """
+    The settings of a run, saved with its checkpoints. Without deals every
+    possible deal is analyzed, and chunk_size is only how many are scored at
+    once.
+    """
+    for name in policy_names:
+        if name not in POLICIES:
+            raise ValueError("Unknown policy {}".format(name))
+    if pattern not in PATTERNS:
+        raise ValueError("Unknown pattern {}".format(pattern))
+    return {'deals': deals, 'seed': seed, 'chunk_size': chunk_size, 'pattern': pattern,
+            'policies': list(policy_names)}
+
+
+def num_chunks(settings):
+    if settings['deals'] is None:
+        return len(LOWEST_CARDS)
+    return (settings['deals'] + settings['chunk_size'] - 1) // settings['chunk_size']
+
+
+def chunk_deals(settings, chunk):
+    """ Returns the deals of a chunk as lists of cards """
+    if settings['deals'] is None:
+        lowest = list(LOWEST_CARDS[chunk])
+        return [[DECK[i] for i in lowest + list(rest)] for rest in combinations(range(lowest[-1] + 1, len(DECK)), 3)]
+    rng = random.Random(settings['seed'] * SEED_STRIDE + chunk)
+    start = chunk * settings['chunk_size']
+    return [rng.sample(DECK, DEAL_SIZE) for _ in range(min(settings['chunk_size'], settings['deals'] - start))]
+
+
+def score_deals(deals):
+    """
+    Returns (discard_stats, totals, best_flip_total) for each deal: totals[i]
+    is the i-th discard's score summed over the flips, and best_flip_total is
+    the sum over the flips of the best score of any discard
+    """
+    try:
+        import batch_scoring
+    except ImportError:
+        batch_scoring = None
+    if batch_scoring is None:
+        results = []
+        for cards in deals:
+            discard_stats = cribbage_game.calculate_scores(cards)
+            flips = discard_stats[0].possible_scores
+            best = sum(max(discard.possible_scores[flip_card] for discard in discard_stats) for flip_card in flips)
+            results.append((discard_stats, [discard.total for discard in discard_stats], best))
+        return results
+    return _score_deals_numpy(batch_scoring, deals)
+
+
+def _score_deals_numpy(batch_scoring, deals):
+    np = batch_scoring.np
+    _, scores = batch_scoring.score_matrices(np.array([[card.index for card in cards] for cards in deals]))
+    totals = scores.sum(axis=2, dtype=np.int64)
+    best = scores.max(axis=1).sum(axis=1, dtype=np.int64)
+    discard_stats = batch_scoring.histogram_discards(deals, batch_scoring.score_histograms(scores))
+    return zip(discard_stats, totals.tolist(), best.tolist())
+
+
+def new_totals():
+    """ {'deals': count, 'patterns': {pattern: {policy: {regret: {units: deals}}}}} """
+    return {'deals': 0, 'patterns': {}}
+
+
+def _add(histogram, units, count=1):
+    histogram[units] = histogram.get(units, 0) + count
+
+
+def merge_totals(totals, other):
+    totals['deals'] += other['deals']
+    for pattern, policies in other['patterns'].items():
+        merged = totals['patterns'].setdefault(pattern, {})
+        for name, regrets in policies.items():
+            merged_regrets = merged.setdefault(name, dict((regret, {}) for regret in REGRETS))
+            for regret, histogram in regrets.items():
+                for units, count in histogram.items():
+                    _add(merged_regrets[regret], units, count)
+    return totals
+
+
+def regret_chunk(args):
+    """ Returns (chunk, totals) for one chunk of deals """
+    settings, chunk = args
+    pattern = PATTERNS[settings['pattern']]
+    policies = [(name, POLICIES[name]) for name in settings['policies']]
+    totals = new_totals()
+    deals = chunk_deals(settings, chunk)
+    totals['deals'] = len(deals)
+
+    for start in range(0, len(deals), settings['chunk_size']):
+        batch = deals[start:start + settings['chunk_size']]
+        for cards, (discard_stats, deal_totals, best_flip_total) in zip(batch, score_deals(batch)):
+            best_total = max(deal_totals)
+            patterns = totals['patterns'].setdefault(pattern(cards), {})
+            for name, policy in policies:
+                chosen = deal_totals[discard_stats.index(policy(discard_stats))]
+                regrets = patterns.setdefault(name, dict((regret, {}) for regret in REGRETS))
+                _add(regrets['expected'], best_total - chosen)
+                _add(regrets['hindsight'], best_flip_total - chosen)
+    return chunk, totals
+
+
+def new_state(settings):
+    """ A run's progress: its settings, the chunks done and their merged totals """
+    return {'version': VERSION, 'settings': settings, 'done': [], 'totals': new_totals()}
+
+
+def save_state(state, path):
+    """ Writes a checkpoint, replacing the file only once it's complete """
+    totals = state['totals']
+    patterns = dict((pattern, dict((name, dict((regret, dict((str(units), count) for units, count in histogram.items()))
+                                               for regret, histogram in regrets.items()))
+                                   for name, regrets in policies.items()))
+                    for pattern, policies in totals['patterns'].items())
+    data = dict(state, done=sorted(state['done']), totals={'deals': totals['deals'], 'patterns': patterns})
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, sort_keys=True)
+    os.rename(temp_path, path)
+
+
+def load_state(path):
+    with open(path) as f:
+        state = json.load(f)
+    if state.get('version') != VERSION:
+        raise ValueError("{} is not a version {} checkpoint".format(path, VERSION))
+    for policies in state['totals']['patterns'].values():
+        for regrets in policies.values():
+            for regret, histogram in regrets.items():
+                regrets[regret] = dict((int(units), count) for units, count in histogram.items())
+    return state
+
+
+def merge_states(states):
+    """
+    Merges the checkpoints of runs with the same settings over different
+    chunks. Raises ValueError if they differ or share chunks, which would be
+    counted twice.
+    """
+    merged = new_state(states[0]['settings'])
+    done = set()
+    for state in states:
+        if state['settings'] != merged['settings']:
+            raise ValueError("Can't merge runs with different settings")
+        if done.intersection(state['done']):
+            raise ValueError("The runs share {} chunks".format(len(done.intersection(state['done']))))
+        done.update(state['done'])
+        merge_totals(merged['totals'], state['totals'])
+    merged['done'] = sorted(done)
+    return merged
+
+
+def run(settings, processes=None, checkpoint=None, checkpoint_seconds=60, shard=(0, 1)):
+    """
+    Analyzes the chunks of the run not done yet and returns its state.
+
+    checkpoint: str
+        Path of the checkpoint to resume from (if it exists) and to save the
+        progress to every checkpoint_seconds and at the end
+    shard: (index, count)
+        Only analyze the chunks whose number % count is index, to split a run
+        between machines and merge their checkpoints afterwards
+    processes: int
+        Number of worker processes, one per core by default. With 1 everything
+        is done in this process.
+    """
+    state = new_state(settings)
+    if checkpoint is not None and os.path.exists(checkpoint):
+        state = load_state(checkpoint)
+        if state['settings'] != settings:
+            raise ValueError("{} was saved by a run with different settings".format(checkpoint))
+    done = set(state['done'])
+    index, count = shard
+    tasks = [(settings, chunk) for chunk in range(num_chunks(settings)) if chunk % count == index and chunk not in done]
+
+    def finished(results):
+        saved = timeit.default_timer()
+        for chunk, totals in results:
+            merge_totals(state['totals'], totals)
+            state['done'].append(chunk)
+            if checkpoint is not None and timeit.default_timer() - saved >= checkpoint_seconds:
+                save_state(state, checkpoint)
+                saved = timeit.default_timer()
+
+    try:
+        if processes == 1:
+            finished(regret_chunk(task) for task in tasks)
+        else:
+            pool = multiprocessing.Pool(processes)
+            try:
+                finished(pool.imap_unordered(regret_chunk, tasks))
+            finally:
+                pool.terminate()
+                pool.join()
+    finally:
+        if checkpoint is not None:
+            save_state(state, checkpoint)
+    return state
+
+
+def _quantile(histogram, count, fraction):
+    """ The smallest units with at least fraction of the deals at or below it """
+    seen = 0
+    for units in sorted(histogram):
+        seen += histogram[units]
+        if seen >= fraction * count:
+            return units
+    return None
+
+
+def _summarize_histogram(histogram):
+    count = sum(histogram.values())
+    if not count:
+        return {'deals': 0}
+    return {
+        'deals': count,
+        'mean': round(float(sum(units * n for units, n in histogram.items())) / count / NUM_FLIPS, 4),
+        'zero': round(float(histogram.get(0, 0)) / count, 4),
+        'median': round(float(_quantile(histogram, count, 0.5)) / NUM_FLIPS, 4),
+        'p90': round(float(_quantile(histogram, count, 0.9)) / NUM_FLIPS, 4),
+        'p99': round(float(_quantile(histogram, count, 0.99)) / NUM_FLIPS, 4),
+        'max': round(float(max(histogram)) / NUM_FLIPS, 4),
+    }
+
+
+def summarize(state):
+    """
+    Turns a run's histograms into regret statistics in points (mean, share of
+    deals with none, median, 90th and 99th percentiles, max) for each policy,
+    overall and per pattern
+    """
+    settings = state['settings']
+    overall = dict((name, dict((regret, {}) for regret in REGRETS)) for name in settings['policies'])
+    patterns = {}
+    for pattern, policies in state['totals']['patterns'].items():
+        patterns[pattern] = {}
+        for name, regrets in policies.items():
+            for regret, histogram in regrets.items():
+                for units, count in histogram.items():
+                    _add(overall[name][regret], units, count)
+            patterns[pattern][name] = dict((regret, _summarize_histogram(histogram))
+                                           for regret, histogram in regrets.items())
+    return {
+        'settings': settings,
+        'deals': state['totals']['deals'],
+        'chunks': len(state['done']),
+        'complete': len(state['done']) == num_chunks(settings),
+        'policies': dict((name, dict((regret, _summarize_histogram(histogram)) for regret, histogram in regrets.items()))
+                         for name, regrets in overall.items()),
+        'patterns': patterns,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the points each discard policy gives up over many deals")
+    parser.add_argument('--deals', type=int, help="random deals to analyze (default every possible deal)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policy', action='append', dest='policies', choices=list(POLICIES),
+                        help="policy to measure (can be repeated, default {})".format(', '.join(DEFAULT_POLICIES)))
+    parser.add_argument('--pattern', choices=sorted(PATTERNS), default='counts', help="how to group the deals")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default one per core)")
+    parser.add_argument('--chunk-size', type=int, default=2000, help="deals per task (deals scored at once when exhaustive)")
+    parser.add_argument('--checkpoint', help="file to resume from and save the progress to")
+    parser.add_argument('--checkpoint-seconds', type=float, default=60)
+    parser.add_argument('--shard', default='0/1', help="INDEX/COUNT: only analyze this share of the chunks")
+    parser.add_argument('--merge', nargs='+', metavar='CHECKPOINT', help="merge these checkpoints instead of running")
+    parser.add_argument('--output', help="also write the summary to this JSON file")
+    args = parser.parse_args()
+
+    start = timeit.default_timer()
+    if args.merge:
+        state = merge_states([load_state(path) for path in args.merge])
+        if args.checkpoint:
+            save_state(state, args.checkpoint)
+    else:
+        index, _, count = args.shard.partition('/')
+        if not count or not 0 <= int(index) < int(count):
+            parser.error("--shard should be INDEX/COUNT with 0 <= INDEX < COUNT")
+        settings = new_settings(args.deals, args.seed, args.chunk_size, args.pattern,
+                                args.policies or DEFAULT_POLICIES)
+        state = run(settings, args.processes, args.checkpoint, args.checkpoint_seconds, (int(index), int(count)))
+    summary = summarize(state)
+
+    print("{} deals, {} of {} chunks, in {:.1f}s".format(
+        summary['deals'], summary['chunks'], num_chunks(state['settings']), timeit.default_timer() - start))
+    for name in state['settings']['policies']:
+        expected = summary['policies'][name]['expected']
+        hindsight = summary['policies'][name]['hindsight']
+        if expected['deals']:
+            print("{:<14} expected regret {:.3f} (none on {:.1%}, p99 {:.3f})  hindsight regret {:.3f}".format(
+                name, expected['mean'], expected['zero'], expected['p99'], hindsight['mean']))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import os
+import sys
+from array import array
+from itertools import combinations_with_replacement
+from card import Card
+from hand import Hand
+
+# Pairs, runs and 15s only depend on the ranks in a hand, and there are only
+# 6,175 possible multisets of five ranks, so all of that work can be done once
+# up front. Only the flush and nobs checks still need to look at the suits.
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'score_table.bin')
+
+HAND_SIZE = 5
+NUM_RANKS = len(Card.RANK_MAPPINGS)
+
+
+def binomial(n, k):
+    if k < 0 or k > n:
+        return 0
+    result = 1
+    for i in range(k):
+        result = result * (n - i) // (i + 1)
+    return result
+
+
+class ScoreTable:
+    # Combinations with replacement of 13 ranks map onto plain combinations of
+    # 17 slots (rank + position), which gives every multiset a dense index
+    TABLE_SIZE = binomial(NUM_RANKS + HAND_SIZE - 1, HAND_SIZE)
+    OFFSETS = [[binomial(rank + i, i + 1) for rank in range(NUM_RANKS)] for i in range(HAND_SIZE)]
+    # Summing a base-5 digit per card gives a key for the multiset without
+    # having to sort the ranks first (a rank can appear at most 4 times)
+    RANK_WEIGHTS = [5 ** rank for rank in range(NUM_RANKS)]
+
+    def __init__(self, pairs, runs, fifteens, totals=None):
+        """
+        pairs, runs, fifteens: array('B')
+            The score of each component, indexed by ScoreTable.index
+        totals: array('B')
+            The sum of the three, worked out from them if not given
+        """
+        ScoreTable.validate_table_input(pairs, runs, fifteens)
+        self.pairs = pairs
+        self.runs = runs
+        self.fifteens = fifteens
+        if totals is None:
+            totals = array('B', [p + r + f for p, r, f in zip(pairs, runs, fifteens)])
+        self.totals = totals
+
+    @staticmethod
+    def validate_table_input(pairs, runs, fifteens):
+        for component in (pairs, runs, fifteens):
+            if len(component) != ScoreTable.TABLE_SIZE:
+                raise ValueError("Score table must contain {} entries".format(ScoreTable.TABLE_SIZE))
+
+    @staticmethod
+    def index(ranks):
+        """
+        Returns the position of a multiset of ranks (given as numerical_order
+        values, in any order) in the table
+        """
+        return sum([offsets[rank] for offsets, rank in zip(ScoreTable.OFFSETS, sorted(ranks))])
+
+    @staticmethod
+    def key(ranks):
+        """ Returns the order independent lookup key of a multiset of ranks """
+        return sum([ScoreTable.RANK_WEIGHTS[rank] for rank in ranks])
+
+    @classmethod
+    def build(cls):
+        """ Scores every possible multiset of ranks with Hand """
+        ranks = list(Card.RANK_MAPPINGS.keys())
+        pairs = array('B', [0] * cls.TABLE_SIZE)
+        runs = array('B', [0] * cls.TABLE_SIZE)
+        fifteens = array('B', [0] * cls.TABLE_SIZE)
+
+        for multiset in combinations_with_replacement(range(NUM_RANKS), HAND_SIZE):
+            if max(multiset.count(rank) for rank in multiset) > len(Card.VALID_SUITS):
+                continue # Five of a kind can't be dealt, leave the slot empty
+            cards = []
+            for rank in multiset:
+                # Hand never looks at the suits for these components, they only
+                # need to be distinct so the cards are distinct
+                cards.append(Card(ranks[rank], Card.VALID_SUITS[len([c for c in cards if c.rank == ranks[rank]])]))
+            hand = Hand(cards[:4], cards[4])
+            i = cls.index(multiset)
+            pairs[i] = hand.calculate_pairs()
+            runs[i] = hand.calculate_runs()
+            fifteens[i] = hand.calculate_15s()
+
+        return cls(pairs, runs, fifteens)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with open(path, 'rb') as f:
+            data = array('B')
+            data.fromstring(f.read())
+        if len(data) != 3 * cls.TABLE_SIZE:
+            raise ValueError("{} is not a valid score table".format(path))
+        size = cls.TABLE_SIZE
+        return cls(data[:size], data[size:2 * size], data[2 * size:])
+
+    def save(self, path=DEFAULT_PATH):
+        with open(path, 'wb') as f:
+            f.write((self.pairs + self.runs + self.fifteens).tostring())
+
+    def hand_index(self, cards, flip_card):
+        """ Returns the position of the ranks of the given hand in the table """
+        weights = ScoreTable.RANK_WEIGHTS
+        key = weights[flip_card.numerical_order]
+        for card in cards:
+            key += weights[card.numerical_order]
+        return INDEX_BY_KEY[key]
+
+    def components(self, cards, flip_card):
+        """
+        Returns the (pairs, runs, 15s, suit, nobs) points of the given hand, in
+        the same way as the Hand.calculate_* methods
+        """
+        i = self.hand_index(cards, flip_card)
+        return (self.pairs[i], self.runs[i], self.fifteens[i],
+                calculate_suit(cards, flip_card), calculate_nobs(cards, flip_card))
+
+    def score(self, cards, flip_card):
+        """ Same as Hand(cards, flip_card).calculate_score() """
+        i = self.hand_index(cards, flip_card)
+        return self.totals[i] + calculate_suit(cards, flip_card) + calculate_nobs(cards, flip_card)
+
+
+INDEX_BY_KEY = dict((ScoreTable.key(multiset), ScoreTable.index(multiset))
+                    for multiset in combinations_with_replacement(range(NUM_RANKS), HAND_SIZE))
+
+
+def calculate_suit(cards, flip_card):
+    """ Same as Hand.calculate_suit """
+    suit = cards[0].suit
+    for card in cards:
+        if card.suit != suit:
+            return 0
+    if flip_card.suit == suit:
+        return len(cards) + 1
+    return len(cards)
+
+
+def calculate_nobs(cards, flip_card):
+    """ Same as Hand.calculate_nobs """
+    for card in cards:
+        if card.rank == 'J' and card.suit == flip_card.suit:
+            return 1
+    return 0
+
+
+_default_table = None
+
+def default_table():
+    """
+    Returns the shared score table, loading it from DEFAULT_PATH if it has
+    been written there and building it otherwise
+    """
+    global _default_table
+    if _default_table is None:
+        if os.path.exists(DEFAULT_PATH):
+            _default_table = ScoreTable.load(DEFAULT_PATH)
+        else:
+            _default_table = ScoreTable.build()
+    return _default_table
+
+def score(cards, flip_card):
+    """ Scores a hand using the shared score table """
+    return default_table().score(cards, flip_card)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    ScoreTable.build().save(path)
+    print("Wrote score table to {}".format(path))
@@ -0,0 +1,294 @@
+import argparse
+import json
+import threading
+import timeit
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from collections import deque
+from Queue import Queue, Empty
+from SocketServer import ThreadingMixIn
+import batch
+import shared_tables
+
+# A local HTTP/JSON service for discard advice.
+#
+#   POST /discard   body: a deal in any form batch.parse_deal accepts
+#                   returns the same JSON object as a line of batch output
+#   GET  /metrics   request, latency, queue depth and batch size figures
+#
+# Each connection gets its own thread, which hands its deal to the Batcher and
+# waits. The Batcher collects the deals that arrive within max_wait of each
+# other (up to max_batch of them) and sends them to the worker pool as one
+# task, where they are scored together by the batch scoring core. A deal that
+# is already queued or being worked on isn't sent again, the new request just
+# waits for the same result.
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_WAIT = 0.005 # seconds
+LATENCY_SAMPLES = 10000
+
+
+def _error_message(e):
+    return str(e) or type(e).__name__
+
+
+def analyse_batch(deals):
+    """
+    Returns (result, error) for each deal. The deals are scored together, and
+    only if that fails one at a time to find the ones at fault.
+    """
+    try:
+        return [(result, None) for result in batch.analyse_deals(deals)]
+    except Exception:
+        pass
+    results = []
+    for cards in deals:
+        try:
+            results.append((batch.analyse_deal(cards), None))
+        except Exception as e:
+            results.append((None, _error_message(e)))
+    return results
+
+
+def run_batch(deals):
+    """
+    Runs in a worker, returns (results, None) or (None, error) if the batch
+    failed as a whole. apply_async has no error callback in Python 2, so
+    errors have to come back as results or their requests would never finish.
+    """
+    try:
+        return analyse_batch(deals), None
+    except Exception as e:
+        return None, _error_message(e)
+
+
+class Pending(object):
+    """ A deal waiting for its result, shared by every request for it """
+    __slots__ = ('cards', 'done', 'result', 'error', 'failed', 'waiters')
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.failed = None # the error if its whole batch failed
+        self.waiters = 1
+
+
+class Batcher(object):
+    def __init__(self, processes=None, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT):
+        """
+        processes: int
+            Number of worker processes, one per core by default. With 0 the
+            batches are analysed on the batcher thread.
+        """
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pool = self.tables = None
+        if processes != 0:
+            self.pool, self.tables = shared_tables.shared_pool(processes, ['crib'])
+        self.queue = Queue()
+        self.lock = threading.Lock()
+        self.in_flight = {} # deal key: Pending
+        self.running_batches = 0
+
+        self.requests = 0
+        self.deduplicated = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_deals = 0
+        self.largest_batch = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, cards, timeout=None):
+        """
+        Returns the result of batch.analyse_deal(cards), raising ValueError if
+        it failed, or RuntimeError if its batch failed or it took longer than
+        timeout seconds
+        """
+        start = timeit.default_timer()
+        key = tuple(card.index for card in cards)
+        with self.lock:
+            self.requests += 1
+            pending = self.in_flight.get(key)
+            if pending is None:
+                pending = self.in_flight[key] = Pending(cards)
+                self.queue.put(key)
+            else:
+                pending.waiters += 1
+                self.deduplicated += 1
+
+        if not pending.done.wait(timeout):
+            raise RuntimeError("Timed out waiting for the analysis")
+        with self.lock:
+            self.latencies.append(timeit.default_timer() - start)
+            if pending.error is not None or pending.failed is not None:
+                self.errors += 1
+        if pending.failed is not None:
+            raise RuntimeError("Analysis failed: {}".format(pending.failed))
+        if pending.error is not None:
+            raise ValueError(pending.error)
+        return pending.result
+
+    def _run(self):
+        while True:
+            key = self.queue.get()
+            if key is None:
+                return
+            keys = [key]
+            deadline = timeit.default_timer() + self.max_wait
+            while len(keys) < self.max_batch:
+                remaining = deadline - timeit.default_timer()
+                if remaining <= 0:
+                    break
+                try:
+                    key = self.queue.get(timeout=remaining)
+                except Empty:
+                    break
+                if key is None:
+                    self._dispatch(keys)
+                    return
+                keys.append(key)
+            self._dispatch(keys)
+
+    def _dispatch(self, keys):
+        with self.lock:
+            deals = [self.in_flight[key].cards for key in keys]
+            self.batches += 1
+            self.batched_deals += len(keys)
+            self.largest_batch = max(self.largest_batch, len(keys))
+            self.running_batches += 1
+        if self.pool is None:
+            self._finish(keys, run_batch(deals))
+        else:
+            self.pool.apply_async(run_batch, (deals,), callback=lambda outcome: self._finish(keys, outcome))
+
+    def _finish(self, keys, outcome):
+        results, failed = outcome
+        with self.lock:
+            self.running_batches -= 1
+            finished = [self.in_flight.pop(key) for key in keys]
+        for i, pending in enumerate(finished):
+            if failed is not None:
+                pending.failed = failed
+            else:
+                pending.result, pending.error = results[i]
+            pending.done.set()
+
+    def metrics(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            metrics = {
+                'requests': self.requests,
+                'deduplicated': self.deduplicated,
+                'errors': self.errors,
+                'queue_depth': self.queue.qsize(),
+                'in_flight': len(self.in_flight),
+                'running_batches': self.running_batches,
+                'batches': self.batches,
+                'mean_batch_size': float(self.batched_deals) / self.batches if self.batches else 0.0,
+                'largest_batch': self.largest_batch,
+            }
+        for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+            value = latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] if latencies else 0.0
+            metrics['latency_{}_ms'.format(name)] = round(value * 1000, 3)
+        return metrics
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.tables.close()
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            self.send_json(200, self.server.batcher.metrics())
+        else:
+            self.send_json(404, {'error': "Not found"})
+
+    def do_POST(self):
+        if self.path != '/discard':
+            self.send_json(404, {'error': "Not found"})
+            return
+        body = self.rfile.read(int(self.headers.getheader('content-length') or 0))
+        try:
+            cards, deal_id = batch.parse_deal(body)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        try:
+            result = dict(self.server.batcher.submit(cards, self.server.request_timeout))
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        except RuntimeError as e:
+            self.send_json(503, {'error': str(e)})
+            return
+        if deal_id is not None:
+            result['id'] = deal_id
+        self.send_json(200, result)
+
+    def send_json(self, status, data):
+        body = json.dumps(data, sort_keys=True)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, batcher, request_timeout=30.0, verbose=False):
+        HTTPServer.__init__(self, address, RequestHandler)
+        self.batcher = batcher
+        self.request_timeout = request_timeout
+        self.verbose = verbose
+
+    def server_close(self):
+        HTTPServer.server_close(self)
+        self.batcher.close()
+
+
+def make_server(host='127.0.0.1', port=0, processes=None, max_batch=DEFAULT_MAX_BATCH,
+                max_wait=DEFAULT_MAX_WAIT, request_timeout=30.0, verbose=False):
+    """ Creates a Server, the port it's listening on is server.server_address[1] """
+    return Server((host, port), Batcher(processes, max_batch, max_wait), request_timeout, verbose)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve discard advice over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default one per core)")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH, help="most deals sent to a worker at once")
+    parser.add_argument('--max-wait', type=float, default=DEFAULT_MAX_WAIT * 1000,
+                        help="milliseconds to wait for more deals before sending a batch")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.processes, args.max_batch, args.max_wait / 1000.0,
+                         verbose=args.verbose)
+    print("Listening on {}:{}".format(*server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
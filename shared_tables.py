@@ -0,0 +1,229 @@
+import argparse
+import ctypes
+import json
+import mmap
+import multiprocessing
+import os
+import shutil
+import tempfile
+import timeit
+import crib
+import pegging
+import score_table
+import win_probability
+
+# Publishes the lookup tables (scores, crib, pegging and win chances) once for
+# all the workers of a process pool, instead of each worker loading or
+# building its own copy when it first needs one.
+#
+# publish() writes the raw table arrays to files in /dev/shm (a temporary
+# directory where there's no /dev/shm). A worker started with attach() maps
+# each file and wraps the mapping in a ctypes array, which indexes like the
+# array the table normally holds, so every worker reads the same pages. The
+# mappings are copy on write (ctypes needs a writable buffer), but nothing
+# writes to the tables so nothing is ever copied.
+#
+# measure() starts a pool and reports how long it takes until every worker
+# has its tables, and each worker's memory.
+SHM_DIRECTORY = '/dev/shm'
+TABLE_NAMES = ('score', 'crib', 'pegging', 'win')
+
+# array typecode: ctypes type of the elements
+TYPES = {'B': ctypes.c_ubyte, 'd': ctypes.c_double, 'f': ctypes.c_float}
+
+
+def _score_arrays(table):
+    return [('pairs', table.pairs), ('runs', table.runs), ('fifteens', table.fifteens), ('totals', table.totals)]
+
+
+def _load_tables(names):
+    """ Returns {name: (arrays, info)} for the tables that are available, loading them as usual """
+    tables = {}
+    if 'score' in names:
+        tables['score'] = (_score_arrays(score_table.default_table()), {})
+    if 'crib' in names:
+        tables['crib'] = ([('values', crib.default_crib_table().values)], {})
+    if 'pegging' in names and pegging.default_pegging_table() is not None:
+        tables['pegging'] = ([('values', pegging.default_pegging_table().values)], {})
+    if 'win' in names and win_probability.default_win_table() is not None:
+        table = win_probability.default_win_table()
+        tables['win'] = ([('values', table.values)], {'target': table.target})
+    return tables
+
+
+class SharedTables:
+    """
+    The files holding the published tables. It's small and pickles, so it can
+    be passed to the workers; close() removes the files.
+    """
+    def __init__(self, directory, entries):
+        """
+        entries: dict
+            Table name to (path, [(array name, typecode, length, offset)], info)
+        """
+        self.directory = directory
+        self.entries = entries
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.directory is not None and os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+
+    def size(self):
+        """ Bytes published """
+        return sum(os.path.getsize(path) for path, _, _ in self.entries.values())
+
+
+def publish(names=TABLE_NAMES, directory=None):
+    """
+    Writes the tables to shared files and returns the SharedTables. The pegging
+    and win tables are only published if they've been built.
+    """
+    if directory is None:
+        directory = SHM_DIRECTORY if os.path.isdir(SHM_DIRECTORY) else None
+    directory = tempfile.mkdtemp(prefix='cribbage-tables-', dir=directory)
+    entries = {}
+    for name, (arrays, info) in _load_tables(names).items():
+        path = os.path.join(directory, name + '.bin')
+        layout = []
+        offset = 0
+        with open(path, 'wb') as f:
+            for array_name, values in arrays:
+                f.write(values.tostring())
+                layout.append((array_name, values.typecode, len(values), offset))
+                offset += len(values) * values.itemsize
+        entries[name] = (path, layout, info)
+    return SharedTables(directory, entries)
+
+
+def _map(path, layout):
+    """ Returns {array name: ctypes array} over a mapping of the file """
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    # The ctypes arrays keep the mapping open
+    return dict((array_name, (TYPES[typecode] * length).from_buffer(mapping, offset))
+                for array_name, typecode, length, offset in layout)
+
+
+def attach(tables):
+    """
+    Makes the shared tables the default ones in this process. Used as the
+    initializer of a pool's workers.
+    """
+    for name, (path, layout, info) in tables.entries.items():
+        arrays = _map(path, layout)
+        if name == 'score':
+            score_table._default_table = score_table.ScoreTable(
+                arrays['pairs'], arrays['runs'], arrays['fifteens'], arrays['totals'])
+        elif name == 'crib':
+            crib._default_crib_table = crib.CribTable(arrays['values'])
+        elif name == 'pegging':
+            pegging._default_pegging_table = pegging.PeggingTable(arrays['values'])
+        elif name == 'win':
+            win_probability._default_win_table = win_probability.WinTable(arrays['values'], info['target'])
+
+
+def shared_pool(processes=None, names=TABLE_NAMES):
+    """
+    Returns (pool, tables): a Pool whose workers use the named tables,
+    published once. Close the tables once the pool is done.
+    """
+    tables = publish(names)
+    return multiprocessing.Pool(processes, attach, (tables,)), tables
+
+
+def memory_usage():
+    """
+    This process's resident memory in kB: rss in total, private (pages no
+    other process shares, so what each worker adds), shared and pss (the
+    process's share of the pages, with shared pages split between the
+    processes using them)
+    """
+    usage = {'pid': os.getpid()}
+    fields = {'Rss': 'rss_kb', 'Pss': 'pss_kb', 'Private_Clean': 'private_kb', 'Private_Dirty': 'private_kb',
+              'Shared_Clean': 'shared_kb', 'Shared_Dirty': 'shared_kb'}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in fields:
+                    usage[fields[name]] = usage.get(fields[name], 0) + int(value.split()[0])
+    except IOError:
+        import resource
+        usage['rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage
+
+
+def _touch_tables():
+    """ Reads every entry of the default tables, as a worker would over time """
+    for name, (arrays, _) in _load_tables(TABLE_NAMES).items():
+        for _, values in arrays:
+            sum(values)
+
+
+def _init_measured_worker(tables, reports):
+    if tables is not None:
+        attach(tables)
+    else:
+        # Don't use any tables inherited from the parent, load them like a worker normally would
+        score_table._default_table = None
+        crib._default_crib_table = None
+        pegging._default_pegging_table = None
+        win_probability._default_win_table = None
+    _touch_tables()
+    reports.put(memory_usage())
+
+
+def measure(processes=2, shared=True):
+    """
+    Starts a pool, waits for each worker to have its tables, and returns the
+    startup time and every worker's memory_usage. Without shared, the workers
+    load (or build) the tables themselves.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    start = timeit.default_timer()
+    tables = publish() if shared else None
+    published = tables.size() if tables is not None else 0
+    reports = multiprocessing.Queue()
+    pool = multiprocessing.Pool(processes, _init_measured_worker, (tables, reports))
+    try:
+        workers = [reports.get() for _ in range(processes)]
+        seconds = timeit.default_timer() - start
+    finally:
+        pool.terminate()
+        pool.join()
+        if tables is not None:
+            tables.close()
+    return {
+        'shared': shared,
+        'processes': processes,
+        'startup_seconds': round(seconds, 4),
+        'published_bytes': published,
+        'workers': workers,
+        'mean_private_kb': sum(w.get('private_kb', w['rss_kb']) for w in workers) / float(len(workers)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pool startup and worker memory with and without shared tables")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default one per core)")
+    parser.add_argument('--output', help="also write the reports to this JSON file")
+    args = parser.parse_args()
+
+    reports = [measure(args.processes, shared=False), measure(args.processes, shared=True)]
+    for report in reports:
+        print("{:<8} {} workers started in {:.3f}s, {:.0f} kB private memory per worker".format(
+            'shared' if report['shared'] else 'separate', report['processes'], report['startup_seconds'],
+            report['mean_private_kb']))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
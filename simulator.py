@@ -0,0 +1,203 @@
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import timeit
+from card import DECK
+from discard import Discard
+from policies import POLICIES
+import cribbage_game
+
+# Deals random hands and plays each of them with every discard policy, to see
+# which policy scores the most points over many hands.
+#
+# The hands are dealt in chunks, each with its own RNG seeded from the run's
+# seed and the chunk number, so a run gives the same results however many
+# processes it is spread over. Each policy's points are counted in a
+# histogram, and every policy is also compared hand by hand to the first one
+# (the reference), which cancels out most of the luck of the deal.
+DEAL_SIZE = 6
+NUM_SCORES = Discard.MAX_SCORE + 1
+Z_95 = 1.96
+SEED_STRIDE = 1000003
+
+
+def deal_hands(rng, count):
+    """ Returns count (six dealt cards, flip card) pairs """
+    hands = []
+    for _ in range(count):
+        cards = rng.sample(DECK, DEAL_SIZE + 1)
+        hands.append((cards[:DEAL_SIZE], cards[DEAL_SIZE]))
+    return hands
+
+
+def score_hands(hands):
+    """
+    Returns (discard_stats, points) for each hand, where points[i] is what the
+    i-th discard actually scores with the hand's flip card
+    """
+    try:
+        import batch_scoring
+    except ImportError:
+        batch_scoring = None
+    if batch_scoring is None:
+        results = []
+        for cards, flip_card in hands:
+            discard_stats = cribbage_game.calculate_scores(cards)
+            results.append((discard_stats, [discard.possible_scores[flip_card] for discard in discard_stats]))
+        return results
+    return _score_hands_numpy(batch_scoring, hands)
+
+
+def _score_hands_numpy(batch_scoring, hands):
+    np = batch_scoring.np
+    deals = np.array([[card.index for card in cards] for cards, _ in hands])
+    flips = np.array([flip_card.index for _, flip_card in hands])
+    _, scores = batch_scoring.score_matrices(deals)
+    # The flip cards left in the deck are in index order
+    positions = flips - (deals < flips[:, None]).sum(axis=1)
+    points = scores[np.arange(len(hands)), :, positions]
+    discard_stats = batch_scoring.histogram_discards([cards for cards, _ in hands], batch_scoring.score_histograms(scores))
+    return zip(discard_stats, points.tolist())
+
+
+def new_totals(policy_names):
+    return {
+        'hands': 0,
+        'histograms': dict((name, [0] * NUM_SCORES) for name in policy_names),
+        # Against the reference policy: [sum of differences, sum of squared differences, wins, ties, losses]
+        'differences': dict((name, [0] * 5) for name in policy_names),
+    }
+
+
+def merge_totals(totals, other):
+    totals['hands'] += other['hands']
+    for name, histogram in other['histograms'].items():
+        totals['histograms'][name] = [a + b for a, b in zip(totals['histograms'][name], histogram)]
+    for name, differences in other['differences'].items():
+        totals['differences'][name] = [a + b for a, b in zip(totals['differences'][name], differences)]
+    return totals
+
+
+def simulate_chunk(args):
+    """ Plays one chunk of hands, returns its totals """
+    seed, chunk, count, policy_names = args
+    rng = random.Random(seed * SEED_STRIDE + chunk)
+    policies = [(name, POLICIES[name]) for name in policy_names]
+    totals = new_totals(policy_names)
+    totals['hands'] = count
+
+    for discard_stats, points in score_hands(deal_hands(rng, count)):
+        reference_points = None
+        for name, policy in policies:
+            chosen = policy(discard_stats)
+            score = points[discard_stats.index(chosen)]
+            totals['histograms'][name][score] += 1
+            if reference_points is None:
+                reference_points = score
+            difference = score - reference_points
+            differences = totals['differences'][name]
+            differences[0] += difference
+            differences[1] += difference * difference
+            differences[2 if difference > 0 else 3 if difference == 0 else 4] += 1
+    return totals
+
+
+def _confidence_interval(mean, variance, count):
+    margin = Z_95 * math.sqrt(variance / count) if count > 1 else float('inf')
+    return [round(mean - margin, 4), round(mean + margin, 4)]
+
+
+def summarize(totals, seconds):
+    """ Turns the totals of a run into means and 95% confidence intervals per policy """
+    count = totals['hands']
+    names = list(totals['histograms'])
+    summary = {'hands': count, 'seconds': round(seconds, 3),
+               'hands_per_sec': round(count / seconds, 1) if seconds else None, 'policies': {}}
+    for name in names:
+        histogram = totals['histograms'][name]
+        mean = float(sum(score * n for score, n in enumerate(histogram))) / count
+        variance = sum(n * (score - mean) ** 2 for score, n in enumerate(histogram)) / (count - 1) if count > 1 else 0.0
+        total_difference, squared_difference, wins, ties, losses = totals['differences'][name]
+        mean_difference = float(total_difference) / count
+        difference_variance = ((squared_difference - count * mean_difference ** 2) / (count - 1)) if count > 1 else 0.0
+        summary['policies'][name] = {
+            'mean': round(mean, 4),
+            'stdev': round(math.sqrt(variance), 4),
+            'ci95': _confidence_interval(mean, variance, count),
+            'histogram': histogram,
+            'vs_reference': {
+                'mean_difference': round(mean_difference, 4),
+                'ci95': _confidence_interval(mean_difference, max(difference_variance, 0.0), count),
+                'wins': wins,
+                'ties': ties,
+                'losses': losses,
+            },
+        }
+    return summary
+
+
+def simulate(hands, seed=0, policy_names=None, processes=None, chunk_size=2000):
+    """
+    Plays hands random hands with each policy (all registered ones by default,
+    the first is the reference) and returns the summary.
+
+    processes: int
+        Number of worker processes, one per core by default. With 1 everything
+        is played in this process.
+    """
+    policy_names = list(policy_names or POLICIES)
+    for name in policy_names:
+        if name not in POLICIES:
+            raise ValueError("Unknown policy {}".format(name))
+    tasks = [(seed, chunk, min(chunk_size, hands - start), policy_names)
+             for chunk, start in enumerate(range(0, hands, chunk_size))]
+
+    start = timeit.default_timer()
+    totals = new_totals(policy_names)
+    if processes == 1:
+        for task in tasks:
+            merge_totals(totals, simulate_chunk(task))
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            for chunk_totals in pool.imap_unordered(simulate_chunk, tasks):
+                merge_totals(totals, chunk_totals)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    summary = summarize(totals, timeit.default_timer() - start)
+    summary['seed'] = seed
+    summary['reference'] = policy_names[0]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare discard policies over random hands")
+    parser.add_argument('--hands', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policy', action='append', dest='policies', choices=list(POLICIES),
+                        help="policy to play (can be repeated, default all; the first is the reference)")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default one per core)")
+    parser.add_argument('--chunk-size', type=int, default=2000, help="hands dealt per task")
+    parser.add_argument('--output', help="also write the summary to this JSON file")
+    args = parser.parse_args()
+
+    summary = simulate(args.hands, args.seed, args.policies, args.processes, args.chunk_size)
+    print("{} hands in {}s ({} hands/sec), compared to {}".format(
+        summary['hands'], summary['seconds'], summary['hands_per_sec'], summary['reference']))
+    for name in args.policies or POLICIES:
+        policy = summary['policies'][name]
+        difference = policy['vs_reference']
+        print("{:<14} mean {:.3f} [{:.3f}, {:.3f}]  difference {:+.3f} [{:+.3f}, {:+.3f}]".format(
+            name, policy['mean'], policy['ci95'][0], policy['ci95'][1],
+            difference['mean_difference'], difference['ci95'][0], difference['ci95'][1]))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import json
+from StringIO import StringIO
+from unittest import TestCase, main
+from card import Card
+import batch
+import cribbage_game
+
+class TestBatch(TestCase):
+    def setUp(self):
+        self.lines = [
+            "8C, AH, 10H, KC, 5D, 2S\n",
+            '["5C", "5D", "JH", "4S", "6H", "KC"]\n',
+            "\n",
+            '{"id": 7, "cards": ["AS", "2S", "3S", "4S", "9D", "QH"]}\n',
+            "8C, AH, 10H\n",
+            '{"cards": [1, 2, 3, 4, 5, 6]}\n',
+            "5S, 5C, 5D, 5H, JS, 10C\n",
+        ]
+
+    def run_stream(self, **kwargs):
+        output = StringIO()
+        written = batch.stream(iter(self.lines), output, **kwargs)
+        return written, [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_parse_deal(self):
+        self.assertEqual(batch.parse_deal("8c, ah, 10h, kc, 5d, 2s\n")[0][0], Card('8', 'C'))
+        self.assertEqual(batch.parse_deal('{"id": "x", "cards": ["AS", "2S", "3S", "4S", "9D", "QH"]}')[1], "x")
+        self.assertRaises(ValueError, batch.parse_deal, '["AS", "AS", "3S", "4S", "9D", "QH"]')
+        self.assertRaises(ValueError, batch.parse_deal, '{"cards": "AS"}')
+
+    def test_analyse_deal(self):
+        original_cards = cribbage_game.parse_cards("8C, AH, 10H, KC, 5D, 2S".split(','))
+        result = batch.analyse_deal(original_cards)
+        best_mean = max(cribbage_game.calculate_scores(original_cards), key=lambda s: s.mean())
+        self.assertEqual(result['best_mean']['discard'], [str(c) for c in best_mean.cards])
+        self.assertEqual(result['best_mean']['value'], round(best_mean.mean(), 4))
+
+    def test_analyse_deals(self):
+        deals = [batch.parse_deal(self.lines[i])[0] for i in (0, 1, 3, 6)]
+        self.assertEqual(batch.analyse_deals(deals), [batch.analyse_deal(cards) for cards in deals])
+        self.assertEqual(batch.analyse_deals([]), [])
+
+    def test_analyse_lines(self):
+        lines = [self.lines[i] for i in (0, 4, 3)]
+        results = [json.loads(line) for line in batch.analyse_lines(lines, [1, 5, 9])]
+        self.assertEqual(results[0], batch.analyse_deal(batch.parse_deal(lines[0])[0]))
+        self.assertEqual((results[1]['line'], results[1]['input']), (5, "8C, AH, 10H"))
+        self.assertEqual(results[2]['id'], 7)
+        self.assertNotIn('line', results[2])
+        self.assertEqual(json.loads(batch.analyse_lines([lines[1]])[0])['line'], 1)
+
+    def test_stream_in_process(self):
+        written, results = self.run_stream(processes=1, chunk_size=2)
+        self.assertEqual(written, 6)
+        self.assertEqual(results[0]['cards'], ["8C", "AH", "10H", "KC", "5D", "2S"])
+        self.assertEqual(results[2]['id'], 7)
+        self.assertIn('error', results[3])
+        self.assertEqual(results[3]['line'], 5)
+        self.assertEqual(results[4]['line'], 6)
+        self.assertEqual(results[5]['best_max']['value'], 28)
+
+    def test_stream_pool_keeps_order(self):
+        expected = self.run_stream(processes=1)
+        self.assertEqual(self.run_stream(processes=2, chunk_size=1, max_pending=1), expected)
+        self.assertEqual(self.run_stream(processes=2, chunk_size=2), expected)
+
+
+if __name__ == '__main__':
+    main()
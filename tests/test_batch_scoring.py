@@ -0,0 +1,69 @@
+import random
+from unittest import TestCase, main, skipIf
+from card import Card, DECK
+from hand import Hand
+import cribbage_game
+try:
+    import numpy
+    import batch_scoring
+except ImportError:
+    numpy = None
+
+@skipIf(numpy is None, "numpy is not installed")
+class TestBatchScoring(TestCase):
+    def create_cards(self, card_strings):
+        return [Card(c[:-1], c[-1]) for c in card_strings]
+
+    def test_score_hands_matches_hand(self):
+        rng = random.Random(3)
+        hands = [rng.sample(DECK, 5) for _ in range(3000)]
+        scores = batch_scoring.score_hands([[c.index for c in h[:4]] for h in hands],
+                                           [h[4].index for h in hands])
+        for hand, score in zip(hands, scores):
+            self.assertEqual(score, Hand(hand[:4], hand[4]).calculate_score())
+
+    def test_score_hands_special_cases(self):
+        cases = [(['5C', 'JH', '5D', '5S'], '5H', 29),
+                 (['4C', '3D', '2C', '3S'], '2H', 16),
+                 (['2C', '3C', 'JC', '4C'], '3C', 18),
+                 (['JD', '3C', '5H', 'KS'], '5D', 11),
+                 (['QC', 'KC', 'AC', '2C'], '4C', 9)]
+        for card_strings, flip, expected in cases:
+            cards = self.create_cards(card_strings)
+            flip_card = self.create_cards([flip])[0]
+            self.assertEqual(Hand(cards, flip_card).calculate_score(), expected)
+            self.assertEqual(batch_scoring.score_hands([c.index for c in cards], flip_card.index), expected)
+
+    def test_score_matrix_shape(self):
+        flips, scores = batch_scoring.score_matrix(self.create_cards(['8C', 'AH', '10H', 'KC', '5D', '2S']))
+        self.assertEqual(len(flips), 46)
+        self.assertEqual(scores.shape, (15, 46))
+
+    def test_calculate_scores_matches_cribbage_game(self):
+        rng = random.Random(11)
+        for _ in range(20):
+            original_cards = rng.sample(DECK, 6)
+            expected = cribbage_game.calculate_scores(original_cards)
+            actual = batch_scoring.calculate_scores(original_cards)
+            self.assertEqual([str(d) for d in actual], [str(d) for d in expected])
+            for a, e in zip(actual, expected):
+                self.assertEqual(a.possible_scores, e.possible_scores)
+                self.assertEqual(a.mean(), e.mean())
+            for a, e in zip(batch_scoring.calculate_scores(original_cards, keep_flips=False), expected):
+                self.assertEqual((str(a), a.kept_cards, a.histogram, a.total), (str(e), e.kept_cards, e.histogram, e.total))
+                self.assertEqual((a.min(), a.max()), (e.min(), e.max()))
+
+    def test_score_matrices_many_deals(self):
+        rng = random.Random(5)
+        deals = [rng.sample(range(52), 6) for _ in range(10)]
+        flips, scores = batch_scoring.score_matrices(deals)
+        self.assertEqual(scores.shape, (10, 15, 46))
+        for deal, deal_flips, deal_scores in zip(deals, flips, scores):
+            self.assertEqual(set(deal) & set(deal_flips), set())
+            single_flips, single_scores = batch_scoring.score_matrix([DECK[i] for i in deal])
+            self.assertEqual([c.index for c in single_flips], list(deal_flips))
+            self.assertTrue((single_scores == deal_scores).all())
+
+
+if __name__ == '__main__':
+    main()
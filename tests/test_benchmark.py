@@ -0,0 +1,40 @@
+from unittest import TestCase, main
+from hand import Hand
+import benchmark
+
+class TestBenchmark(TestCase):
+    def test_corpora_are_seeded(self):
+        self.assertEqual(benchmark.random_hands(5), benchmark.random_hands(5))
+        self.assertEqual(benchmark.random_deals(5), benchmark.random_deals(5))
+        self.assertNotEqual(benchmark.random_deals(5), benchmark.random_deals(5, seed=1))
+        self.assertEqual(len(benchmark.enumeration_hands(10)), 10)
+
+    def test_worst_case_hands(self):
+        cards, flip_card = benchmark.WORST_CASE_HANDS[0]
+        self.assertEqual(Hand(cards, flip_card).calculate_score(), 29)
+
+    def test_run_benchmark(self):
+        result = benchmark.run_benchmark('hand.calculate_runs', scale=0.01, repeat=1)
+        self.assertEqual(result['calls'], 20 + 7 + 20)
+        self.assertTrue(result['p50_us'] <= result['p90_us'] <= result['p99_us'])
+        self.assertTrue(result['ops_per_sec'] > 0)
+        self.assertTrue(result['peak_rss_kb'] > 0)
+
+    def test_compare(self):
+        baseline = {'benchmarks': {
+            'a': {'ops_per_sec': 1000.0, 'p50_us': 10.0, 'p99_us': 20.0},
+            'b': {'ops_per_sec': 1000.0, 'p50_us': 10.0, 'p99_us': 20.0},
+        }}
+        results = {'benchmarks': {
+            'a': {'ops_per_sec': 950.0, 'p50_us': 10.5, 'p99_us': 21.0},
+            'b': {'ops_per_sec': 800.0, 'p50_us': 10.0, 'p99_us': 30.0},
+            'c': {'ops_per_sec': 1.0, 'p50_us': 1000.0, 'p99_us': 1000.0},
+        }}
+        self.assertEqual(benchmark.compare(baseline, results, 0.1), [
+            ('b', 'ops_per_sec', 1000.0, 800.0),
+            ('b', 'p99_us', 20.0, 30.0),
+        ])
+        self.assertEqual(benchmark.compare(baseline, results, 0.5), [])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import random
+from unittest import TestCase, main
+from card import Card, DECK
+from canonical import canonicalize, histogram_form, relabel, restore_discards
+import cribbage_game
+
+class TestCanonical(TestCase):
+    def create_cards(self, card_strings):
+        return [Card(c[:-1], c[-1]) for c in card_strings]
+
+    def test_canonicalize_isomorphic_deals(self):
+        deal = self.create_cards(['8C', 'AH', '10H', 'KC', '5D', '2S'])
+        canonical_cards, _ = canonicalize(deal)
+        for suit_map in ([1, 0, 3, 2], [3, 2, 1, 0], [0, 2, 1, 3]):
+            self.assertEqual(canonicalize(relabel(deal, suit_map))[0], canonical_cards)
+
+    def test_canonicalize_different_deals(self):
+        deal1 = self.create_cards(['8C', 'AH', '10H', 'KC', '5D', '2S'])
+        deal2 = self.create_cards(['8C', 'AH', '10H', 'KH', '5D', '2S'])
+        self.assertNotEqual(canonicalize(deal1)[0], canonicalize(deal2)[0])
+
+    def test_canonicalize_suit_map(self):
+        deal = self.create_cards(['8C', 'AH', '10H', 'KC', '5D', '2S'])
+        canonical_cards, suit_map = canonicalize(deal)
+        self.assertEqual(sorted(relabel(canonical_cards, suit_map), key=lambda c: c.index),
+                         sorted(deal, key=lambda c: c.index))
+
+    def test_restore_discards(self):
+        rng = random.Random(8)
+        for _ in range(10):
+            deal = rng.sample(DECK, 6)
+            canonical_cards, suit_map = canonicalize(deal)
+            restored = restore_discards(histogram_form(cribbage_game.calculate_scores(canonical_cards)), suit_map, deal)
+            expected = cribbage_game.calculate_scores(deal)
+            self.assertEqual([str(d) for d in restored], [str(d) for d in expected])
+            for r, e in zip(restored, expected):
+                self.assertEqual(r.histogram, e.histogram)
+                self.assertEqual(r.kept_cards, e.kept_cards)
+                self.assertEqual(r.possible_scores, e.possible_scores)
+
+    def test_restore_discards_without_flips(self):
+        deal = self.create_cards(['8C', 'AH', '10H', 'KC', '5D', '2S'])
+        canonical_cards, suit_map = canonicalize(deal)
+        discards = histogram_form(cribbage_game.calculate_scores(canonical_cards, keep_flips=False))
+        restored = restore_discards(discards, suit_map, deal)
+        expected = cribbage_game.calculate_scores(deal, keep_flips=False)
+        self.assertEqual([(str(d), d.histogram, d.keep_flips) for d in restored],
+                         [(str(d), d.histogram, d.keep_flips) for d in expected])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
+import pickle
 from unittest import TestCase, main
-from card import Card
+from card import Card, DECK
 
 class TestCard(TestCase):
     def setUp(self):
@@ -44,6 +45,22 @@ class TestCard(TestCase):
         self.assertEqual(Card('Q', 'C').next_rank(), 'K')
         self.assertIsNone(Card('K', 'C').next_rank())
 
+    def test_interned(self):
+        self.assertIs(Card('4', 'D'), self.card2)
+        self.assertIs(pickle.loads(pickle.dumps(self.card3)), self.card3)
+        self.assertRaises(ValueError, Card, '11', 'S')
+        self.assertRaises(ValueError, Card, '3', 'T')
+
+    def test_index(self):
+        self.assertEqual(len(DECK), 52)
+        self.assertEqual(Card('A', 'S').index, 0)
+        self.assertEqual(Card('4', 'D').index, 14)
+        self.assertEqual(Card('K', 'H').index, 51)
+        for i, card in enumerate(DECK):
+            self.assertEqual(card.index, i)
+            self.assertIs(Card.from_index(i), card)
+            self.assertEqual(card.bit, 1 << i)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,42 @@
+import pickle
+from unittest import TestCase, main
+from card import Card
+from card_set import CardSet, FULL_DECK
+
+class TestCardSet(TestCase):
+    def setUp(self):
+        self.cards = [Card('K', 'H'), Card('A', 'S'), Card('10', 'C')]
+        self.card_set = CardSet(self.cards)
+
+    def test_iter_in_index_order(self):
+        self.assertEqual(list(self.card_set), [Card('A', 'S'), Card('10', 'C'), Card('K', 'H')])
+
+    def test_len_and_contains(self):
+        self.assertEqual(len(self.card_set), 3)
+        self.assertEqual(len(FULL_DECK), 52)
+        self.assertEqual(len(CardSet()), 0)
+        self.assertTrue(Card('10', 'C') in self.card_set)
+        self.assertFalse(Card('10', 'S') in self.card_set)
+        self.assertFalse(CardSet())
+
+    def test_set_operations(self):
+        other = CardSet([Card('A', 'S'), Card('2', 'D')])
+        self.assertEqual(self.card_set | other, CardSet(self.cards + [Card('2', 'D')]))
+        self.assertEqual(self.card_set & other, CardSet([Card('A', 'S')]))
+        self.assertEqual(self.card_set - other, CardSet([Card('10', 'C'), Card('K', 'H')]))
+        self.assertEqual(self.card_set ^ other, CardSet([Card('10', 'C'), Card('K', 'H'), Card('2', 'D')]))
+        self.assertEqual(len(~self.card_set), 49)
+        self.assertEqual(FULL_DECK - self.card_set, ~self.card_set)
+
+    def test_add_and_remove(self):
+        self.assertEqual(len(self.card_set.add(Card('2', 'D'))), 4)
+        self.assertEqual(self.card_set.remove(Card('A', 'S')), CardSet([Card('10', 'C'), Card('K', 'H')]))
+        self.assertRaises(KeyError, self.card_set.remove, Card('2', 'D'))
+        self.assertEqual(len(self.card_set), 3)
+
+    def test_pickle(self):
+        self.assertEqual(pickle.loads(pickle.dumps(self.card_set)), self.card_set)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import os
+import random
+import shutil
+import statistics
+import tempfile
+from unittest import TestCase, main, skipIf
+from card import DECK
+import cribbage_game
+try:
+    import numpy
+    import columnar
+except ImportError:
+    numpy = None
+
+@skipIf(numpy is None, "numpy is not installed")
+class TestColumnar(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_parse_deals(self):
+        lines = ["8C, AH, 10H, KC, 5D, 2S",
+                 "8C, AH, 10H",
+                 "",
+                 "8c,ah, 10h,kc ,5d,2S",
+                 "8C, AH, 10H, KC, 5D, 8C",
+                 "8X, AH, 10H, KC, 5D, 2S",
+                 "8C, AH, 10H, KC, 5D, 2S, 3S"]
+        deals, line_numbers, skipped = columnar.parse_deals(lines)
+        expected = [card.index for card in cribbage_game.parse_cards(lines[0].split(','))]
+        self.assertEqual(deals.tolist(), [expected, expected])
+        self.assertEqual(line_numbers.tolist(), [1, 4])
+        self.assertEqual(skipped, [2, 5, 6, 7])
+
+    def test_read_deals_in_blocks(self):
+        lines = ["8C, AH, 10H, KC, 5D, 2S\r\n", "\n", "  \n", "1H, AH, 10H, KC, 5D, 2S\n", "10c,9c,8c,7c,6c,5c\n",
+                 ",,,,,\n", "QS, KS, 0H, AS, 2S, 3S\n", "JD, QD, KD, AD, 2D, 3D"]
+        log = os.path.join(self.directory, 'deals.log')
+        with open(log, 'wb') as f:
+            f.write(''.join(lines))
+        expected = [[card.index for card in cribbage_game.parse_cards(lines[i].split(','))] for i in (0, 4, 7)]
+        for block_size in (1, 7, 50, columnar.BLOCK_SIZE):
+            deals, line_numbers, skipped = columnar.read_deals(log, block_size)
+            self.assertEqual(deals.tolist(), expected)
+            self.assertEqual(line_numbers.tolist(), [1, 5, 8])
+            self.assertEqual(skipped, [4, 6, 7])
+
+    def test_columns_match_discard_stats(self):
+        rng = random.Random(2)
+        deals = [rng.sample(DECK, 6) for _ in range(30)]
+        log = os.path.join(self.directory, 'deals.log')
+        with open(log, 'w') as f:
+            f.writelines(", ".join(str(card) for card in deal) + "\n" for deal in deals)
+        output = os.path.join(self.directory, 'columns')
+        columnar.write_columns(output, *columnar.read_deals(log), chunk_size=7)
+
+        manifest, columns = columnar.load_columns(output)
+        self.assertEqual(manifest['count'], 30)
+        self.assertIsInstance(columns['mean'], numpy.memmap)
+        self.assertEqual(columns['mean'].shape, (30, 15))
+        for row, deal in enumerate(deals):
+            self.assertEqual(columns['deals'][row].tolist(), [card.index for card in deal])
+            for i, discard in enumerate(cribbage_game.calculate_scores(deal, keep_flips=False)):
+                self.assertEqual(columns['total'][row, i], discard.total)
+                self.assertEqual(columns['min'][row, i], discard.min())
+                self.assertEqual(columns['max'][row, i], discard.max())
+                self.assertAlmostEqual(columns['mean'][row, i], discard.mean())
+                self.assertEqual(columns['median'][row, i], discard.median())
+                try:
+                    mode = discard.mode()
+                except statistics.StatisticsError:
+                    mode = -1
+                self.assertEqual(columns['mode'][row, i], mode)
+                self.assertAlmostEqual(columns['variance'][row, i], discard.variance())
+                self.assertEqual(columns['crib'][row, i], discard.crib_ev())
+
+    def test_no_deals(self):
+        manifest = columnar.write_columns(self.directory, [])
+        self.assertEqual(manifest['count'], 0)
+        self.assertEqual(columnar.load_columns(self.directory)[1]['max'].shape, (0, 15))
+
+
+if __name__ == '__main__':
+    main()
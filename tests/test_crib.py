@@ -0,0 +1,68 @@
+from itertools import combinations
+from unittest import TestCase, main
+from card import Card
+from card_set import CardSet, FULL_DECK
+from crib import CribTable, crib_expected_value, default_crib_table
+from discard import Discard
+from score_table import default_table
+
+class TestCrib(TestCase):
+    def create_cards(self, card_strings):
+        return [Card(c[:-1], c[-1]) for c in card_strings]
+
+    def brute_force_crib_value(self, discards, known_cards):
+        """ Scores every possible crib one at a time """
+        table = default_table()
+        pool = list(FULL_DECK - CardSet(discards) - CardSet(known_cards))
+        total = 0
+        cribs = 0
+        for other_discards in combinations(pool, 2):
+            crib = discards + list(other_discards)
+            for flip_card in pool:
+                if flip_card in other_discards:
+                    continue
+                pairs, runs, fifteens, _, nobs = table.components(crib, flip_card)
+                flush = 5 if len(set(c.suit for c in crib + [flip_card])) == 1 else 0
+                total += pairs + runs + fifteens + flush + nobs
+                cribs += 1
+        return float(total) / cribs
+
+    def test_crib_expected_value_matches_brute_force(self):
+        # Suited jack to exercise the flush and nobs terms
+        discards = self.create_cards(['JH', '5H'])
+        known_cards = self.create_cards(['5C', '6H', '7H', 'KS'])
+        self.assertAlmostEqual(crib_expected_value(discards, known_cards),
+                               self.brute_force_crib_value(discards, known_cards))
+
+    def test_crib_expected_value_pair(self):
+        discards = self.create_cards(['5S', '5D'])
+        known_cards = self.create_cards(['JD', 'QC', 'AH', '2H'])
+        self.assertAlmostEqual(crib_expected_value(discards, known_cards),
+                               self.brute_force_crib_value(discards, known_cards))
+
+    def test_crib_table(self):
+        table = default_crib_table()
+        for card_strings in (['5S', '5D'], ['JH', '5H'], ['KC', 'AD'], ['3C', '4C']):
+            card1, card2 = self.create_cards(card_strings)
+            self.assertAlmostEqual(table.expected_value(card1, card2), crib_expected_value([card1, card2]))
+            self.assertEqual(table.expected_value(card1, card2), table.expected_value(card2, card1))
+        # Fives are the best cards to throw into a crib
+        self.assertGreater(table.expected_value(Card('5', 'S'), Card('5', 'D')),
+                           table.expected_value(Card('K', 'C'), Card('A', 'D')))
+        self.assertRaises(ValueError, CribTable, [0.0])
+
+    def test_discard_dealer_and_pone_ev(self):
+        kept_cards = self.create_cards(['5C', '6H', '7H', 'KS'])
+        discard = Discard(Card('J', 'H'), Card('5', 'H'), kept_cards=kept_cards)
+        for score in (4, 8, 12):
+            discard.add_score(score)
+        crib_ev = default_crib_table().expected_value(Card('J', 'H'), Card('5', 'H'))
+        self.assertAlmostEqual(discard.dealer_ev(), 8 + crib_ev)
+        self.assertAlmostEqual(discard.pone_ev(), 8 - crib_ev)
+        conditioned = crib_expected_value(discard.cards, kept_cards)
+        self.assertAlmostEqual(discard.dealer_ev(conditioned=True), 8 + conditioned)
+        self.assertRaises(ValueError, Discard(Card('J', 'H'), Card('5', 'H')).crib_ev, True)
+
+
+if __name__ == '__main__':
+    main()
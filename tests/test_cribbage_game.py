@@ -0,0 +1,109 @@
+import random
+import sys
+from array import array
+from StringIO import StringIO
+from unittest import TestCase, main
+from card import Card, DECK
+from hand import Hand
+import cribbage_game
+
+class TestCribbageGame(TestCase):
+    def create_cards(self, card_strings):
+        return [Card(c[:-1], c[-1]) for c in card_strings]
+
+    def test_remaining_cards_in_deck(self):
+        original_cards = self.create_cards(['8C', 'AH', '10H', 'KC', '5D', '2S'])
+        remaining_cards = cribbage_game.remaining_cards_in_deck(original_cards)
+        self.assertEqual(len(remaining_cards), 46)
+        self.assertEqual(set(remaining_cards) & set(original_cards), set())
+        self.assertEqual(remaining_cards[0], Card('A', 'S'))
+
+    def test_calculate_scores(self):
+        original_cards = self.create_cards(['8C', 'AH', '10H', 'KC', '5D', '2S'])
+        discard_stats = cribbage_game.calculate_scores(original_cards)
+        self.assertEqual(len(discard_stats), 15)
+        self.assertEqual(str(discard_stats[0]), "8C, AH")
+        discard = discard_stats[0]
+        for flip_card, score in discard.possible_scores.items():
+            self.assertEqual(score, Hand(discard.kept_cards, flip_card).calculate_score())
+
+    def test_known_cards(self):
+        original_cards = self.create_cards(['8C', 'AH', '10H', 'KC', '5D', '2S'])
+        known_cards = self.create_cards(['5C', 'JH', 'AS'])
+        remaining_cards = cribbage_game.remaining_cards_in_deck(original_cards, known_cards)
+        self.assertEqual(len(remaining_cards), 43)
+        self.assertEqual(remaining_cards[0], Card('A', 'C'))
+
+        expected = cribbage_game.calculate_scores(original_cards, known_cards=known_cards)
+        for keep_flips in (True, False):
+            discard_stats = cribbage_game.calculate_scores(original_cards, keep_flips)
+            for card in known_cards:
+                cribbage_game.remove_flip_card(discard_stats, card)
+            for discard, expected_discard in zip(discard_stats, expected):
+                self.assertEqual(discard.histogram, expected_discard.histogram)
+                self.assertEqual(discard.mean(), expected_discard.mean())
+                self.assertEqual(discard.min(), expected_discard.min())
+                self.assertEqual(discard.max(), expected_discard.max())
+        for keep_flips in (True, False):
+            discard_stats = cribbage_game.calculate_scores(original_cards, keep_flips, known_cards)
+            self.assertRaises(KeyError, cribbage_game.remove_flip_card, discard_stats, known_cards[0])
+            self.assertEqual(discard_stats[0].count, 43)
+            cribbage_game.remove_flip_card(discard_stats, Card('Q', 'D'))
+            self.assertRaises(KeyError, cribbage_game.remove_flip_card, discard_stats, Card('Q', 'D'))
+            self.assertEqual([discard.count for discard in discard_stats], [42] * 15)
+        self.assertEqual(str(cribbage_game.best_mean_discard(original_cards, known_cards=known_cards)[0]),
+                         str(max(expected, key=lambda s: s.mean())))
+
+    def test_best_mean_discard_matches_exhaustive(self):
+        rng = random.Random(9)
+        skipped = 0
+        for _ in range(100):
+            original_cards = rng.sample(DECK, 6)
+            expected = max(cribbage_game.calculate_scores(original_cards), key=lambda s: s.mean())
+            discard, deal_skipped = cribbage_game.best_mean_discard(original_cards)
+            self.assertEqual(discard.cards, expected.cards)
+            self.assertEqual(discard.mean(), expected.mean())
+            self.assertEqual(discard.possible_scores, expected.possible_scores)
+            skipped += deal_skipped
+        self.assertGreater(skipped, 0)
+
+    def test_best_mean_discard_ties(self):
+        # AD, 9D and 2S, 9D have the same average, and the first one has to win
+        original_cards = self.create_cards(['KC', 'KS', 'AD', '2S', 'JS', '9D'])
+        expected = max(cribbage_game.calculate_scores(original_cards), key=lambda s: s.mean())
+        discard, _ = cribbage_game.best_mean_discard(original_cards)
+        self.assertEqual(str(expected), "AD, 9D")
+        self.assertEqual(discard.cards, expected.cards)
+
+
+class TestMain(TestCase):
+    def run_main(self, *arguments):
+        """ Returns what main prints for the deal 8C, AH, 10H, KC, 5D, 2S """
+        saved = sys.argv, sys.stdout, sys.stderr
+        sys.argv = ['cribbage_game.py'] + list(arguments)
+        sys.stdout = sys.stderr = StringIO()
+        cribbage_game.raw_input = lambda prompt: '8C, AH, 10H, KC, 5D, 2S'
+        try:
+            cribbage_game.main()
+            return sys.stdout.getvalue()
+        finally:
+            sys.argv, sys.stdout, sys.stderr = saved
+            del cribbage_game.raw_input
+
+    def test_score_out_of_range(self):
+        self.assertRaises(SystemExit, self.run_main, '--score', '121', '90')
+        self.assertRaises(SystemExit, self.run_main, '--score', '3', '-1')
+
+    def test_score_beyond_win_table(self):
+        import win_probability
+        saved = win_probability._default_win_table
+        win_probability._default_win_table = win_probability.WinTable(
+            array('f', [0.5] * (2 * 5 * 5 * win_probability.NUM_SCORES)), 5)
+        try:
+            self.assertIn("only goes up to 5 points", self.run_main('--score', '100', '3'))
+            self.assertIn("most likely to win", self.run_main('--score', '1', '3'))
+        finally:
+            win_probability._default_win_table = saved
+
+if __name__ == '__main__':
+    main()
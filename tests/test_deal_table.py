@@ -0,0 +1,117 @@
+import os
+import random
+import shutil
+import tempfile
+from unittest import TestCase, main
+from card import DECK
+from canonical import canonicalize, relabel
+import cribbage_game
+import deal_table
+
+class TestDealTable(TestCase):
+    def setUp(self):
+        rng = random.Random(6)
+        self.deals = [rng.sample(DECK, 6) for _ in range(5)]
+        self.keys = [deal_table.deal_key(canonicalize(deal)[0]) for deal in self.deals]
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'deals.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assert_matches_calculate_scores(self, records, deal):
+        expected = cribbage_game.calculate_scores(deal)
+        self.assertEqual([str(r) for r in records], [str(d) for d in expected])
+        for record, discard in zip(records, expected):
+            self.assertEqual(record.scores(), sorted(discard.scores()))
+            self.assertAlmostEqual(record.mean(), discard.mean())
+            self.assertEqual(record.median(), discard.median())
+            self.assertEqual(record.min(), discard.min())
+            self.assertEqual(record.max(), discard.max())
+
+    def test_deal_key(self):
+        self.assertEqual(deal_table.deal_key(DECK[:6]), 0)
+        self.assertEqual(deal_table.deal_key(DECK[-6:]), 20358519)
+        for deal in self.deals:
+            self.assertEqual(deal_table.key_cards(deal_table.deal_key(deal)), sorted(deal, key=lambda c: c.index))
+
+    def test_canonical_keys(self):
+        keys = deal_table.canonical_keys()
+        self.assertEqual(len(keys), 962988)
+        self.assertEqual(keys, sorted(set(keys)))
+        self.assertTrue(set(self.keys) <= set(keys))
+        for key in keys[::997]:
+            cards = deal_table.key_cards(key)
+            self.assertEqual(canonicalize(cards)[0], cards)
+
+    def test_build_and_lookup(self):
+        deal_table.build(self.path, keys=self.keys, processes=1, chunk_size=2)
+        table = deal_table.DealTable(self.path)
+        self.assertEqual(len(table), 5)
+        self.assertTrue(table.verify())
+        for deal in self.deals:
+            self.assert_matches_calculate_scores(table.lookup(deal), deal)
+            relabelled = relabel(deal, [3, 1, 0, 2])
+            self.assert_matches_calculate_scores(table.lookup(relabelled), relabelled)
+        self.assertRaises(KeyError, table.lookup, DECK[:6])
+        table.close()
+        self.assertFalse(os.path.exists(self.path + '.progress'))
+
+    def interrupt_build(self, chunk, done):
+        """ Pretends the build stopped with only the done chunks (of 2 deals) written """
+        with open(self.path, 'r+b') as f:
+            header = list(deal_table.HEADER.unpack(f.read(deal_table.HEADER.size)))
+            header[4:6] = [0, 0]
+            f.seek(0)
+            f.write(deal_table.HEADER.pack(*header))
+            f.seek(deal_table.HEADER.size + 5 * deal_table.KEY.size + chunk * 2 * deal_table.RECORD_SIZE)
+            f.write(b'\0' * 2 * deal_table.RECORD_SIZE)
+        with open(self.path + '.progress', 'w') as f:
+            f.write(deal_table.PROGRESS_PREFIX + '2\n')
+            f.write(''.join('{}\n'.format(c) for c in done))
+
+    def test_resume_build(self):
+        deal_table.build(self.path, keys=self.keys, processes=1, chunk_size=2)
+        self.interrupt_build(0, [1, 2])
+        self.assertRaises(ValueError, deal_table.DealTable, self.path)
+
+        deal_table.build(self.path, processes=1, chunk_size=2)
+        table = deal_table.DealTable(self.path)
+        self.assertTrue(table.verify())
+        for deal in self.deals:
+            self.assert_matches_calculate_scores(table.lookup(deal), deal)
+        table.close()
+
+    def test_resume_with_other_settings(self):
+        deal_table.build(self.path, keys=self.keys, processes=1, chunk_size=2)
+        # The chunks of 2000 would be numbered differently, so it starts over
+        self.interrupt_build(1, [0, 2])
+        deal_table.build(self.path, processes=1)
+        table = deal_table.DealTable(self.path)
+        self.assertTrue(table.verify())
+        for deal in self.deals:
+            self.assert_matches_calculate_scores(table.lookup(deal), deal)
+        table.close()
+
+        # Other deals start over too
+        deal_table.build(self.path, keys=self.keys, processes=1, chunk_size=2)
+        self.interrupt_build(1, [0, 2])
+        deal_table.build(self.path, keys=self.keys[:3], processes=1, chunk_size=2)
+        table = deal_table.DealTable(self.path)
+        self.assertEqual(len(table), 3)
+        for deal in self.deals[:3]:
+            self.assert_matches_calculate_scores(table.lookup(deal), deal)
+        table.close()
+
+    def test_verify_detects_corruption(self):
+        deal_table.build(self.path, keys=self.keys, processes=1, chunk_size=2)
+        with open(self.path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'\xff')
+        table = deal_table.DealTable(self.path)
+        self.assertFalse(table.verify())
+        table.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import statistics
+from unittest import TestCase, main
+from card import Card
+from discard import Discard
+from hand import PartialHand
+
+class TestDiscard(TestCase):
+    def setUp(self):
+        self.discard = Discard(Card('A', 'S'), Card('K', 'H'))
+        self.flip_scores = [(Card('2', 'C'), 4), (Card('5', 'D'), 8), (Card('9', 'H'), 4),
+                            (Card('J', 'S'), 12), (Card('3', 'S'), 0), (Card('4', 'D'), 5)]
+        for flip_card, score in self.flip_scores:
+            self.discard.add(flip_card, score)
+        self.scores = [score for _, score in self.flip_scores]
+
+    def test_str(self):
+        self.assertEqual(str(self.discard), "AS, KH")
+
+    def test_add(self):
+        self.assertEqual(self.discard.possible_scores[Card('5', 'D')], 8)
+        self.assertEqual(self.discard.count, 6)
+        self.assertEqual(self.discard.histogram[4], 2)
+        self.assertRaises(RuntimeError, self.discard.add, Card('5', 'D'), 6)
+
+    def test_stats_match_statistics_module(self):
+        self.assertEqual(sorted(self.discard.scores()), sorted(self.scores))
+        self.assertAlmostEqual(self.discard.mean(), statistics.mean(self.scores))
+        self.assertEqual(self.discard.median(), statistics.median(self.scores))
+        self.assertEqual(self.discard.mode(), statistics.mode(self.scores))
+        self.assertAlmostEqual(self.discard.variance(), statistics.pvariance(self.scores))
+        self.assertAlmostEqual(self.discard.stdev(), statistics.pstdev(self.scores))
+        self.assertEqual(self.discard.min(), 0)
+        self.assertEqual(self.discard.max(), 12)
+
+    def test_median_odd(self):
+        self.discard.add(Card('Q', 'D'), 29)
+        self.assertEqual(self.discard.median(), statistics.median(self.scores + [29]))
+
+    def test_mode_not_unique(self):
+        self.discard.add(Card('Q', 'D'), 8)
+        self.assertRaises(statistics.StatisticsError, self.discard.mode)
+
+    def test_without_flips(self):
+        discard = Discard(Card('A', 'S'), Card('K', 'H'), keep_flips=False)
+        for flip_card, score in self.flip_scores:
+            discard.add(flip_card, score)
+        self.assertEqual(discard.possible_scores, {})
+        self.assertEqual(discard.scores(), sorted(self.scores))
+        self.assertEqual(discard.mean(), self.discard.mean())
+        self.assertEqual(discard.max(), 12)
+
+    def test_from_histogram(self):
+        discard = Discard.from_histogram(Card('A', 'S'), Card('K', 'H'), self.discard.histogram)
+        self.assertEqual(discard.total, self.discard.total)
+        self.assertEqual(discard.min(), 0)
+        self.assertEqual(discard.median(), self.discard.median())
+
+    def test_remove_flip(self):
+        self.discard.remove_flip(Card('J', 'S'))
+        self.discard.remove_flip(Card('3', 'S'))
+        scores = [4, 8, 4, 5]
+        self.assertEqual(self.discard.count, 4)
+        self.assertEqual(sorted(self.discard.scores()), sorted(scores))
+        self.assertAlmostEqual(self.discard.mean(), statistics.mean(scores))
+        self.assertEqual(self.discard.min(), 4)
+        self.assertEqual(self.discard.max(), 8)
+        self.assertRaises(KeyError, self.discard.remove_flip, Card('J', 'S'))
+
+    def test_remove_flip_without_flips(self):
+        discard = Discard.from_histogram(Card('A', 'S'), Card('K', 'H'), self.discard.histogram)
+        discard.remove_flip(Card('J', 'S'), 12)
+        self.assertEqual(discard.max(), 8)
+        self.assertRaises(ValueError, discard.remove_flip, Card('J', 'C'), 12)
+        self.assertRaises(ValueError, discard.remove_flip, Card('J', 'C'))
+        self.assertRaises(KeyError, discard.remove_flip, Card('J', 'S'), 12)
+
+    def test_remove_flip_twice(self):
+        kept_cards = [Card('5', 'C'), Card('5', 'D'), Card('10', 'H'), Card('K', 'C')]
+        discard = Discard(Card('A', 'S'), Card('2', 'S'), keep_flips=False, kept_cards=kept_cards,
+                          excluded=[Card('Q', 'S')])
+        hand = PartialHand(kept_cards)
+        for flip_card, _ in self.flip_scores:
+            discard.add(flip_card, hand.calculate_score(flip_card))
+        discard.remove_flip(Card('J', 'S'))
+        histogram = list(discard.histogram)
+        self.assertRaises(KeyError, discard.remove_flip, Card('J', 'S'))
+        self.assertRaises(KeyError, discard.remove_flip, Card('Q', 'S'))
+        self.assertEqual(discard.count, 5)
+        self.assertEqual(discard.histogram, histogram)
+
+    def test_empty(self):
+        discard = Discard(Card('A', 'S'), Card('K', 'H'))
+        self.assertRaises(statistics.StatisticsError, discard.mean)
+        self.assertRaises(statistics.StatisticsError, discard.median)
+        self.assertRaises(statistics.StatisticsError, discard.mode)
+        self.assertRaises(statistics.StatisticsError, discard.variance)
+        self.assertRaises(ValueError, discard.min)
+        self.assertRaises(ValueError, discard.max)
+
+
+if __name__ == '__main__':
+    main()
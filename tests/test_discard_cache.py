@@ -0,0 +1,64 @@
+from unittest import TestCase, main
+from card import Card
+from canonical import relabel
+from discard_cache import DiscardCache
+import cribbage_game
+
+class TestDiscardCache(TestCase):
+    def setUp(self):
+        self.deal = [Card(c[:-1], c[-1]) for c in ['8C', 'AH', '10H', 'KC', '5D', '2S']]
+
+    def test_hits_and_misses(self):
+        cache = DiscardCache(maxsize=10)
+        cache.calculate_scores(self.deal)
+        cache.calculate_scores(self.deal)
+        cache.calculate_scores(relabel(self.deal, [2, 3, 0, 1]))
+        self.assertEqual(cache.stats(), {'size': 1, 'maxsize': 10, 'hits': 2, 'misses': 1, 'evictions': 0})
+
+    def test_isomorphic_deal_result(self):
+        cache = DiscardCache()
+        cache.calculate_scores(self.deal)
+        deal = relabel(self.deal, [2, 3, 0, 1])
+        cached = cache.calculate_scores(deal)
+        expected = cribbage_game.calculate_scores(deal)
+        self.assertEqual([str(d) for d in cached], [str(d) for d in expected])
+        for c, e in zip(cached, expected):
+            self.assertEqual(c.possible_scores, e.possible_scores)
+
+    def test_results_dont_share_entries(self):
+        cache = DiscardCache()
+        first = cache.calculate_scores(self.deal)
+        flip_card = first[0].possible_scores.keys()[0]
+        first[0].remove_flip(flip_card)
+        second = cache.calculate_scores(self.deal)
+        self.assertEqual(second[0].count, 46)
+        self.assertIn(flip_card, second[0].possible_scores)
+
+    def test_evicts_least_recently_used(self):
+        cache = DiscardCache(maxsize=2)
+        deal2 = self.deal[:5] + [Card('3', 'S')]
+        deal3 = self.deal[:5] + [Card('4', 'S')]
+        cache.calculate_scores(self.deal)
+        cache.calculate_scores(deal2)
+        cache.calculate_scores(self.deal)
+        cache.calculate_scores(deal3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        cache.calculate_scores(self.deal)
+        self.assertEqual(cache.hits, 2)
+        cache.calculate_scores(deal2)
+        self.assertEqual(cache.misses, 4)
+
+    def test_clear(self):
+        cache = DiscardCache()
+        cache.calculate_scores(self.deal)
+        cache.clear()
+        self.assertEqual(cache.stats()['size'], 0)
+        self.assertEqual(cache.misses, 0)
+
+    def test_invalid_maxsize(self):
+        self.assertRaises(ValueError, DiscardCache, 0)
+
+
+if __name__ == '__main__':
+    main()
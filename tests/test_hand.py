@@ -1,6 +1,8 @@
+import random
 from unittest import TestCase, main
-from hand import Hand
-from card import Card
+from itertools import combinations
+from hand import Hand, PartialHand, calculate_runs_from_counts, count_subset_sums
+from card import Card, DECK
 
 class TestHand(TestCase):
     def create_hand(self, card_strings, flip_card):
@@ -273,6 +275,65 @@ class TestHand(TestCase):
         self.assertEqual(hand.calculate_15s(), 4)
         self.assertEqual(hand.calculate_score(), 18)
 
+    def test_hand_15s_match_enumeration(self):
+        rng = random.Random(5)
+        for _ in range(300):
+            cards = rng.sample(DECK, 5)
+            fifteens = 0
+            for size in range(2, 6):
+                for subset in combinations(cards, size):
+                    if sum(c.value for c in subset) == 15:
+                        fifteens += 2
+            self.assertEqual(Hand(cards[:4], cards[4]).calculate_15s(), fifteens)
+
+
+class TestPartialHand(TestCase):
+    def create_cards(self, card_strings):
+        return [Card(c[:-1], c[-1]) for c in card_strings]
+
+    def test_validate_partial_hand_input(self):
+        self.assertRaises(ValueError, PartialHand, self.create_cards(['AC', '2C', '3C']))
+        self.assertRaises(ValueError, PartialHand, self.create_cards(['AC', '2C', '3C', '4C', '5C']))
+
+    def test_precomputed_state(self):
+        hand = PartialHand(self.create_cards(['5C', '5D', 'JC', '4C']))
+        self.assertEqual(hand.rank_counts, [0, 0, 0, 1, 2, 0, 0, 0, 0, 0, 1, 0, 0])
+        self.assertEqual(hand.subset_sums[15], 2)
+        self.assertEqual(hand.subset_sums[9], 2)
+        self.assertIsNone(hand.flush_suit)
+        self.assertEqual(hand.score, 6)
+
+    def test_calculate_flip_delta(self):
+        hand = PartialHand(self.create_cards(['2C', '3C', 'JC', '4C']))
+        self.assertEqual(hand.score, 9)
+        self.assertEqual(hand.calculate_flip_delta(Card('3', 'C')), 9)
+        self.assertEqual(hand.calculate_flip_delta(Card('3', 'H')), 7)
+        self.assertEqual(hand.calculate_flip_delta(Card('K', 'S')), 2)
+
+    def test_calculate_score_matches_hand(self):
+        rng = random.Random(4)
+        for _ in range(300):
+            cards = rng.sample(DECK, 4)
+            hand = PartialHand(cards)
+            for flip_card in DECK:
+                if flip_card not in cards:
+                    self.assertEqual(hand.calculate_score(flip_card), Hand(cards, flip_card).calculate_score())
+
+    def test_calculate_runs_from_counts(self):
+        self.assertEqual(calculate_runs_from_counts([1, 1, 0, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0]), 3)
+        self.assertEqual(calculate_runs_from_counts([0, 2, 1, 2, 0, 0, 0, 0, 0, 0, 0, 0, 0]), 12)
+        self.assertEqual(calculate_runs_from_counts([0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1]), 4)
+        self.assertEqual(calculate_runs_from_counts([1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1]), 0)
+        self.assertEqual(calculate_runs_from_counts([0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 3, 1]), 9)
+
+    def test_count_subset_sums(self):
+        sums = count_subset_sums(self.create_cards(['5C', '5D', '10S', 'JC']))
+        self.assertEqual(sums[0], 1)
+        self.assertEqual(sums[5], 2)
+        self.assertEqual(sums[10], 3)
+        self.assertEqual(sums[15], 4)
+        self.assertEqual(count_subset_sums([], 3), [1, 0, 0, 0])
+
 
 if __name__ == '__main__':
     main()
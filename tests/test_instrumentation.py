@@ -0,0 +1,99 @@
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import time
+from StringIO import StringIO
+from unittest import TestCase, main, skipIf
+from card import Card
+from hand import Hand, PartialHand
+from discard_cache import DiscardCache
+import cribbage_game
+import instrumentation
+
+class TestInstrumentation(TestCase):
+    def setUp(self):
+        self.original_cards = [Card('8', 'C'), Card('A', 'H'), Card('10', 'H'), Card('K', 'C'), Card('5', 'D'), Card('2', 'S')]
+        instrumentation.reset()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+
+    def test_off_by_default(self):
+        self.assertFalse(instrumentation.enabled())
+        self.assertEqual(Hand.__dict__['calculate_15s'].__name__, 'calculate_15s')
+        cribbage_game.calculate_scores(self.original_cards)
+        self.assertEqual(instrumentation.snapshot(), {})
+
+    def test_snapshot(self):
+        instrumentation.enable()
+        instrumentation.enable() # enabling twice doesn't wrap twice
+        self.assertTrue(instrumentation.enabled())
+        cribbage_game.calculate_scores(self.original_cards)
+        Hand(self.original_cards[:4], self.original_cards[4]).calculate_score()
+        stats = instrumentation.snapshot()
+
+        self.assertEqual(stats['cribbage_game.calculate_scores']['calls'], 1)
+        self.assertEqual(stats['cribbage_game.remaining_cards_in_deck']['calls'], 1)
+        self.assertEqual(stats['partial_hand.init']['calls'], 15)
+        self.assertEqual(stats['partial_hand.calculate_score']['calls'], 15 * 46)
+        self.assertEqual(stats['discard.add']['calls'], 15 * 46)
+        for component in ('score', 'pairs', 'runs', '15s', 'suit', 'nobs'):
+            self.assertEqual(stats['hand.calculate_' + component]['calls'], 1)
+        total = stats['cribbage_game.calculate_scores']
+        self.assertTrue(total['total_ns'] >= stats['partial_hand.init']['total_ns'])
+        self.assertEqual(total['mean_ns'], total['total_ns'])
+
+    def test_cached_lookups(self):
+        cache = DiscardCache()
+        instrumentation.enable()
+        cache.calculate_scores(self.original_cards)
+        cache.calculate_scores(self.original_cards)
+        stats = instrumentation.snapshot()
+        self.assertEqual(stats['discard_cache.calculate_scores']['calls'], 2)
+        self.assertEqual(stats['cribbage_game.calculate_scores']['calls'], 1)
+
+    @skipIf(instrumentation.batch_scoring is None, "numpy is not installed")
+    def test_batch_scoring_stages(self):
+        instrumentation.enable()
+        cribbage_game.calculate_scores(self.original_cards, keep_flips=False)
+        stats = instrumentation.snapshot()
+        for stage in ('calculate_scores', 'score_matrices', 'flip_cards', 'rank_points', 'calculate_15s',
+                      'calculate_runs', 'suit_points', 'score_histograms', 'histogram_discards'):
+            self.assertEqual(stats['batch_scoring.' + stage]['calls'], 1)
+        self.assertTrue(stats['batch_scoring.calculate_scores']['total_ns'] >= stats['batch_scoring.score_matrices']['total_ns'])
+
+    def test_disable(self):
+        instrumentation.enable()
+        instrumentation.disable()
+        self.assertFalse(instrumentation.enabled())
+        self.assertEqual(PartialHand.__dict__['calculate_score'].__name__, 'calculate_score')
+        cribbage_game.calculate_scores(self.original_cards)
+        self.assertEqual(instrumentation.snapshot(), {})
+
+    def test_periodic_dump(self):
+        output = StringIO()
+        instrumentation.enable()
+        cribbage_game.best_mean_discard(self.original_cards)
+        dump = instrumentation.dump_periodically(0.01, output)
+        time.sleep(0.1)
+        dump.stop()
+        lines = output.getvalue().splitlines()
+        self.assertTrue(lines)
+        self.assertEqual(json.loads(lines[0])['cribbage_game.best_mean_discard']['calls'], 1)
+
+    def test_profile(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'deal.prof')
+            discard_stats = instrumentation.profile(path, cribbage_game.calculate_scores, self.original_cards)
+            self.assertEqual(len(discard_stats), 15)
+            names = [function[2] for function in pstats.Stats(path).stats]
+            self.assertIn('calculate_scores', names)
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+from array import array
+from unittest import TestCase, main
+from card import Card, DECK
+from discard import Discard
+import pegging
+
+def ranks(rank_strings):
+    return tuple(list(Card.RANK_MAPPINGS.keys()).index(rank) for rank in rank_strings)
+
+class TestPegging(TestCase):
+    def tearDown(self):
+        pegging._default_pegging_table = None
+
+    def test_play_points(self):
+        self.assertEqual(pegging.play_points(ranks(['5'])), 0)
+        self.assertEqual(pegging.play_points(ranks(['5', 'K'])), 2) # 15
+        self.assertEqual(pegging.play_points(ranks(['5', '5'])), 2) # pair
+        self.assertEqual(pegging.play_points(ranks(['5', '5', '5'])), 8) # three of a kind and 15
+        self.assertEqual(pegging.play_points(ranks(['2', '2', '2', '2'])), 12)
+        self.assertEqual(pegging.play_points(ranks(['3', '5', '4'])), 3) # run in any order
+        self.assertEqual(pegging.play_points(ranks(['3', '5', '4', '3'])), 5) # 15 and 5 4 3
+        self.assertEqual(pegging.play_points(ranks(['6', '4', '5', '3'])), 4)
+        self.assertEqual(pegging.play_points(ranks(['4', '3', '4', '5'])), 3) # 3 4 5
+        self.assertEqual(pegging.play_points(ranks(['3', '4', '4', '5'])), 0)
+        self.assertEqual(pegging.play_points(ranks(['K', 'Q', 'J', 'A'])), 2) # 31
+
+    def test_run_tail(self):
+        self.assertEqual(pegging._run_tail(ranks(['K', '2', '3']), 3, 15), ranks(['2', '3']))
+        self.assertEqual(pegging._run_tail(ranks(['2', '4', '3']), 1, 9), ranks(['2', '4', '3']))
+        self.assertEqual(pegging._run_tail(ranks(['2', '4', '6']), 1, 12), ranks(['4', '6']))
+        self.assertEqual(pegging._run_tail(ranks(['5', '6']), 4, 30), ranks(['6']))
+
+    def kings_engine(self):
+        # Every other card is known, so the opponent holds the four kings
+        return pegging.PeggingEngine([card for card in DECK if card.rank != 'K'])
+
+    def test_expected_value_known_opponent(self):
+        fives = [Card('5', suit) for suit in Card.VALID_SUITS]
+        engine = self.kings_engine()
+        # 5 K (15 for them) 5 K, go for them; and again with the last card
+        self.assertEqual(engine.expected_value(fives, dealer=False), -6.0)
+        # K 5 (15 for us) K 5, go for us; and again
+        self.assertEqual(engine.expected_value(fives, dealer=True), 6.0)
+
+    def test_expected_value_is_shared(self):
+        deal = [Card('5', 'C'), Card('5', 'D'), Card('J', 'H'), Card('4', 'S'), Card('6', 'H'), Card('K', 'C')]
+        engine = pegging.engine_for(deal)
+        self.assertIs(pegging.engine_for(list(reversed(deal))), engine)
+        value = pegging.pegging_expected_value(deal[:4], False, deal)
+        self.assertTrue(-31 < value < 31)
+        discard = Discard(deal[4], deal[5], kept_cards=deal[:4])
+        self.assertEqual(discard.pegging_ev(False, conditioned=True), value)
+
+    def test_table(self):
+        values = array('d', [float(i) for i in range(2 * pegging.PeggingTable.TABLE_SIZE)])
+        table = pegging.PeggingTable(values)
+        pegging._default_pegging_table = table
+        kept_cards = [Card('5', 'C'), Card('5', 'D'), Card('J', 'H'), Card('4', 'S')]
+        index = pegging.PeggingTable.index([card.numerical_order for card in kept_cards], True)
+        self.assertEqual(table.expected_value(list(reversed(kept_cards)), True), index)
+        discard = Discard(Card('6', 'H'), Card('K', 'C'), kept_cards=kept_cards)
+        discard.add_score(12)
+        self.assertEqual(discard.pegging_ev(True), index)
+        self.assertEqual(discard.dealer_ev(pegging=True), discard.dealer_ev() + index)
+        self.assertEqual(discard.pone_ev(pegging=True), discard.pone_ev() + index - 1)
+        self.assertRaises(ValueError, pegging.PeggingTable, array('d', [0.0]))
+        self.assertRaises(ValueError, Discard(Card('6', 'H'), Card('K', 'C')).pegging_ev, True)
+
+    def test_empty_table(self):
+        table = pegging.PeggingTable.empty()
+        kept_cards = [Card('5', 'C'), Card('5', 'D'), Card('J', 'H'), Card('4', 'S')]
+        value = table.expected_value(kept_cards, False)
+        self.assertEqual(value, pegging.pegging_expected_value(kept_cards, False))
+        self.assertEqual(table.values[pegging.PeggingTable.index([3, 4, 4, 10], False)], value)
+        other = [Card('5', 'H'), Card('J', 'S'), Card('4', 'C'), Card('5', 'S')]
+        self.assertEqual(table.expected_value(other, False), value)
+
+        pegging.DEFAULT_PATH, path = os.path.join(tempfile.gettempdir(), 'no_pegging_table.bin'), pegging.DEFAULT_PATH
+        try:
+            discard = Discard(Card('6', 'H'), Card('K', 'C'), kept_cards=kept_cards)
+            self.assertEqual(discard.pegging_ev(False), value)
+        finally:
+            pegging.DEFAULT_PATH = path
+
+if __name__ == '__main__':
+    main()
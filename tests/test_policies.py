@@ -0,0 +1,35 @@
+from unittest import TestCase, main
+from card import Card
+from discard import Discard
+import policies
+
+class TestPolicies(TestCase):
+    def setUp(self):
+        self.steady = Discard.from_histogram(Card('A', 'S'), Card('K', 'H'), [0] * 8 + [10])
+        self.risky = Discard.from_histogram(Card('2', 'S'), Card('3', 'H'), [6] + [0] * 19 + [4])
+        self.discard_stats = [self.steady, self.risky]
+
+    def test_policies(self):
+        self.assertIs(policies.POLICIES['mean'](self.discard_stats), self.steady)
+        self.assertIs(policies.POLICIES['max'](self.discard_stats), self.risky)
+        self.assertIs(policies.POLICIES['median'](self.discard_stats), self.steady)
+        self.assertIs(policies.POLICIES['risk_adjusted'](self.discard_stats), self.steady)
+
+    def test_risk_adjusted(self):
+        # Both discards average 8, so only the risk aversion separates them
+        self.assertIs(policies.risk_adjusted(0.0)([self.risky, self.steady]), self.risky)
+        self.assertIs(policies.risk_adjusted()([self.risky, self.steady]), self.steady)
+        self.assertIs(policies.risk_adjusted(-1.0)([self.steady, self.risky]), self.risky)
+
+    def test_ties_go_to_the_first(self):
+        same = Discard.from_histogram(Card('4', 'S'), Card('5', 'H'), [0] * 8 + [10])
+        self.assertIs(policies.POLICIES['mean']([same, self.steady]), same)
+
+    def test_mode_policy(self):
+        tied = Discard.from_histogram(Card('A', 'S'), Card('K', 'H'), [0, 0, 3, 0, 3])
+        steady = Discard.from_histogram(Card('2', 'S'), Card('3', 'H'), [0, 0, 0, 6])
+        self.assertEqual(policies.most_common_score(tied), 4)
+        self.assertIs(policies.POLICIES['mode']([steady, tied]), tied)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase, main
+from card import Card
+import cribbage_game
+import policies
+import regret
+
+def create_cards(card_strings):
+    return [Card(c[:-1], c[-1]) for c in card_strings]
+
+class TestRegret(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = regret.new_settings(deals=30, seed=2, chunk_size=7)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_patterns(self):
+        cards = create_cards(['5S', 'KH', '5C', 'AD', 'KS', 'QH'])
+        self.assertEqual(regret.rank_counts(cards), '2-2-1-1')
+        self.assertEqual(regret.ranks(cards), 'A 5 5 Q K K')
+
+    def test_regret_chunk(self):
+        chunk, totals = regret.regret_chunk((self.settings, 1))
+        self.assertEqual(chunk, 1)
+        self.assertEqual(totals['deals'], 7)
+        deals = regret.chunk_deals(self.settings, 1)
+        expected = {}
+        for cards in deals:
+            discard_stats = cribbage_game.calculate_scores(cards)
+            chosen = policies.POLICIES['max'](discard_stats)
+            units = max(discard.total for discard in discard_stats) - chosen.total
+            pattern = expected.setdefault(regret.rank_counts(cards), {})
+            pattern[units] = pattern.get(units, 0) + 1
+        self.assertEqual(dict((pattern, pattern_totals['max']['expected']) for pattern, pattern_totals in totals['patterns'].items()),
+                         expected)
+        for policies_totals in totals['patterns'].values():
+            for regrets in policies_totals.values():
+                self.assertTrue(min(regrets['hindsight']) >= 0)
+                self.assertTrue(min(regrets['expected']) >= 0)
+
+    def test_exhaustive_chunks(self):
+        settings = regret.new_settings()
+        self.assertEqual(regret.num_chunks(settings), 22100)
+        deals = regret.chunk_deals(settings, regret.LOWEST_CARDS.index((46, 47, 48)))
+        self.assertEqual([[str(card) for card in cards] for cards in deals], [['QD', 'QH', 'KS', 'KC', 'KD', 'KH']])
+        self.assertEqual(regret.chunk_deals(settings, regret.num_chunks(settings) - 1), [])
+        self.assertEqual(len(regret.chunk_deals(settings, 0)), 18424)
+
+    def test_resume_and_merge(self):
+        whole = regret.run(self.settings, processes=1)
+        self.assertEqual(whole['totals']['deals'], 30)
+
+        path = os.path.join(self.directory, 'regret.json')
+        first = regret.run(self.settings, processes=1, checkpoint=path, shard=(0, 2))
+        self.assertEqual(sorted(regret.load_state(path)['done']), [0, 2, 4])
+        # Nothing is left to do in the shard
+        self.assertEqual(regret.run(self.settings, processes=2, checkpoint=path, shard=(0, 2))['done'], first['done'])
+        second = regret.run(self.settings, processes=2, shard=(1, 2))
+
+        merged = regret.merge_states([regret.load_state(path), second])
+        self.assertEqual(merged['totals'], whole['totals'])
+        self.assertEqual(regret.summarize(merged), regret.summarize(whole))
+        self.assertTrue(regret.summarize(merged)['complete'])
+        self.assertRaises(ValueError, regret.merge_states, [merged, second])
+        self.assertRaises(ValueError, regret.run, regret.new_settings(deals=10), 1, path)
+
+    def test_summarize(self):
+        summary = regret.summarize(regret.run(self.settings, processes=1))
+        mean = summary['policies']['mean']['expected']
+        self.assertEqual((mean['deals'], mean['mean'], mean['zero'], mean['max']), (30, 0.0, 1.0, 0.0))
+        maximum = summary['policies']['max']['hindsight']
+        self.assertTrue(maximum['median'] <= maximum['p90'] <= maximum['p99'] <= maximum['max'])
+        self.assertEqual(sum(pattern_totals['mode']['expected']['deals'] for pattern_totals in summary['patterns'].values()), 30)
+
+
+if __name__ == '__main__':
+    main()
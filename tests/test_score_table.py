@@ -0,0 +1,67 @@
+import os
+import random
+import tempfile
+from itertools import combinations_with_replacement
+from unittest import TestCase, main
+from card import Card
+from hand import Hand
+from score_table import ScoreTable, default_table
+
+class TestScoreTable(TestCase):
+    def setUp(self):
+        self.table = default_table()
+        self.deck = [Card(rank, suit) for rank in Card.RANK_MAPPINGS for suit in Card.VALID_SUITS]
+
+    def create_cards(self, card_strings):
+        return [Card(c[:-1], c[-1]) for c in card_strings]
+
+    def test_index_is_dense(self):
+        indexes = set(ScoreTable.index(m) for m in combinations_with_replacement(range(13), 5))
+        self.assertEqual(indexes, set(range(ScoreTable.TABLE_SIZE)))
+
+    def test_index_ignores_order(self):
+        self.assertEqual(ScoreTable.index([12, 0, 4, 4, 9]), ScoreTable.index([0, 4, 4, 9, 12]))
+
+    def test_components_match_hand_for_every_rank_multiset(self):
+        ranks = list(Card.RANK_MAPPINGS.keys())
+        for multiset in combinations_with_replacement(range(13), 5):
+            if max(multiset.count(r) for r in multiset) > 4:
+                continue
+            # Spread the suits differently from ScoreTable.build
+            cards = []
+            for rank in multiset:
+                used = len([c for c in cards if c.rank == ranks[rank]])
+                cards.append(Card(ranks[rank], Card.VALID_SUITS[3 - used]))
+            hand = Hand(cards[1:], cards[0])
+            self.assertEqual(self.table.components(cards[1:], cards[0]),
+                             (hand.calculate_pairs(), hand.calculate_runs(), hand.calculate_15s(),
+                              hand.calculate_suit(), hand.calculate_nobs()))
+
+    def test_score_matches_hand_random_hands(self):
+        rng = random.Random(2017)
+        for _ in range(5000):
+            cards = rng.sample(self.deck, 5)
+            self.assertEqual(self.table.score(cards[:4], cards[4]),
+                             Hand(cards[:4], cards[4]).calculate_score())
+
+    def test_score_flush_and_nobs(self):
+        cards = self.create_cards(['2C', '3C', 'JC', '4C'])
+        self.assertEqual(self.table.score(cards, Card('3', 'C')), 18)
+        self.assertEqual(self.table.score(cards, Card('3', 'H')), 16)
+
+    def test_save_and_load(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            self.table.save(path)
+            loaded = ScoreTable.load(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(loaded.totals, self.table.totals)
+
+    def test_validate_table_input(self):
+        self.assertRaises(ValueError, ScoreTable, [0], [0], [0])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+import urllib2
+from unittest import TestCase, main
+import batch
+import service
+
+class TestService(TestCase):
+    def setUp(self):
+        self.server = service.make_server(port=0, processes=0, max_wait=0.05)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def post(self, body):
+        try:
+            response = urllib2.urlopen(self.url + '/discard', body)
+            return response.getcode(), json.loads(response.read())
+        except urllib2.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def get_metrics(self):
+        return json.loads(urllib2.urlopen(self.url + '/metrics').read())
+
+    def test_discard(self):
+        status, result = self.post('{"id": 3, "cards": ["5C", "5D", "JH", "4S", "6H", "KC"]}')
+        self.assertEqual(status, 200)
+        expected = batch.analyse_deal(batch.parse_deal('5C, 5D, JH, 4S, 6H, KC')[0])
+        self.assertEqual(result['best_mean'], expected['best_mean'])
+        self.assertEqual(result['id'], 3)
+
+    def test_errors(self):
+        self.assertEqual(self.post('8C, AH, 10H')[0], 400)
+        self.assertEqual(self.post('{"cards": "AS"}')[0], 400)
+        self.assertRaises(urllib2.HTTPError, urllib2.urlopen, self.url + '/missing')
+
+    def test_batching_and_deduplication(self):
+        deals = ['8C, AH, 10H, KC, 5D, 2S', '5C, 5D, JH, 4S, 6H, KC', '8C, AH, 10H, KC, 5D, 2S',
+                 'AS, 2S, 3S, 4S, 9D, QH', '8C, AH, 10H, KC, 5D, 2S']
+        results = [None] * len(deals)
+
+        def request(i):
+            results[i] = self.post(deals[i])
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(len(deals))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for deal, (status, result) in zip(deals, results):
+            self.assertEqual(status, 200)
+            self.assertEqual(result['cards'], [card.strip() for card in deal.split(',')])
+        metrics = self.get_metrics()
+        self.assertEqual(metrics['requests'], 5)
+        self.assertEqual(metrics['in_flight'], 0)
+        self.assertEqual(metrics['queue_depth'], 0)
+        # Every request was either sent to a worker or waited on an identical one
+        self.assertEqual(metrics['deduplicated'] + self.server.batcher.batched_deals, 5)
+        self.assertTrue(metrics['batches'] < 5)
+        self.assertTrue(metrics['latency_p50_ms'] <= metrics['latency_p99_ms'])
+
+    def test_worker_pool(self):
+        batcher = service.Batcher(processes=1, max_wait=0.01)
+        try:
+            cards = batch.parse_deal('8C, AH, 10H, KC, 5D, 2S')[0]
+            self.assertEqual(batcher.submit(cards, timeout=30), batch.analyse_deal(cards))
+        finally:
+            batcher.close()
+
+
+def failing_batch(deals):
+    raise MemoryError()
+
+class TestBatcher(TestCase):
+    def setUp(self):
+        self.analyse_batch = service.analyse_batch
+        self.cards = batch.parse_deal('8C, AH, 10H, KC, 5D, 2S')[0]
+
+    def tearDown(self):
+        service.analyse_batch = self.analyse_batch
+
+    def test_batch_is_analysed_at_once(self):
+        deals = [self.cards, batch.parse_deal('5C, 5D, JH, 4S, 6H, KC')[0]]
+        self.assertEqual(service.analyse_batch(deals), [(batch.analyse_deal(cards), None) for cards in deals])
+
+    def test_failed_batch(self):
+        # Patched before the pool starts so the worker has it too
+        service.analyse_batch = failing_batch
+        for processes in (0, 1):
+            batcher = service.Batcher(processes=processes, max_wait=0.01)
+            try:
+                start = time.time()
+                self.assertRaises(RuntimeError, batcher.submit, self.cards, 20)
+                self.assertTrue(time.time() - start < 10)
+                self.assertEqual(batcher.metrics()['in_flight'], 0)
+                self.assertEqual(batcher.metrics()['errors'], 1)
+            finally:
+                batcher.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import os
+import random
+from array import array
+from unittest import TestCase, main
+from card import DECK
+import crib
+import score_table
+import shared_tables
+import win_probability
+
+def crib_table_type(_):
+    return type(crib.default_crib_table().values).__name__, crib.default_crib_table().values[100]
+
+class TestSharedTables(TestCase):
+    def setUp(self):
+        self.defaults = (score_table._default_table, crib._default_crib_table, win_probability._default_win_table)
+
+    def tearDown(self):
+        score_table._default_table, crib._default_crib_table, win_probability._default_win_table = self.defaults
+
+    def test_attach(self):
+        table = score_table.default_table()
+        crib_values = crib.default_crib_table().values
+        with shared_tables.publish(['score', 'crib']) as tables:
+            self.assertTrue(os.path.exists(tables.entries['score'][0]))
+            self.assertEqual(tables.size(), 4 * score_table.ScoreTable.TABLE_SIZE + 8 * len(crib_values))
+            shared_tables.attach(tables)
+        self.assertFalse(os.path.exists(tables.directory))
+
+        self.assertIsNot(score_table.default_table(), table)
+        rng = random.Random(1)
+        for _ in range(200):
+            cards = rng.sample(DECK, 5)
+            self.assertEqual(score_table.score(cards[:4], cards[4]), table.score(cards[:4], cards[4]))
+        self.assertNotIsInstance(crib.default_crib_table().values, array)
+        self.assertEqual(list(crib.default_crib_table().values), list(crib_values))
+
+    def test_win_table(self):
+        values = array('f', [i / 1000.0 for i in range(2 * 5 * 5 * win_probability.NUM_SCORES)])
+        win_probability._default_win_table = win_probability.WinTable(values, 5)
+        with shared_tables.publish(['win']) as tables:
+            shared_tables.attach(tables)
+        table = win_probability.default_win_table()
+        self.assertEqual(table.target, 5)
+        self.assertEqual(table.hand_win_probabilities(1, 2, True), values[table.index(1, 2, True):][:30].tolist())
+
+    def test_shared_pool(self):
+        pool, tables = shared_tables.shared_pool(1, ['crib'])
+        try:
+            type_name, value = pool.map(crib_table_type, [0])[0]
+        finally:
+            pool.terminate()
+            pool.join()
+            tables.close()
+        self.assertEqual(type_name, 'c_double_Array_338')
+        self.assertEqual(value, crib.default_crib_table().values[100])
+
+    def test_measure(self):
+        report = shared_tables.measure(1, shared=True)
+        self.assertEqual(report['processes'], 1)
+        self.assertEqual(len(report['workers']), 1)
+        self.assertGreater(report['workers'][0]['rss_kb'], 0)
+        self.assertGreater(report['published_bytes'], 0)
+
+
+if __name__ == '__main__':
+    main()
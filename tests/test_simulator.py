@@ -0,0 +1,42 @@
+import random
+from unittest import TestCase, main
+from hand import Hand
+import simulator
+
+class TestSimulator(TestCase):
+    def test_deal_hands(self):
+        hands = simulator.deal_hands(random.Random(1), 3)
+        self.assertEqual(hands, simulator.deal_hands(random.Random(1), 3))
+        cards, flip_card = hands[0]
+        self.assertEqual(len(set(cards + [flip_card])), 7)
+
+    def test_score_hands(self):
+        hands = simulator.deal_hands(random.Random(2), 5)
+        for (cards, flip_card), (discard_stats, points) in zip(hands, simulator.score_hands(hands)):
+            self.assertEqual(len(discard_stats), 15)
+            for discard, score in zip(discard_stats, points):
+                self.assertEqual(discard.count, 46)
+                self.assertTrue(discard.histogram[score] > 0)
+                self.assertEqual(score, Hand(discard.kept_cards, flip_card).calculate_score())
+
+    def test_simulate(self):
+        summary = simulator.simulate(250, seed=3, processes=1, chunk_size=100)
+        self.assertEqual(summary['hands'], 250)
+        self.assertEqual(summary['reference'], 'mean')
+        mean = summary['policies']['mean']
+        self.assertEqual(sum(mean['histogram']), 250)
+        self.assertTrue(mean['ci95'][0] < mean['mean'] < mean['ci95'][1])
+        self.assertEqual(mean['vs_reference']['ties'], 250)
+        differences = summary['policies']['max']['vs_reference']
+        self.assertEqual(differences['wins'] + differences['ties'] + differences['losses'], 250)
+        self.assertTrue(summary['hands_per_sec'] > 0)
+
+    def test_reproducible(self):
+        first = simulator.simulate(150, seed=4, policy_names=['max', 'median'], processes=1, chunk_size=50)
+        second = simulator.simulate(150, seed=4, policy_names=['max', 'median'], processes=2, chunk_size=50)
+        self.assertEqual(first['policies'], second['policies'])
+        self.assertEqual(first['reference'], 'max')
+        self.assertRaises(ValueError, simulator.simulate, 10, policy_names=['missing'])
+
+if __name__ == '__main__':
+    main()
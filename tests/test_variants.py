@@ -0,0 +1,79 @@
+import random
+from unittest import TestCase, main, skipIf
+from card import Card, DECK
+from hand import Hand, PartialHand
+import cribbage_game
+import variants
+try:
+    import numpy
+    import batch_scoring
+except ImportError:
+    numpy = None
+
+class TestVariants(TestCase):
+    def create_cards(self, card_strings):
+        return [Card(c[:-1], c[-1]) for c in card_strings]
+
+    def test_three_card_hand(self):
+        cards = self.create_cards(['2H', '7H', 'KH'])
+        self.assertEqual(Hand(cards, Card('9', 'H'), 3).calculate_score(), 4)
+        self.assertEqual(Hand(cards, Card('9', 'C'), 3).calculate_score(), 3)
+        self.assertEqual(Hand(self.create_cards(['5C', '5D', 'JH']), Card('5', 'H'), 3).calculate_score(), 15)
+        self.assertRaises(ValueError, Hand, cards, Card('9', 'C'))
+        self.assertRaises(ValueError, PartialHand, cards + [Card('9', 'C')], 3)
+
+    def test_partial_hand_matches_hand(self):
+        rng = random.Random(4)
+        for _ in range(500):
+            cards = rng.sample(DECK, 4)
+            hand = PartialHand(cards[:3], 3)
+            self.assertEqual(hand.calculate_score(cards[3]), Hand(cards[:3], cards[3], 3).calculate_score())
+
+    def test_two_player_matches_cribbage_game(self):
+        original_cards = self.create_cards(['8C', 'AH', '10H', 'KC', '5D', '2S'])
+        expected = cribbage_game.calculate_scores(original_cards)
+        actual = variants.calculate_scores(original_cards)
+        self.assertEqual([str(d) for d in actual], [str(d) for d in expected])
+        for a, e in zip(actual, expected):
+            self.assertEqual(a.possible_scores, e.possible_scores)
+
+    def test_discard_one(self):
+        original_cards = self.create_cards(['5C', '5D', 'JH', '4S', '6H'])
+        discard_stats = variants.calculate_scores(original_cards, variants.THREE_PLAYER)
+        self.assertEqual([str(d) for d in discard_stats], [str(card) for card in original_cards])
+        self.assertEqual(discard_stats[2].count, 47)
+        self.assertEqual(discard_stats[2].possible_scores[Card('5', 'H')], 23)
+        self.assertRaises(ValueError, discard_stats[2].crib_ev)
+        self.assertRaises(ValueError, variants.calculate_scores, original_cards + [Card('K', 'C')],
+                          variants.FOUR_PLAYER)
+
+    def test_five_card(self):
+        original_cards = self.create_cards(['5C', '5D', 'JH', '4S', '6H'])
+        discard_stats = variants.calculate_scores(original_cards, variants.FIVE_CARD)
+        self.assertEqual(len(discard_stats), 10)
+        self.assertEqual(str(discard_stats[-1]), "4S, 6H")
+        self.assertEqual(discard_stats[-1].possible_scores[Card('5', 'H')], 15)
+        self.assertEqual(len(list(cribbage_game.possible_cards_in_hand(original_cards, variants.FIVE_CARD))), 10)
+
+    @skipIf(numpy is None, "numpy is not installed")
+    def test_batch_matches_calculate_scores(self):
+        rng = random.Random(8)
+        for variant in variants.VARIANTS.values():
+            deals = [rng.sample(DECK, variant.deal_size) for _ in range(10)]
+            for original_cards, discard_stats in zip(deals, variants.calculate_scores_batch(deals, variant)):
+                expected = variants.calculate_scores(original_cards, variant)
+                self.assertEqual([str(d) for d in discard_stats], [str(d) for d in expected])
+                self.assertEqual([d.histogram for d in discard_stats], [d.histogram for d in expected])
+                self.assertEqual([d.kept_cards for d in discard_stats], [d.kept_cards for d in expected])
+
+    @skipIf(numpy is None, "numpy is not installed")
+    def test_batch_score_hands_three_cards(self):
+        rng = random.Random(6)
+        hands = [rng.sample(DECK, 4) for _ in range(1000)]
+        scores = batch_scoring.score_hands([[c.index for c in h[:3]] for h in hands], [h[3].index for h in hands])
+        for hand, score in zip(hands, scores):
+            self.assertEqual(score, Hand(hand[:3], hand[3], 3).calculate_score())
+
+
+if __name__ == '__main__':
+    main()
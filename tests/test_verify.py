@@ -0,0 +1,58 @@
+from unittest import TestCase, main
+from card import Card
+import hand
+import verify
+
+def off_by_one_runs(cards, flip_cards):
+    results = verify._score_table_backend(cards, flip_cards)
+    return [(p, r + 1 if r else 0, f, s, n) for p, r, f, s, n in results]
+
+class TestVerify(TestCase):
+    def tearDown(self):
+        verify.BACKENDS.pop('broken', None)
+
+    def test_chunks(self):
+        chunks = verify.chunks()
+        self.assertEqual(sum((52 - second - 1) * (52 - second - 2) // 2 for _, second, _ in chunks), 270725)
+        self.assertEqual(verify.chunks(1300), [(0, 1, 1225), (0, 2, 75)])
+
+    def test_reference(self):
+        cards = [Card('5', 'C'), Card('5', 'D'), Card('5', 'S'), Card('J', 'H')]
+        self.assertEqual(verify.reference(cards, [Card('5', 'H'), Card('2', 'H')]),
+                         [(12, 0, 16, 0, 1), (6, 0, 8, 0, 1)])
+
+    def test_reference_runs(self):
+        hands = [(['3C', '3D', '4S', '4H'], '5H', 12), (['3C', '3D', '3S', '4H'], '5H', 9),
+                 (['9C', '10C', 'JC', 'QC'], 'KC', 5), (['AC', '2D', '3S', '7H'], '8H', 3), (['AC', '2D', '4S', '7H'], '8H', 0)]
+        for cards, flip_card, runs in hands:
+            cards = [Card(c[:-1], c[-1]) for c in cards]
+            self.assertEqual(verify.reference(cards, [Card(flip_card[:-1], flip_card[-1])])[0][1], runs)
+
+    def test_reference_is_independent_of_hand(self):
+        counting = hand.calculate_runs_from_counts
+        hand.calculate_runs_from_counts = lambda rank_counts: counting(rank_counts) + 1
+        try:
+            report = verify.verify(['hand', 'partial_hand'], processes=1, limit=2)
+        finally:
+            hand.calculate_runs_from_counts = counting
+        self.assertEqual(sorted(report['mismatches']), ['hand runs', 'partial_hand total'])
+
+    def test_verify(self):
+        report = verify.verify(processes=1, limit=20)
+        self.assertEqual(report['hands'], 20 * 48)
+        self.assertEqual(report['mismatches'], {})
+
+    def test_mismatches(self):
+        verify.register_backend('broken', off_by_one_runs)
+        report = verify.verify(['score_table', 'broken'], processes=1, limit=20, max_examples=2)
+        self.assertEqual(list(report['mismatches']), ['broken runs'])
+        self.assertTrue(report['mismatches']['broken runs'] > 0)
+        self.assertEqual(len(report['examples']['broken runs']), 2)
+        cards, flip_card, expected, actual = report['examples']['broken runs'][0]
+        self.assertEqual(actual, expected + 1)
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, verify.verify, ['missing'], processes=1, limit=1)
+
+if __name__ == '__main__':
+    main()
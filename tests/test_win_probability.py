@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase, main, skipIf
+from card import Card
+from discard import Discard
+import win_probability
+from win_probability import NUM_SCORES, PointDistributions, WinTable
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def create_cards(card_strings):
+    return [Card(c[:-1], c[-1]) for c in card_strings]
+
+def distribution(weights):
+    total = float(sum(weights))
+    return [w / total for w in weights] + [0.0] * (NUM_SCORES - len(weights))
+
+class TestWinProbability(TestCase):
+    def test_peg_greedily(self):
+        tens = create_cards(['10S', '10C', '10D', '10H'])
+        fives = create_cards(['5S', '5C', '5D', '5H'])
+        # 10 5 (15) 10 5, go; 10 5 (15) 10 5, last card
+        self.assertEqual(win_probability.peg_greedily(tens, fives), [0, 6])
+
+    def test_crib_score(self):
+        crib = create_cards(['2H', '4H', '6H', '8H'])
+        self.assertEqual(win_probability.crib_score(crib, Card('K', 'S')), 0)
+        self.assertEqual(win_probability.crib_score(crib, Card('10', 'H')), 5)
+
+    def test_simulate(self):
+        distributions = PointDistributions.simulate(20, seed=1, processes=1, chunk_size=7)
+        self.assertAlmostEqual(sum(distributions.pone_hand), 1.0)
+        self.assertAlmostEqual(sum(distributions.crib), 1.0)
+        self.assertAlmostEqual(sum(sum(row) for row in distributions.pegging), 1.0)
+
+
+@skipIf(numpy is None, "numpy is not installed")
+class TestWinTable(TestCase):
+    def setUp(self):
+        self.distributions = PointDistributions(distribution([1, 0, 2, 1]), distribution([1, 1, 0, 3]),
+                                                distribution([2, 1, 1]), [[0.4, 0.1], [0.2, 0.3]])
+
+    def tearDown(self):
+        win_probability._default_win_table = None
+
+    def hand_wins(self, target, dealer, my_score, opponent_score, points, wins):
+        """ The chance of winning given my hand scores points, straight from the rules of a deal """
+        d = self.distributions
+        total = 0.0
+        for p, row in enumerate(d.pegging):
+            for q, peg in enumerate(row):
+                if not dealer:
+                    if my_score + p >= target:
+                        total += peg
+                    elif opponent_score + q < target:
+                        if my_score + p + points >= target:
+                            total += peg
+                            continue
+                        for h, hand in enumerate(d.dealer_hand):
+                            for c, crib in enumerate(d.crib):
+                                if opponent_score + q + h + c < target:
+                                    total += peg * hand * crib * wins[(True, my_score + p + points,
+                                                                       opponent_score + q + h + c)]
+                elif opponent_score + p < target:
+                    if my_score + q >= target:
+                        total += peg
+                        continue
+                    for h, hand in enumerate(d.pone_hand):
+                        if opponent_score + p + h >= target:
+                            continue
+                        for c, crib in enumerate(d.crib):
+                            mine = my_score + q + points + c
+                            total += peg * hand * crib * (1.0 if mine >= target else
+                                                          wins[(False, mine, opponent_score + p + h)])
+        return total
+
+    def test_build_matches_value_iteration(self):
+        target = 7
+        states = [(dealer, a, b) for dealer in (False, True) for a in range(target) for b in range(target)]
+        wins = dict((state, 0.5) for state in states)
+        for _ in range(30):
+            hands = lambda dealer: self.distributions.dealer_hand if dealer else self.distributions.pone_hand
+            wins = dict((state, sum(chance * self.hand_wins(target, state[0], state[1], state[2], points, wins)
+                                    for points, chance in enumerate(hands(state[0])) if chance))
+                        for state in states)
+
+        table = WinTable.build(self.distributions, target)
+        for dealer, a, b in states:
+            chances = table.hand_win_probabilities(a, b, dealer)
+            for points in range(NUM_SCORES):
+                self.assertAlmostEqual(chances[points], self.hand_wins(target, dealer, a, b, points, wins), places=5)
+
+    def test_dealing_and_receiving_add_up(self):
+        table = WinTable.build(self.distributions, 15)
+        for a, b in [(0, 0), (3, 9), (14, 12)]:
+            dealing = sum(c * w for c, w in zip(self.distributions.dealer_hand, table.hand_win_probabilities(a, b, True)))
+            receiving = sum(c * w for c, w in zip(self.distributions.pone_hand, table.hand_win_probabilities(b, a, False)))
+            self.assertAlmostEqual(dealing + receiving, 1.0, places=5)
+
+    def test_best_win_discard(self):
+        table = WinTable.build(self.distributions, 15)
+        safe = Discard(Card('A', 'S'), Card('2', 'S'))
+        safe.add_score(3, 46)
+        risky = Discard(Card('3', 'S'), Card('4', 'S'))
+        risky.add_score(0, 40)
+        risky.add_score(20, 6)
+        # They can't peg out, and three points are enough to win as the pone
+        self.assertEqual(table.win_probability(safe, 12, 13, False), 1.0)
+        discard, probability = win_probability.best_win_discard([risky, safe], 12, 13, False, table)
+        self.assertIs(discard, safe)
+        # Way behind, only the big hand can catch up
+        discard, probability = win_probability.best_win_discard([safe, risky], 0, 14, False, table)
+        self.assertIs(discard, risky)
+        self.assertRaises(ValueError, table.win_probability, safe, 15, 3, False)
+
+    def test_save_load(self):
+        table = WinTable.build(self.distributions, 9)
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'win_table.bin')
+            table.save(path)
+            loaded = WinTable.load(path)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(loaded.target, 9)
+        self.assertEqual(loaded.values, table.values)
+        self.assertRaises(ValueError, WinTable, table.values, 10)
+
+
+if __name__ == '__main__':
+    main()
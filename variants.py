@@ -0,0 +1,94 @@
+from collections import OrderedDict, namedtuple
+from itertools import combinations
+from card_set import CardSet, FULL_DECK
+from discard import Discard
+from hand import PartialHand
+try:
+    import batch_scoring
+except ImportError:
+    batch_scoring = None
+
+# Other ways of dealing the hand. With three or four players everyone is dealt
+# five cards and discards one, and in five-card cribbage two of the five are
+# put in the crib. Scoring is the same apart from the number of kept cards (a
+# flush in five-card cribbage is three cards), so every variant goes through
+# PartialHand, or the batch scoring core for many deals at once.
+
+
+class Variant(namedtuple('Variant', ['name', 'players', 'deal_size', 'keep_size'])):
+    __slots__ = ()
+
+    @property
+    def discard_size(self):
+        return self.deal_size - self.keep_size
+
+
+VARIANTS = OrderedDict()
+
+def register_variant(variant):
+    VARIANTS[variant.name] = variant
+    return variant
+
+
+TWO_PLAYER = register_variant(Variant('two_player', 2, 6, 4))
+THREE_PLAYER = register_variant(Variant('three_player', 3, 5, 4))
+FOUR_PLAYER = register_variant(Variant('four_player', 4, 5, 4))
+FIVE_CARD = register_variant(Variant('five_card', 2, 5, 3))
+
+
+def validate_deal(original_cards, variant):
+    if len(original_cards) != variant.deal_size:
+        raise ValueError("Must provide {} cards".format(variant.deal_size))
+
+
+def calculate_scores(original_cards, variant=TWO_PLAYER, keep_flips=True, known_cards=()):
+    """
+    Same as cribbage_game.calculate_scores for any variant: scores every
+    discard (in combinations(original_cards, variant.discard_size) order) with
+    every possible flip card
+    """
+    validate_deal(original_cards, variant)
+    remaining_cards = list(FULL_DECK - CardSet(original_cards) - CardSet(known_cards))
+
+    discard_stats = []
+    for discard_combo in combinations(original_cards, variant.discard_size):
+        selected_cards = [card for card in original_cards if card not in discard_combo]
+        discard = Discard(*discard_combo, keep_flips=keep_flips, kept_cards=selected_cards, excluded=known_cards)
+        hand = PartialHand(selected_cards, variant.keep_size)
+        for flip_card in remaining_cards:
+            discard.add(flip_card, hand.calculate_score(flip_card))
+        discard_stats.append(discard)
+
+    return discard_stats
+
+
+def score_matrices(deals, variant=TWO_PLAYER):
+    """
+    deals: int array of shape (n, variant.deal_size)
+        Card indexes of the dealt cards
+
+    Same as batch_scoring.score_matrices, with a row of scores for each discard
+    of the variant
+    """
+    if batch_scoring is None:
+        raise RuntimeError("Batch scoring needs numpy")
+    return batch_scoring.score_matrices(deals, variant.keep_size)
+
+
+def calculate_scores_batch(deals, variant=TWO_PLAYER):
+    """
+    deals: list of list of Card
+        Dealt cards, variant.deal_size per deal
+
+    Returns the discard stats (as from calculate_scores, without the flip
+    cards) for every deal, scoring all the deals at once if numpy is installed
+    """
+    for original_cards in deals:
+        validate_deal(original_cards, variant)
+    if batch_scoring is None:
+        return [calculate_scores(original_cards, variant, keep_flips=False) for original_cards in deals]
+    if not deals:
+        return []
+
+    _, scores = score_matrices([[card.index for card in cards] for cards in deals], variant)
+    return batch_scoring.histogram_discards(deals, batch_scoring.score_histograms(scores), variant.keep_size)
@@ -0,0 +1,268 @@
+import argparse
+import multiprocessing
+import sys
+import timeit
+from collections import OrderedDict
+from itertools import combinations
+from card import DECK
+from hand import Hand, PartialHand
+import score_table
+
+# Checks the scorers against the original Hand scoring for every possible
+# hand: all 270,725 sets of four kept cards, each with all 48 flip cards, which
+# covers every five card hand with each of its five cards as the flip
+# (12,994,800 hands).
+#
+# A backend is called once per set of four cards with the list of flip cards,
+# so it can do its per-hand work once, and returns one result per flip card:
+# either the (pairs, runs, 15s, suit, nobs) points, compared one by one, or
+# just the total for backends that don't split the score up.
+#
+# The work is split into chunks by the first two kept cards and spread over a
+# process pool.
+COMPONENTS = ('pairs', 'runs', '15s', 'suit', 'nobs')
+
+BACKENDS = OrderedDict()
+
+
+def register_backend(name, backend):
+    """
+    Adds a scorer to check. Backends have to be registered before verify is
+    called so the worker processes see them.
+
+    backend: function(cards, flip_cards)
+        Returns a list with the score of cards with each of the flip cards
+    """
+    BACKENDS[name] = backend
+
+
+def _hand_backend(cards, flip_cards):
+    results = []
+    for flip_card in flip_cards:
+        hand = Hand(cards, flip_card)
+        results.append((hand.calculate_pairs(), hand.calculate_runs(), hand.calculate_15s(),
+                        hand.calculate_suit(), hand.calculate_nobs()))
+    return results
+
+
+def _score_table_backend(cards, flip_cards):
+    table = score_table.default_table()
+    return [table.components(cards, flip_card) for flip_card in flip_cards]
+
+
+def _partial_hand_backend(cards, flip_cards):
+    hand = PartialHand(cards)
+    return [hand.calculate_score(flip_card) for flip_card in flip_cards]
+
+
+def _batch_scoring_backend(cards, flip_cards):
+    import batch_scoring
+    keep = [card.index for card in cards]
+    return batch_scoring.score_hands([keep], [flip_card.index for flip_card in flip_cards]).tolist()
+
+
+register_backend('hand', _hand_backend)
+register_backend('score_table', _score_table_backend)
+register_backend('partial_hand', _partial_hand_backend)
+register_backend('batch_scoring', _batch_scoring_backend)
+
+
+# The reference is the original Hand scoring, by combinations of the cards.
+# It's kept here rather than calling Hand (which is checked like the others)
+# because Hand now shares its run and 15s counting with PartialHand, so a bug
+# there would pass. Pairs, runs and 15s only depend on the ranks, so each of
+# the 6,175 rank multisets is scored once.
+_rank_components = {}
+
+def _pairs(sorted_cards):
+    return 2 * sum(1 for a, b in combinations(sorted_cards, 2) if a.rank == b.rank)
+
+
+def _runs(sorted_cards):
+    run = [sorted_cards[0]]
+    for card in sorted_cards[1:]:
+        if run[-1].next_rank() == card.rank:
+            run.append(card)
+        elif run[-1].rank != card.rank:
+            if len(run) >= 3:
+                break
+            run = [card]
+    if len(run) < 3:
+        return 0
+
+    # Each card of a run's rank that's in the hand more than once multiplies the run
+    ranks = [card.rank for card in sorted_cards]
+    multiplier = sum(ranks.count(card.rank) for card in run if ranks.count(card.rank) > 1)
+    return len(run) * (multiplier or 1)
+
+
+def _fifteens(cards):
+    return 2 * sum(1 for size in range(2, len(cards) + 1) for subset in combinations(cards, size)
+                   if sum(card.value for card in subset) == 15)
+
+
+def _suit(cards, flip_card):
+    if all(card.suit == cards[0].suit for card in cards):
+        return len(cards) + (flip_card.suit == cards[0].suit)
+    return 0
+
+
+def _nobs(cards, flip_card):
+    return int(any(card.rank == 'J' and card.suit == flip_card.suit for card in cards))
+
+
+def reference(cards, flip_cards):
+    """ Returns the components of the score of cards with each flip card, by the original Hand scoring """
+    results = []
+    for flip_card in flip_cards:
+        sorted_cards = sorted(cards + [flip_card], key=lambda card: card.numerical_order)
+        ranks = tuple(card.numerical_order for card in sorted_cards)
+        rank_components = _rank_components.get(ranks)
+        if rank_components is None:
+            rank_components = (_pairs(sorted_cards), _runs(sorted_cards), _fifteens(sorted_cards))
+            _rank_components[ranks] = rank_components
+        results.append(rank_components + (_suit(cards, flip_card), _nobs(cards, flip_card)))
+    return results
+
+
+def chunks(limit=None):
+    """
+    Returns (first, second, count) for every chunk: the kept cards starting
+    with DECK[first], DECK[second], and at most count of them (None for all)
+    """
+    result = []
+    remaining = limit
+    for first, second in combinations(range(len(DECK)), 2):
+        size = (len(DECK) - second - 1) * (len(DECK) - second - 2) // 2
+        if not size:
+            continue
+        if remaining is not None:
+            if remaining <= 0:
+                break
+            size = min(size, remaining)
+            remaining -= size
+        result.append((first, second, size if limit is not None else None))
+    return result
+
+
+def check(cards, backends, max_examples=5):
+    """
+    Compares the backends to the reference for cards with every other card as the flip.
+    Returns ({(backend, component): mismatches}, {(backend, component): examples})
+    with examples as (cards, flip card, expected, actual).
+    """
+    counts = {}
+    examples = {}
+    flip_cards = [card for card in DECK if card not in cards]
+    expected = reference(cards, flip_cards)
+    for name in backends:
+        actual = BACKENDS[name](cards, flip_cards)
+        for flip_card, want, got in zip(flip_cards, expected, actual):
+            if isinstance(got, tuple):
+                differences = [(component, want[i], got[i])
+                               for i, component in enumerate(COMPONENTS) if want[i] != got[i]]
+            elif sum(want) != got:
+                differences = [('total', sum(want), got)]
+            else:
+                continue
+            for component, want_points, got_points in differences:
+                key = (name, component)
+                counts[key] = counts.get(key, 0) + 1
+                key_examples = examples.setdefault(key, [])
+                if len(key_examples) < max_examples:
+                    key_examples.append(([str(card) for card in cards], str(flip_card), want_points, got_points))
+    return counts, examples
+
+
+def verify_chunk(args):
+    """ Checks one chunk, returns (hands checked, mismatch counts, examples) """
+    (first, second, count), backends, max_examples = args
+    hands = 0
+    counts = {}
+    examples = {}
+    for i, rest in enumerate(combinations(range(second + 1, len(DECK)), 2)):
+        if count is not None and i >= count:
+            break
+        cards = [DECK[first], DECK[second]] + [DECK[index] for index in rest]
+        chunk_counts, chunk_examples = check(cards, backends, max_examples)
+        _merge(counts, examples, chunk_counts, chunk_examples, max_examples)
+        hands += len(DECK) - len(cards)
+    return hands, counts, examples
+
+
+def _merge(counts, examples, new_counts, new_examples, max_examples):
+    for key, count in new_counts.items():
+        counts[key] = counts.get(key, 0) + count
+    for key, key_examples in new_examples.items():
+        examples.setdefault(key, []).extend(key_examples)
+        del examples[key][max_examples:]
+
+
+def verify(backends=None, processes=None, limit=None, max_examples=5):
+    """
+    Checks the backends (all registered ones by default) against the reference.
+
+    limit: int
+        Only check this many sets of kept cards, for a quick run
+    processes: int
+        Number of worker processes, one per core by default. With 1 everything
+        is checked in this process.
+
+    Returns a dict with the number of hands checked, the seconds taken and the
+    mismatches as {"backend component": count}, with a few example hands each.
+    """
+    backends = list(backends or BACKENDS)
+    for name in backends:
+        if name not in BACKENDS:
+            raise ValueError("Unknown backend {}".format(name))
+    start = timeit.default_timer()
+    tasks = [(chunk, backends, max_examples) for chunk in chunks(limit)]
+    if processes == 1:
+        results = map(verify_chunk, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(verify_chunk, tasks)
+
+    hands = 0
+    counts = {}
+    examples = {}
+    try:
+        for chunk_hands, chunk_counts, chunk_examples in results:
+            hands += chunk_hands
+            _merge(counts, examples, chunk_counts, chunk_examples, max_examples)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    return {
+        'backends': backends,
+        'hands': hands,
+        'seconds': timeit.default_timer() - start,
+        'mismatches': dict(('{} {}'.format(*key), count) for key, count in counts.items()),
+        'examples': dict(('{} {}'.format(*key), sorted(key_examples)) for key, key_examples in examples.items()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the scorers against the original Hand scoring for every possible hand")
+    parser.add_argument('backends', nargs='*', help="backends to check (default all)")
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--limit', type=int, default=None, help="only check this many sets of kept cards")
+    parser.add_argument('--examples', type=int, default=5, help="example hands to show per mismatch")
+    args = parser.parse_args()
+
+    report = verify(args.backends, args.processes, args.limit, args.examples)
+    print("Checked {} hands against {} in {:.1f}s".format(
+        report['hands'], ", ".join(report['backends']), report['seconds']))
+    for key in sorted(report['mismatches']):
+        print("MISMATCH {}: {} hands".format(key, report['mismatches'][key]))
+        for cards, flip_card, expected, actual in report['examples'][key]:
+            print("  {} flip {}: expected {}, got {}".format(", ".join(cards), flip_card, expected, actual))
+    if report['mismatches']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+import argparse
+import os
+import random
+from array import array
+from card import DECK
+from discard import Discard
+from pegging import VALUES, TARGET as PEGGING_TARGET, play_points
+from score_table import calculate_suit, default_table
+import cribbage_game
+
+# The chance of winning the game from a score, for choosing discards near the
+# end of a game where points only matter if they get you to 121 first.
+#
+# A deal is counted in order: the pegging (the pone's points are checked
+# first), the pone's hand, then the dealer's hand and crib, and the first
+# player to reach the target wins. The points each of those scores are
+# modelled by distributions measured offline (PointDistributions): random
+# deals where each player keeps the cards with the best hand + crib value and
+# pegs greedily. The dealer's hand and crib are treated as independent.
+#
+# WinTable.build works back from the target with dynamic programming. For
+# every state (my score, their score, whether I deal) it stores the chance of
+# winning given the points my hand scores this deal (0..29), with everything
+# else in the deal taken from the distributions. A keep's chance of winning
+# is then its Discard histogram (the 46 flip cards) dotted with one row of
+# the table, the same amount of work for every keep.
+#
+# A deal where nobody scores leaves the scores as they were with the deal
+# passed over, so the states (a, b, dealer) and (a, b, pone) depend on each
+# other; the two are solved together as a pair of linear equations.
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'win_table.bin')
+
+GAME_TARGET = 121
+NUM_SCORES = Discard.MAX_SCORE + 1
+DEAL_SIZE = 6
+PONE = 0
+DEALER = 1
+
+
+def crib_score(cards, flip_card):
+    """ Score of a crib: like a hand, but a flush only counts if the flip card matches too """
+    score = default_table().score(cards, flip_card)
+    if calculate_suit(cards, flip_card) == len(cards):
+        score -= len(cards)
+    return score
+
+
+def peg_greedily(pone_cards, dealer_cards):
+    """
+    Plays out the pegging with each player playing the card that scores the
+    most straight away (the highest card if none score). Returns the points
+    (pone, dealer).
+    """
+    hands = [sorted(card.numerical_order for card in cards) for cards in (pone_cards, dealer_cards)]
+    points = [0, 0]
+    sequence = []
+    count = 0
+    turn = PONE
+    last = None
+    passed = False # the other player has said go
+    while hands[PONE] or hands[DEALER]:
+        playable = [rank for rank in hands[turn] if count + VALUES[rank] <= PEGGING_TARGET]
+        if not playable:
+            if passed:
+                points[last] += 1
+                sequence = []
+                count = 0
+                turn = 1 - last
+                passed = False
+            else:
+                passed = True
+                turn = 1 - turn
+            continue
+
+        rank = max(playable, key=lambda r: (play_points(sequence + [r]), VALUES[r]))
+        hands[turn].remove(rank)
+        sequence.append(rank)
+        count += VALUES[rank]
+        points[turn] += play_points(sequence)
+        last = turn
+        if count == PEGGING_TARGET:
+            sequence = []
+            count = 0
+            passed = False
+            turn = 1 - turn
+        elif not passed:
+            turn = 1 - turn
+    if count:
+        points[last] += 1 # last card
+    return points
+
+
+class PointDistributions:
+    """ How often each number of points is scored by each part of a deal """
+    def __init__(self, pone_hand, dealer_hand, crib, pegging):
+        """
+        pone_hand, dealer_hand, crib: list of float
+            Probability of each score, 0..29
+        pegging: list of list of float
+            pegging[p][q] is the probability the pone pegs p and the dealer q
+        """
+        self.pone_hand = pone_hand
+        self.dealer_hand = dealer_hand
+        self.crib = crib
+        self.pegging = pegging
+
+    @classmethod
+    def from_counts(cls, counts):
+        deals = float(sum(counts['crib']))
+        width = max(max(p for p, _ in counts['pegging']), max(q for _, q in counts['pegging'])) + 1
+        pegging = [[0.0] * width for _ in range(width)]
+        for (p, q), n in counts['pegging'].items():
+            pegging[p][q] = n / deals
+        return cls([n / deals for n in counts['pone_hand']], [n / deals for n in counts['dealer_hand']],
+                   [n / deals for n in counts['crib']], pegging)
+
+    @classmethod
+    def simulate(cls, deals, seed=0, processes=None, chunk_size=500):
+        """
+        Measures the distributions over random deals.
+
+        processes: int
+            Number of worker processes, one per core by default. With 1 every
+            deal is played in this process.
+        """
+        tasks = [(seed, chunk, min(chunk_size, deals - start)) for chunk, start in enumerate(range(0, deals, chunk_size))]
+        counts = new_counts()
+        if processes == 1:
+            for task in tasks:
+                merge_counts(counts, simulate_chunk(task))
+        else:
+            import shared_tables # shared_tables imports this module
+            pool, tables = shared_tables.shared_pool(processes, ['score', 'crib'])
+            try:
+                for chunk_counts in pool.imap_unordered(simulate_chunk, tasks):
+                    merge_counts(counts, chunk_counts)
+            finally:
+                pool.terminate()
+                pool.join()
+                tables.close()
+        return cls.from_counts(counts)
+
+
+def new_counts():
+    return {'pone_hand': [0] * NUM_SCORES, 'dealer_hand': [0] * NUM_SCORES, 'crib': [0] * NUM_SCORES, 'pegging': {}}
+
+
+def merge_counts(counts, other):
+    for name in ('pone_hand', 'dealer_hand', 'crib'):
+        counts[name] = [a + b for a, b in zip(counts[name], other[name])]
+    for points, n in other['pegging'].items():
+        counts['pegging'][points] = counts['pegging'].get(points, 0) + n
+    return counts
+
+
+def simulate_chunk(args):
+    """ Plays one chunk of deals, returns the counts of each score """
+    seed, chunk, count = args
+    rng = random.Random(seed * 1000003 + chunk)
+    counts = new_counts()
+    for _ in range(count):
+        cards = rng.sample(DECK, 2 * DEAL_SIZE + 1)
+        pone = max(cribbage_game.calculate_scores(cards[:DEAL_SIZE], keep_flips=False), key=lambda s: s.pone_ev())
+        dealer = max(cribbage_game.calculate_scores(cards[DEAL_SIZE:-1], keep_flips=False), key=lambda s: s.dealer_ev())
+        flip_card = cards[-1]
+        counts['pone_hand'][default_table().score(pone.kept_cards, flip_card)] += 1
+        counts['dealer_hand'][default_table().score(dealer.kept_cards, flip_card)] += 1
+        counts['crib'][crib_score(pone.cards + dealer.cards, flip_card)] += 1
+        points = tuple(peg_greedily(pone.kept_cards, dealer.kept_cards))
+        counts['pegging'][points] = counts['pegging'].get(points, 0) + 1
+    return counts
+
+
+class WinTable:
+    """
+    Chance of winning from every (my score, their score, dealer) state, given
+    the points my hand scores this deal
+    """
+    def __init__(self, values, target=GAME_TARGET):
+        """
+        values: array('f')
+            Chances of winning, indexed by WinTable.index
+        """
+        if len(values) != 2 * target * target * NUM_SCORES:
+            raise ValueError("Win table for {} points must contain {} entries".format(
+                target, 2 * target * target * NUM_SCORES))
+        self.values = values
+        self.target = target
+
+    def index(self, my_score, opponent_score, dealer):
+        """ Position of the chances for each hand score from a state """
+        return ((int(dealer) * self.target + my_score) * self.target + opponent_score) * NUM_SCORES
+
+    @classmethod
+    def build(cls, distributions, target=GAME_TARGET):
+        import numpy as np
+        from numpy.lib.stride_tricks import as_strided
+
+        pone_hand = np.array(distributions.pone_hand)
+        dealer_hand = np.array(distributions.dealer_hand)
+        crib = np.array(distributions.crib)
+        dealer_points = np.convolve(dealer_hand, crib)
+        pegging = np.array(distributions.pegging)
+        width = len(pegging)
+        pad = width + NUM_SCORES + len(dealer_points)
+
+        # wins[d][a, b] is the chance of winning from a state, and hand_wins[d][a, b, k]
+        # the same given my hand scores k. The rest are the stages of a deal:
+        #   after_hand[x, y]  I deal and have counted my hand: chance of winning once my crib is counted
+        #   after_peg[x, y]   I deal, after the pegging and my hand: chance of winning once the pone has counted
+        #   after_pone[x, y]  I'm the pone and have counted my hand: chance of winning once the dealer has counted
+        # Rows past the target are filled in for scores I've already won with.
+        wins = np.zeros((2, target + pad, target + pad))
+        wins[:, target:, :] = 1.0
+        wins[:, :, target:] = 0.0
+        hand_wins = np.zeros((2, target, target, NUM_SCORES))
+        after_hand = np.zeros((target, target))
+        after_peg = np.zeros((target + pad, target))
+        # If I've reached the target with my hand the pone still counts first
+        survives = np.array([pone_hand[:target - y].sum() for y in range(target)])
+        after_peg[target:] = survives
+        after_pone = np.ones((target + pad, target))
+
+        no_points = pegging[0, 0] * pone_hand[0] * dealer_points[0]
+        for a in range(target - 1, -1, -1):
+            for b in range(target - 1, -1, -1):
+                # This state's own wins are still 0, which leaves out deals where
+                # nobody scores until the two are solved below
+                after_hand[a, b] = crib.dot(wins[DEALER ^ 1, a:a + len(crib), b])
+                after_hand_b = after_hand[a, b:]
+                after_peg[a, b] = pone_hand[:len(after_hand_b)].dot(after_hand_b[:len(pone_hand)])
+
+                # I deal: the pone (them) pegs p, I peg q
+                rows = min(width, target - a)
+                columns = min(width, target - b)
+                window = after_peg[a:a + rows + NUM_SCORES - 1, b:b + columns]
+                window = as_strided(window, (NUM_SCORES, rows, columns), (window.strides[0],) + window.strides)
+                dealing = np.einsum('kqp,pq->k', window, pegging[:columns, :rows])
+                dealing += pegging[:columns, rows:].sum()
+
+                after_pone[a, b] = dealer_points[:target - b].dot(
+                    wins[DEALER, a, b:b + min(len(dealer_points), target - b)])
+
+                # I'm the pone and peg p, they peg q
+                rows = min(width, target - a)
+                columns = min(width, target - b)
+                window = after_pone[a:a + rows + NUM_SCORES - 1, b:b + columns]
+                window = as_strided(window, (NUM_SCORES, rows, columns), (window.strides[0],) + window.strides)
+                poning = np.einsum('kpq,pq->k', window, pegging[:rows, :columns])
+                poning += pegging[rows:].sum()
+
+                # wins[dealer] = dealing_wins + no_points * wins[pone] and the other way round
+                dealing_wins = dealer_hand.dot(dealing)
+                poning_wins = pone_hand.dot(poning)
+                pone_wins = (poning_wins + no_points * dealing_wins) / (1.0 - no_points * no_points)
+                dealer_wins = dealing_wins + no_points * pone_wins
+                wins[PONE, a, b] = pone_wins
+                wins[DEALER, a, b] = dealer_wins
+
+                after_hand[a, b] += crib[0] * pone_wins
+                after_peg[a, b] += pone_hand[0] * crib[0] * pone_wins
+                dealing[0] += pegging[0, 0] * pone_hand[0] * crib[0] * pone_wins
+                after_pone[a, b] += dealer_points[0] * dealer_wins
+                poning[0] += pegging[0, 0] * dealer_points[0] * dealer_wins
+                hand_wins[PONE, a, b] = poning
+                hand_wins[DEALER, a, b] = dealing
+
+        return cls(array('f', hand_wins.astype(np.float32).tostring()), target)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        values = array('f')
+        with open(path, 'rb') as f:
+            values.fromstring(f.read())
+        target = int(round((len(values) / (2.0 * NUM_SCORES)) ** 0.5))
+        return cls(values, target)
+
+    def save(self, path=DEFAULT_PATH):
+        with open(path, 'wb') as f:
+            f.write(self.values.tostring())
+
+    def hand_win_probabilities(self, my_score, opponent_score, dealer):
+        """ The chance of winning given each number of points my hand scores this deal """
+        i = self.index(my_score, opponent_score, dealer)
+        return self.values[i:i + NUM_SCORES]
+
+    def win_probability(self, discard, my_score, opponent_score, dealer):
+        """ Chance of winning if the hand of the given Discard is kept """
+        if my_score >= self.target or opponent_score >= self.target:
+            raise ValueError("The game is already over")
+        i = self.index(my_score, opponent_score, dealer)
+        values = self.values
+        return sum(count * values[i + score] for score, count in enumerate(discard.histogram) if count) / discard.count
+
+
+def best_win_discard(discard_stats, my_score, opponent_score, dealer, table=None):
+    """ Returns (discard, chance of winning) for the discard most likely to win the game """
+    table = table or default_win_table()
+    if table is None:
+        raise ValueError("The win table hasn't been built")
+    return max(((discard, table.win_probability(discard, my_score, opponent_score, dealer))
+                for discard in discard_stats), key=lambda d: d[1])
+
+
+_default_win_table = None
+
+def default_win_table():
+    """ Returns the shared win table if it has been written to DEFAULT_PATH, otherwise None """
+    global _default_win_table
+    if _default_win_table is None and os.path.exists(DEFAULT_PATH):
+        _default_win_table = WinTable.load(DEFAULT_PATH)
+    return _default_win_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the table of chances of winning the game")
+    parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+    parser.add_argument('--deals', type=int, default=20000, help="random deals to measure the scores over")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--target', type=int, default=GAME_TARGET, help="points needed to win")
+    parser.add_argument('--processes', type=int, default=None, help="worker processes (default one per core)")
+    args = parser.parse_args()
+    distributions = PointDistributions.simulate(args.deals, args.seed, args.processes)
+    WinTable.build(distributions, args.target).save(args.path)
+    print("Wrote win table to {}".format(args.path))
+
+
+if __name__ == '__main__':
+    main()